@@ -0,0 +1,320 @@
+import os
+import io
+import queue
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import multiprocessing
+import numpy as np
+import pandas as pd
+from FakeImap import FakeImap
+
+try:
+    import resource
+except ImportError:  # Windows : pas de mesure de la mémoire maximale
+    resource = None
+
+
+# Jeux de données générés sous ROOT_DIR : un dossier (donc une table) par scénario
+SCENARIOS = [
+    {"name": "csv_point_virgule", "format": "csv", "delimiter": ";", "rows": 20000, "columns": 8, "files": 2},
+    {"name": "csv_virgule_large", "format": "csv", "delimiter": ",", "rows": 5000, "columns": 40, "files": 2},
+    {"name": "csv_tabulation", "format": "csv", "delimiter": "\t", "rows": 20000, "columns": 5, "files": 2},
+    {"name": "xlsx_classeur", "format": "xlsx", "delimiter": None, "rows": 5000, "columns": 10, "files": 2},
+]
+
+# Boîte aux lettres simulée : pièces jointes reconnues par EmailDataInserter.table_for_file
+MAILBOX = [
+    {"prefix": "solde", "format": "csv", "delimiter": ";", "rows": 2000, "columns": 6, "messages": 10},
+    {"prefix": "TELEPIN_BALANCE", "format": "xlsx", "delimiter": None, "rows": 1000, "columns": 6, "messages": 10},
+]
+
+
+def generate_frame(rows, columns, seed):
+    """
+    Génère un DataFrame synthétique où alternent colonnes entières, décimales, texte et dates,
+    avec quelques valeurs manquantes.
+    :param rows: Nombre de lignes.
+    :param columns: Nombre de colonnes.
+    :param seed: Graine du générateur aléatoire (données reproductibles).
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for index in range(columns):
+        kind = index % 4
+        if kind == 0:
+            values = pd.Series(rng.integers(0, 1_000_000, rows))
+        elif kind == 1:
+            values = pd.Series(rng.normal(1000, 250, rows).round(2))
+            values[rng.random(rows) < 0.02] = np.nan
+        elif kind == 2:
+            values = pd.Series(rng.choice(["alpha", "beta", "gamma", "delta", "epsilon"], rows))
+            values = values + "_" + pd.Series(rng.integers(0, 1000, rows)).astype(str)
+        else:
+            values = pd.Series(pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"))
+            values = values.dt.strftime("%Y-%m-%d")
+        data[f"col_{index}"] = values
+    return pd.DataFrame(data)
+
+
+def file_content(df, file_format, delimiter):
+    """
+    Sérialise un DataFrame en CSV (séparateur donné) ou en classeur .xlsx.
+    :return: Contenu du fichier (octets).
+    """
+    if file_format == "csv":
+        return df.to_csv(index=False, sep=delimiter).encode()
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def generate_tree(root_dir, scenarios, scale=1.0):
+    """
+    Crée sous `root_dir` un dossier par scénario contenant ses fichiers synthétiques.
+    :return: Dictionnaire {scénario: nombre total de lignes}.
+    """
+    rows = {}
+    for number, scenario in enumerate(scenarios):
+        folder = os.path.join(root_dir, scenario["name"])
+        os.makedirs(folder, exist_ok=True)
+        count = max(1, int(scenario["rows"] * scale))
+        for index in range(scenario["files"]):
+            df = generate_frame(count, scenario["columns"], seed=number * 100 + index)
+            path = os.path.join(folder, f"{scenario['name']}_{index}.{scenario['format']}")
+            with open(path, "wb") as f:
+                f.write(file_content(df, scenario["format"], scenario["delimiter"]))
+        rows[scenario["name"]] = count * scenario["files"]
+    return rows
+
+
+def generate_messages(mailbox, scale=1.0):
+    """
+    Génère les messages de la boîte simulée : (uid, sujet, [(nom de fichier, contenu)]).
+    """
+    messages = []
+    uid = 100
+    for number, spec in enumerate(mailbox):
+        count = max(1, int(spec["rows"] * scale))
+        for index in range(spec["messages"]):
+            df = generate_frame(count, spec["columns"], seed=10_000 + number * 100 + index)
+            filename = f"{spec['prefix']}_{index}.{spec['format']}"
+            uid += 1
+            messages.append((uid, f"Rapport {filename}", [(filename, file_content(df, spec["format"], spec["delimiter"]))]))
+    return messages
+
+
+def peak_rss_mb():
+    """
+    Mémoire résidente maximale du processus courant, en Mo (None si non mesurable).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sous macOS, kilo-octets sous Linux
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_stage(stage, env, scale, verbose, results):
+    """
+    Exécute une étape du benchmark dans un processus dédié (mémoire maximale mesurée par étape).
+    :param stage: tables, insert ou email.
+    :param env: Variables d'environnement de l'exécution (ROOT_DIR, base SQLite...).
+    :param scale: Facteur appliqué au nombre de lignes des pièces jointes simulées.
+    :param verbose: True pour afficher les messages des classes d'ingestion.
+    :param results: File où déposer le résultat.
+    """
+    os.environ.update(env)
+    if not verbose:
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            if stage == "tables":
+                from TableGenerator import TableGenerator
+                runner = TableGenerator()
+                start = time.perf_counter()
+                runner.scan_and_process()
+                summary = None
+            elif stage == "insert":
+                from DataInsert import DataInserter
+                runner = DataInserter()
+                start = time.perf_counter()
+                runner.scan_and_insert()
+                summary = runner.summary.snapshot()
+            else:
+                from EmailDataInsert import EmailDataInserter
+                runner = EmailDataInserter()
+                mailbox = FakeImap(generate_messages(MAILBOX, scale))
+                runner.connect_to_email = lambda: mailbox
+                start = time.perf_counter()
+                runner.process_email_attachments()
+                summary = runner.summary.snapshot()
+            elapsed = time.perf_counter() - start
+            runner.pool.close_all()
+    except BaseException as e:
+        results.put({"stage": stage, "error": repr(e)})
+        return
+
+    tables = summary["tables"] if summary else {}
+    rows = sum(table["rows"] for table in tables.values())
+    results.put({
+        "stage": stage,
+        "seconds": round(elapsed, 3),
+        "rows": rows,
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed and rows else None,
+        "failed_files": sum(table["failed"] for table in tables.values()),
+        "peak_rss_mb": peak_rss_mb(),
+        "tables": {name: {"rows": table["rows"], "seconds": round(table["seconds"], 3)} for name, table in tables.items()},
+        "stages": {name: round(seconds, 3) for name, (count, seconds) in (summary or {}).get("stages", {}).items()},
+    })
+
+
+def wait_result(process, stage_results, stage):
+    """
+    Attend le résultat d'une étape ; un processus arrêté sans résultat est signalé en erreur.
+    """
+    while True:
+        try:
+            return stage_results.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                return {"stage": stage, "error": f"processus arrêté (code {process.exitcode})"}
+
+
+def run_benchmark(scale=1.0, verbose=False, workdir=None):
+    """
+    Génère les données dans un ROOT_DIR temporaire puis mesure, contre une base SQLite locale,
+    la création des tables, l'insertion des dossiers et le traitement des pièces jointes.
+    :return: Dictionnaire des résultats par étape.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="etl_bench_")
+    root_dir = os.path.join(workdir, "ROOT")
+    os.makedirs(root_dir, exist_ok=True)
+    env = {
+        "ROOT_DIR": root_dir,
+        "DB_BACKEND": "sqlite",
+        "SQLITE_PATH": os.path.join(workdir, "bench.sqlite"),
+        "MANIFEST_PATH": os.path.join(workdir, "manifest.sqlite"),
+        "AUTO_CONFIRM_SCHEMA": "1",
+        "EMAIL_USER": "bench@example.com",
+    }
+
+    start = time.perf_counter()
+    generated = generate_tree(root_dir, SCENARIOS, scale)
+    results = {"generation": {"seconds": round(time.perf_counter() - start, 3), "rows": sum(generated.values())}}
+
+    context = multiprocessing.get_context("spawn")
+    try:
+        for stage in ("tables", "insert", "email"):
+            stage_results = context.Queue()
+            process = context.Process(target=run_stage, args=(stage, env, scale, verbose, stage_results))
+            process.start()
+            results[stage] = wait_result(process, stage_results, stage)
+            process.join()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare les résultats à une référence : débit (lignes/s) plus faible ou durée plus longue
+    au-delà de la tolérance.
+    :return: Liste des régressions (messages).
+    """
+    regressions = []
+    for stage, result in results.items():
+        reference = baseline.get(stage)
+        if not reference or "error" in result or "error" in reference:
+            continue
+        if result.get("rows_per_sec") and reference.get("rows_per_sec"):
+            if result["rows_per_sec"] < reference["rows_per_sec"] * (1 - tolerance):
+                regressions.append(f"{stage} : {result['rows_per_sec']:.0f} lignes/s "
+                                   f"(référence {reference['rows_per_sec']:.0f} lignes/s)")
+        elif result.get("seconds") and reference.get("seconds"):
+            if result["seconds"] > reference["seconds"] * (1 + tolerance):
+                regressions.append(f"{stage} : {result['seconds']:.2f}s (référence {reference['seconds']:.2f}s)")
+    return regressions
+
+
+def report(results):
+    """
+    Affiche les résultats par étape.
+    """
+    print("Résultats du benchmark :")
+    for stage, result in results.items():
+        if "error" in result:
+            print(f"  - {stage} : ERREUR {result['error']}")
+            continue
+        line = f"  - {stage} : {result['seconds']:.2f}s, {result.get('rows', 0)} lignes"
+        if result.get("rows_per_sec"):
+            line += f" ({result['rows_per_sec']:.0f} lignes/s)"
+        if result.get("peak_rss_mb") is not None:
+            line += f", mémoire max {result['peak_rss_mb']:.0f} Mo"
+        if result.get("failed_files"):
+            line += f", {result['failed_files']} fichiers en échec"
+        print(line)
+        for name, seconds in result.get("stages", {}).items():
+            print(f"      * {name} : {seconds:.2f}s")
+
+
+def machine():
+    """
+    Décrit la machine du benchmark : les débits ne se comparent qu'entre mesures d'une même machine.
+    """
+    return (f"{platform.platform()}, {platform.processor() or platform.machine()}, {os.cpu_count()} CPU, "
+            f"Python {platform.python_version()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'ingestion sur des données synthétiques.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Facteur appliqué au nombre de lignes générées.")
+    parser.add_argument("--baseline", default="bench_baseline.json", help="Fichier JSON de référence.")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistre les résultats comme référence.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Écart toléré avant de signaler une régression.")
+    parser.add_argument("--verbose", action="store_true", help="Affiche les messages des classes d'ingestion.")
+    args = parser.parse_args()
+
+    # Sans référence utilisable, la comparaison échoue plutôt que de conclure à l'absence de régression
+    baseline = None
+    if not args.save_baseline:
+        if not os.path.exists(args.baseline):
+            print(f"Aucune référence ({args.baseline}) : lancer d'abord le benchmark avec --save-baseline "
+                  f"sur la machine de comparaison.")
+            return 2
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != args.scale:
+            print(f"Référence mesurée avec --scale {baseline.get('scale')} : relancer avec la même échelle "
+                  f"ou enregistrer une nouvelle référence.")
+            return 2
+
+    results = run_benchmark(args.scale, args.verbose)
+    report(results)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(dict(results, scale=args.scale, machine=machine()), f, indent=2)
+        print(f"Référence enregistrée dans {args.baseline} (--scale {args.scale}, {machine()}).")
+        return 0
+
+    print(f"Référence : --scale {baseline.get('scale')}, {baseline.get('machine', 'machine inconnue')}.")
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("Régressions détectées :")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print("Aucune régression par rapport à la référence.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import os
+import pandas as pd
+from Instrumentation import log
+
+
+class BulkInserter:
+    def __init__(self, batch_size=None):
+        """
+        Initialise l'insertion par lots partagée par les classes d'insertion.
+        :param batch_size: Nombre de lignes envoyées par lot (INSERT_BATCH_SIZE, 1000 par défaut).
+        """
+        self.batch_size = int(batch_size or os.getenv("INSERT_BATCH_SIZE", 1000))
+        # INSERT_MODE=row restaure l'ancien comportement ligne par ligne
+        self.bulk = os.getenv("INSERT_MODE", "bulk").lower() != "row"
+
+    def to_rows(self, df):
+        """
+        Convertit un DataFrame en liste de tuples, les valeurs manquantes (NaN, NaT) devenant None (NULL).
+        La conversion est faite en une seule opération vectorisée sur le tableau numpy du bloc.
+        :param df: DataFrame à convertir.
+        """
+        values = df.to_numpy(dtype=object, copy=True)
+        missing = pd.isna(values)
+        if missing.any():
+            values[missing] = None
+        return list(map(tuple, values))
+
+    def insert(self, cur, insert_query, df, is_transient=None, savepoint=None):
+        """
+        Insère le DataFrame par lots de `batch_size` lignes avec `executemany` (`fast_executemany` avec pyodbc).
+        Si un lot échoue, seul ce lot est rejoué ligne par ligne, sauf pour une erreur transitoire
+        (interblocage, délai dépassé, connexion coupée) qui est propagée pour que l'appelant rejoue la transaction.
+        `executemany` a pu appliquer les lignes qui précèdent la ligne en échec : la transaction revient
+        au point de sauvegarde posé avant le lot, pour que ces lignes ne soient pas insérées deux fois.
+        :param cur: Curseur ouvert (pyodbc, psycopg2 ou sqlite3).
+        :param insert_query: Requête INSERT paramétrée.
+        :param df: DataFrame contenant les données à insérer.
+        :param is_transient: Fonction indiquant si une erreur est transitoire.
+        :param savepoint: Requêtes (pose, retour, libération ou None) du point de sauvegarde de chaque lot.
+        :return: Nombre de lignes insérées.
+        """
+        if not self.bulk:
+            for row in self.to_rows(df):
+                cur.execute(insert_query, row)
+            return len(df)
+
+        # Option propre à pyodbc ; les autres pilotes envoient les lots avec executemany seul
+        if hasattr(cur, "fast_executemany"):
+            cur.fast_executemany = True
+        all_rows = self.to_rows(df)
+        for start in range(0, len(all_rows), self.batch_size):
+            rows = all_rows[start:start + self.batch_size]
+            if savepoint:
+                cur.execute(savepoint[0])
+            try:
+                cur.executemany(insert_query, rows)
+            except Exception as e:
+                if is_transient and is_transient(e):
+                    raise
+                log.warning(f"Échec du lot de lignes {start} à {start + len(rows) - 1} : {e}. "
+                            f"Reprise ligne par ligne.")
+                if savepoint:
+                    cur.execute(savepoint[1])
+                for row in rows:
+                    cur.execute(insert_query, row)
+            if savepoint and savepoint[2]:
+                cur.execute(savepoint[2])
+        return len(df)
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from Instrumentation import log
+
+
+class ConnectionPoolError(Exception):
+    """
+    Erreur levée lorsqu'aucune connexion à la base de données ne peut être obtenue.
+    """
+
+
+class ConnectionPool:
+    def __init__(self, connect, max_size=None, timeout=None, health_query="SELECT 1"):
+        """
+        Initialise un pool de connexions réutilisables.
+        :param connect: Fonction sans argument qui ouvre une nouvelle connexion.
+        :param max_size: Nombre maximal de connexions ouvertes (DB_POOL_SIZE, 4 par défaut).
+        :param timeout: Attente maximale, en secondes, d'une connexion libre (DB_POOL_TIMEOUT, 30 par défaut).
+        :param health_query: Requête exécutée pour vérifier une connexion avant de la fournir.
+        """
+        self.connect = connect
+        self.max_size = int(max_size or os.getenv("DB_POOL_SIZE", 4))
+        self.timeout = float(timeout or os.getenv("DB_POOL_TIMEOUT", 30))
+        self.health_query = health_query
+        self._idle = []
+        self._open = 0
+        self._condition = threading.Condition()
+        self.connects = 0
+        self.acquisitions = 0
+        self.discarded = 0
+
+    def acquire(self):
+        """
+        Fournit une connexion : une connexion libre vérifiée, ou une nouvelle si la limite le permet.
+        Attend qu'une connexion soit rendue lorsque `max_size` connexions sont déjà ouvertes.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._condition:
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ConnectionPoolError(f"Aucune connexion disponible après {self.timeout:.0f}s "
+                                                  f"({self.max_size} connexions ouvertes).")
+                    self._condition.wait(remaining)
+                conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    self._open += 1
+
+            if conn is None:
+                conn = self._open_connection()
+            elif not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+
+            with self._condition:
+                self.acquisitions += 1
+            return conn
+
+    def release(self, conn, discard=False):
+        """
+        Rend une connexion au pool après avoir annulé toute transaction non validée.
+        :param conn: Connexion obtenue par `acquire`.
+        :param discard: True pour fermer la connexion au lieu de la réutiliser.
+        """
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard:
+            self._discard(conn)
+            return
+
+        with self._condition:
+            self._idle.append(conn)
+            self._condition.notify()
+
+    def reset(self, conn):
+        """
+        Annule la transaction en cours d'une connexion obtenue par `acquire`. Si la connexion ne répond
+        plus (connexion coupée), elle est fermée et libère sa place dans le pool.
+        :param conn: Connexion à réinitialiser.
+        :return: La connexion si elle est encore utilisable, sinon None (en obtenir une autre avec `acquire`).
+        """
+        try:
+            conn.rollback()
+            if self._is_healthy(conn):
+                return conn
+        except Exception:
+            pass
+        self._discard(conn)
+        return None
+
+    @contextmanager
+    def connection(self):
+        """
+        Fournit une connexion du pool le temps d'un bloc `with`, puis la rend au pool.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """
+        Ferme les connexions libres du pool.
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    def report(self):
+        """
+        Affiche le nombre de connexions ouvertes et évitées grâce à la réutilisation.
+        """
+        saved = self.acquisitions - self.connects
+        log.info(f"Pool de connexions : {self.acquisitions} utilisations, {self.connects} connexions ouvertes, "
+                 f"{saved} connexions évitées, {self.discarded} connexions écartées.",
+                 extra={"fields": {"event": "pool", "acquisitions": self.acquisitions, "connects": self.connects,
+                                   "saved": saved, "discarded": self.discarded}})
+
+    def _open_connection(self):
+        """
+        Ouvre une nouvelle connexion ; la place réservée est libérée en cas d'échec.
+        """
+        try:
+            conn = self.connect()
+        except Exception as e:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise ConnectionPoolError(f"Connexion à la base de données impossible : {e}") from e
+
+        with self._condition:
+            self.connects += 1
+        return conn
+
+    def _is_healthy(self, conn):
+        """
+        Vérifie qu'une connexion libre répond encore avant de la réutiliser.
+        """
+        try:
+            cur = conn.cursor()
+            cur.execute(self.health_query)
+            cur.fetchall()
+            cur.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        """
+        Ferme une connexion et libère sa place dans le pool.
+        """
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._open -= 1
+            self.discarded += 1
+            self._condition.notify()
@@ -1,8 +1,19 @@
 import os
+import argparse
 import pandas as pd
-import pyodbc
 import re
-import csv
+import threading
+import time
+import multiprocessing
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from FileReader import FileReader, parse_in_worker
+from ConnectionPool import ConnectionPoolError
+from Sinks import Sink
+from IngestManifest import IngestManifest
+from IngestSummary import IngestSummary
+from FolderWatcher import FolderWatcher
+from Instrumentation import log, metrics, profiled
 
 
 
@@ -22,20 +33,147 @@ class DataInserter:
             "UID": os.getenv("DB_USER"),
             "PWD": os.getenv("DB_PASSWORD"),
         }
+        self.sink = Sink.shared(self.db_params)
+        self.pool = self.sink.pool
+        self.schema_cache = self.sink.schema_cache
+        self.file_reader = FileReader()
+        self.manifest = IngestManifest()
+        self.summary = IngestSummary()
+        self._stop = threading.Event()
+        # Lecture des fichiers dans des processus séparés (PARSE_WORKERS, 0 = lecture dans le thread d'insertion),
+        # avec jusqu'à PARSE_AHEAD fichiers lus d'avance par dossier
+        self.parse_workers = int(os.getenv("PARSE_WORKERS", 0))
+        self.parse_ahead = int(os.getenv("PARSE_AHEAD", 2))
+        # Un fichier lu par le pool est renvoyé en entier au processus principal : au-delà de PARSE_MAX_MB,
+        # il est lu en flux pendant son insertion, pour que la mémoire des lectures d'avance reste bornée
+        self.parse_max_bytes = float(os.getenv("PARSE_MAX_MB", 64)) * 1024 * 1024
+        self._parsers = None
+        self._parsers_lock = threading.Lock()
 
 
 
-    def scan_and_insert(self):
+    def scan_and_insert(self, workers=None):
         """
         Parcourt récursivement les dossiers et traite ceux ne contenant pas `emails_attachments`.
+        Les schémas de toutes les tables sont chargés une seule fois au début du parcours.
+        Avec plusieurs workers, les tables sont traitées en parallèle ; les fichiers d'une même table
+        restent traités un par un, dans l'ordre.
+        Avec PARSE_WORKERS, les fichiers sont lus par un pool de processus pendant que les fichiers
+        précédents sont insérés (voir `process_folder`).
+        :param workers: Nombre de tables traitées en parallèle (INGEST_WORKERS, 1 par défaut).
         """
+        workers = int(workers or os.getenv("INGEST_WORKERS", 1))
+        self.summary = IngestSummary()
+        self._stop.clear()
+        self.schema_cache.load()
+        if self.parse_workers > 0:
+            self.parsers()
+            self.summary.set_stage_workers("lecture", self.parse_workers)
+            for stage in ("insertion", "lecture en attente (insertion en attente)"):
+                self.summary.set_stage_workers(stage, workers)
+
+        # Regrouper les dossiers par table : deux dossiers de même nom alimentent la même table
+        tables = {}
         for dirpath, dirnames, filenames in os.walk(self.root_dir):
             dirnames[:] = [d for d in dirnames if d != "emails_attachments"]
 
             for dirname in dirnames:
                 folder_path = os.path.join(dirpath, dirname)
                 normalized_name = self.normalize_table_name(dirname)
-                self.process_folder(folder_path, normalized_name)
+                tables.setdefault(normalized_name, []).append(folder_path)
+
+        try:
+            if workers <= 1:
+                for table_name, folder_paths in tables.items():
+                    self.process_table(table_name, folder_paths)
+            else:
+                self.run_parallel(tables, workers)
+        finally:
+            self.close_parsers()
+            self.summary.report()
+            metrics.write_textfile()
+
+    def parsers(self):
+        """
+        Retourne le pool de processus de lecture, créé au premier appel avec PARSE_WORKERS processus
+        (ou un par cœur si PARSE_WORKERS vaut 0, pour les feuilles des classeurs).
+        """
+        with self._parsers_lock:
+            if self._parsers is None:
+                self._parsers = ProcessPoolExecutor(max_workers=self.parse_workers or os.cpu_count(),
+                                                    mp_context=multiprocessing.get_context("spawn"))
+            return self._parsers
+
+    def close_parsers(self):
+        """
+        Arrête le pool de processus de lecture (les lectures en attente sont annulées).
+        """
+        with self._parsers_lock:
+            parsers, self._parsers = self._parsers, None
+        if parsers is not None:
+            parsers.shutdown(cancel_futures=True)
+
+    def watch(self, watcher=None):
+        """
+        Mode surveillance : un premier parcours complet rattrape les fichiers arrivés pendant l'arrêt,
+        puis chaque fichier signalé prêt par le `FolderWatcher` (écriture terminée ou taille stable)
+        est inséré seul dans la table de son dossier, sans parcourir à nouveau l'arborescence.
+        S'arrête sur Ctrl+C ou à l'appel de `watcher.stop()`.
+        :param watcher: Surveillance à utiliser (FolderWatcher sur ROOT_DIR par défaut).
+        """
+        watcher = watcher or FolderWatcher(self.root_dir)
+        self.scan_and_insert()
+
+        self.summary = IngestSummary()
+        root_dir = os.path.normpath(self.root_dir)
+        try:
+            for file_path in watcher.events():
+                folder_path = os.path.dirname(file_path)
+                # Seuls les fichiers rangés dans un dossier (une table) sont insérés, comme lors du parcours
+                if os.path.normpath(folder_path) == root_dir:
+                    continue
+                self.process_file(file_path, self.normalize_table_name(os.path.basename(folder_path)))
+                metrics.write_textfile()
+        except KeyboardInterrupt:
+            log.info("Arrêt de la surveillance demandé.")
+        finally:
+            watcher.stop()
+            self.close_parsers()
+            self.summary.report()
+            metrics.write_textfile()
+
+    def run_parallel(self, tables, workers):
+        """
+        Traite les tables en parallèle avec un pool de workers. Chaque worker obtient ses propres
+        connexions du pool. À la première erreur fatale, les tables en attente sont annulées et
+        les workers en cours s'arrêtent après leur fichier courant.
+        :param tables: Dictionnaire {nom de table: liste des dossiers}.
+        :param workers: Nombre de workers.
+        """
+        self.pool.max_size = max(self.pool.max_size, workers)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as executor:
+            futures = [executor.submit(self.process_table, table_name, folder_paths)
+                       for table_name, folder_paths in tables.items()]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException as e:
+                log.error(f"Erreur fatale, arrêt des workers : {e}")
+                self._stop.set()
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def process_table(self, table_name, folder_paths):
+        """
+        Traite, l'un après l'autre, tous les dossiers associés à une table.
+        :param table_name: Nom de la table.
+        :param folder_paths: Liste des dossiers dont les fichiers alimentent la table.
+        """
+        for folder_path in folder_paths:
+            if self._stop.is_set():
+                return
+            self.process_folder(folder_path, table_name)
 
     def process_folder(self, folder_path, table_name):
         """
@@ -43,86 +181,278 @@ class DataInserter:
         :param folder_path: Chemin du dossier.
         :param table_name: Nom de la table dans laquelle les données seront insérées.
         """
-        files = [f for f in os.listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f))]
+        files = sorted(f for f in os.listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f)))
         if not files:
-            print(f"Aucun fichier trouvé dans {folder_path}")
+            log.warning(f"Aucun fichier trouvé dans {folder_path}")
             return
 
-        for file in files:
-            file_path = os.path.join(folder_path, file)
-            print(f"Traitement du fichier : {file_path}")
+        # Les archives et les classeurs à plusieurs feuilles sont lus membre par membre ou feuille par feuille
+        def submit(path):
+            if (self.file_reader.is_supported(path) and not self.file_reader.is_archive(path)
+                    and not self.file_reader.is_multi_sheet(path) and self.fits_parse_pool(path)):
+                return self.parsers().submit(parse_in_worker, path)
 
-            try:
-                if file.endswith((".xlsx", ".xls")):
-                    df = pd.read_excel(file_path, header=None)
-                elif file.endswith(".csv"):
-                    #df = pd.read_csv(file_path, header=None)
-                    with open(file_path, 'r') as file_csv:
-                        dialect = csv.Sniffer().sniff(file_csv.read(1024))
-                        file_csv.seek(0)
-                        df = pd.read_csv(file_csv, sep=dialect.delimiter)  
-                else:
-                    print(f"Format non supporté pour le fichier : {file_path}")
-                    continue
+        paths = [os.path.join(folder_path, file) for file in files]
+        with closing(self.read_ahead(paths, submit)) as parsing:
+            for file_path, parsed in parsing:
+                if self._stop.is_set():
+                    log.warning(f"Arrêt demandé : fichiers restants de {folder_path} ignorés.")
+                    return
+                self.process_file(file_path, table_name, parsed)
+
+    def fits_parse_pool(self, file_path, member=None):
+        """
+        Indique si un fichier peut être lu par le pool de processus, qui le renvoie en entier en mémoire :
+        sa taille (décompressée) doit être connue et ne pas dépasser PARSE_MAX_MB. Les autres fichiers,
+        dont les CSV .gz et .bz2, sont lus en flux, bloc par bloc, pendant leur insertion.
+        :param file_path: Chemin du fichier.
+        :param member: Membre d'une archive .zip, ou None.
+        """
+        try:
+            size = self.file_reader.data_size(file_path, member=member)
+        except Exception:
+            # L'erreur sera signalée par la lecture du fichier pendant son insertion
+            return False
+        return size is not None and size <= self.parse_max_bytes
 
-                success = self.insert_data_into_table(table_name, df)
+    def read_ahead(self, items, submit):
+        """
+        Parcourt des fichiers (ou les membres d'une archive) dans l'ordre. Avec le pool de lecture, les
+        PARSE_AHEAD suivants sont lus pendant l'insertion de l'élément courant ; les éléments restent insérés
+        un par un, dans l'ordre. Les lectures non utilisées sont annulées à la fermeture du générateur.
+        :param items: Liste des éléments.
+        :param submit: Fonction qui soumet la lecture d'un élément au pool de processus et retourne son Future,
+                       ou None si l'élément est lu pendant son insertion.
+        :return: Générateur de (élément, Future ou None).
+        """
+        parsing = {}
+        submitted = 0
+        try:
+            for position, item in enumerate(items):
+                while self.parse_workers > 0 and submitted < min(len(items), position + 1 + self.parse_ahead):
+                    future = submit(items[submitted])
+                    if future is not None:
+                        parsing[submitted] = future
+                    submitted += 1
+                yield item, parsing.pop(position, None)
+        finally:
+            for future in parsing.values():
+                future.cancel()
 
-                if success:
+    def process_file(self, file_path, table_name, parsed=None, sheet=None, member=None):
+        """
+        Insère un fichier dans sa table, en s'appuyant sur le manifeste pour ignorer un fichier déjà ingéré
+        ou reprendre un fichier partiellement ingéré, puis supprime le fichier inséré.
+        Une archive .zip est insérée fichier par fichier (`process_archive`) et, avec SHEET_MODE=all,
+        un classeur feuille par feuille (`process_workbook`).
+        :param file_path: Chemin du fichier.
+        :param table_name: Nom de la table dans laquelle les données seront insérées.
+        :param parsed: Lecture du fichier en cours dans le pool de processus (Future de `parse_in_worker`),
+                       ou None pour lire le fichier bloc par bloc pendant l'insertion.
+        :param sheet: Feuille d'un classeur à insérer seule (le classeur n'est alors pas supprimé).
+        :param member: Membre d'une archive .zip à insérer seul (l'archive n'est alors pas supprimée).
+        :return: True si le fichier (ou la feuille, ou le membre) est inséré.
+        """
+        if member is None and self.file_reader.is_archive(file_path):
+            return self.process_archive(file_path, table_name)
+        if sheet is None and self.file_reader.is_multi_sheet(file_path, member):
+            return self.process_workbook(file_path, table_name, member)
+        log.info(f"Traitement du fichier : {file_path}" + (f" ('{member}')" if member is not None else "")
+                 + (f" (feuille '{sheet}')" if sheet is not None else ""))
+        # Une feuille ou un membre d'archive est inséré seul : le fichier est supprimé par `process_workbook`
+        # ou `process_archive`, une fois toutes ses parties insérées
+        whole = sheet is None and member is None
+
+        try:
+            if not self.file_reader.is_supported(file_path):
+                log.warning(f"Format non supporté pour le fichier : {file_path}")
+                return False
+
+            # Fichier déjà ingéré (arrêt entre la validation et la suppression) : il est seulement supprimé.
+            # Chaque membre d'une archive et chaque feuille d'un classeur a sa propre entrée dans le manifeste.
+            label = table_name + "".join(f"#{part}" for part in (member, sheet) if part is not None)
+            with metrics.timer("manifest", table=table_name):
+                entry = self.manifest.begin(file_path, label)
+            if entry.status == "done":
+                log.info(f"Fichier {file_path} déjà inséré dans '{label}' (manifeste), ignoré.")
+                if whole:
+                    self.delete_file(file_path)
+                return True
+
+            # Lecture sans inférence des types (READ_MODE=schema) : la table doit exister avant la lecture
+            if not self.file_reader.infer_types:
+                with metrics.timer("schema", table=table_name):
+                    if self.schema_cache.get(table_name) is None:
+                        raise ValueError(f"La table '{table_name}' n'existe pas.")
+
+            # Lecture par blocs : chaque bloc est inséré dès qu'il est lu (temps de lecture mesuré par bloc)
+            if whole:
+                metrics.inc("etl_bytes_read_total", os.path.getsize(file_path), table=table_name)
+            if parsed is None:
+                chunks = metrics.timed_iter(
+                    self.file_reader.iter_file(file_path, sheet=sheet, member=member),
+                    "parse", table=table_name)
+            else:
+                chunks = self.wait_parsed(parsed, table_name)
+            if entry.rows_committed:
+                log.info(f"Reprise du fichier {file_path} après {entry.rows_committed} lignes déjà insérées.")
+                chunks = self.file_reader.skip_rows(chunks, entry.rows_committed)
+
+            start = time.perf_counter()
+            success = self.insert_data_into_table(
+                table_name, chunks,
+                on_commit=lambda rows, entry=entry: self.manifest.checkpoint(entry, entry.rows_committed + rows))
+            if parsed is not None:
+                self.summary.add_stage_time("insertion", time.perf_counter() - start)
+            self.summary.add_file(table_name, success)
+
+            if success:
+                self.manifest.complete(entry)
+                if whole:
                     self.delete_file(file_path)
+            return success
+
+        except ConnectionPoolError:
+            self.summary.add_file(table_name, False)
+            raise
+
+        except Exception as e:
+            self.summary.add_file(table_name, False)
+            log.error(f"Erreur lors de la lecture ou du traitement du fichier {file_path}: {e}")
+            return False
+
+    def process_workbook(self, file_path, table_name, member=None):
+        """
+        Insère toutes les feuilles d'un classeur, chacune dans sa table (SHEET_TABLES, table du dossier par défaut).
+        Les feuilles sont lues en même temps par le pool de processus de lecture, puis insérées une par une
+        dans l'ordre du classeur, avec un suivi par feuille dans le manifeste. Le classeur n'est supprimé
+        que lorsque toutes ses feuilles sont insérées ; sinon, seules les feuilles manquantes seront
+        reprises à la prochaine exécution.
+        :param file_path: Chemin du classeur.
+        :param table_name: Table du dossier du classeur.
+        :param member: Classeur membre d'une archive .zip (l'archive n'est alors pas supprimée ici), ou None.
+        :return: True si toutes les feuilles sont insérées.
+        """
+        name = file_path if member is None else f"{file_path} ('{member}')"
+        try:
+            targets = self.file_reader.sheet_targets(file_path, table_name, self.normalize_table_name, member)
+        except Exception as e:
+            self.summary.add_file(table_name, False)
+            log.error(f"Erreur lors de la lecture des feuilles du classeur {name}: {e}")
+            return False
+        log.info(f"Classeur {name} : {len(targets)} feuilles à insérer "
+                 f"({', '.join(f'{sheet} -> {target}' for sheet, target in targets)}).")
+        if member is None:
+            metrics.inc("etl_bytes_read_total", os.path.getsize(file_path), table=table_name)
+
+        # Un classeur trop volumineux pour le pool (PARSE_MAX_MB) est lu feuille par feuille pendant l'insertion
+        in_pool = self.fits_parse_pool(file_path, member)
+        parsing = [(sheet, target,
+                    self.parsers().submit(parse_in_worker, file_path, sheet=sheet, member=member) if in_pool else None)
+                   for sheet, target in targets]
+        inserted = 0
+        try:
+            for sheet, target, future in parsing:
+                if self._stop.is_set():
+                    break
+                inserted += bool(self.process_file(file_path, target, future, sheet=sheet, member=member))
+        finally:
+            for _, _, future in parsing:
+                if future is not None:
+                    future.cancel()
+
+        if inserted == len(targets):
+            if member is None:
+                self.delete_file(file_path)
+            return True
+        log.warning(f"Classeur {name} conservé : {inserted}/{len(targets)} feuilles insérées.")
+        return False
+
+    def process_archive(self, file_path, table_name):
+        """
+        Insère les fichiers de données d'une archive .zip, un par un dans l'ordre de l'archive, dans la table
+        du dossier. Chaque fichier est décompressé en flux pendant sa lecture, sans copie sur disque, et son
+        extension détermine son format. Avec le pool de lecture, les PARSE_AHEAD fichiers suivants sont lus
+        d'avance. L'archive n'est supprimée que lorsque tous ses fichiers sont insérés ; sinon, seuls les
+        fichiers manquants seront repris à la prochaine exécution (manifeste, `table#fichier`).
+        :param file_path: Chemin de l'archive.
+        :param table_name: Table du dossier de l'archive.
+        :return: True si tous les fichiers de l'archive sont insérés.
+        """
+        try:
+            members = self.file_reader.archive_members(file_path)
+        except Exception as e:
+            self.summary.add_file(table_name, False)
+            log.error(f"Erreur lors de la lecture de l'archive {file_path}: {e}")
+            return False
+        if not members:
+            self.summary.add_file(table_name, False)
+            log.warning(f"Aucun fichier pris en charge dans l'archive {file_path}, conservée.")
+            return False
+        log.info(f"Archive {file_path} : {len(members)} fichiers à insérer ({', '.join(members)}).")
+        metrics.inc("etl_bytes_read_total", os.path.getsize(file_path), table=table_name)
+
+        def submit(member):
+            if not self.file_reader.is_multi_sheet(file_path, member) and self.fits_parse_pool(file_path, member):
+                return self.parsers().submit(parse_in_worker, file_path, member=member)
 
-            except Exception as e:
-                print(f"Erreur lors de la lecture ou du traitement du fichier {file_path}: {e}")
+        inserted = 0
+        with closing(self.read_ahead(members, submit)) as parsing:
+            for member, parsed in parsing:
+                if self._stop.is_set():
+                    break
+                inserted += bool(self.process_file(file_path, table_name, parsed, member=member))
 
-    def insert_data_into_table(self, table_name, df):
+        if inserted == len(members):
+            self.delete_file(file_path)
+            return True
+        log.warning(f"Archive {file_path} conservée : {inserted}/{len(members)} fichiers insérés.")
+        return False
+
+    def wait_parsed(self, parsed, table_name):
+        """
+        Attend la lecture d'un fichier par le pool de processus et retourne ses blocs.
+        Le temps d'attente et le temps de lecture dans le processus sont ajoutés au récapitulatif.
+        :param parsed: Future de `parse_in_worker`.
+        :param table_name: Nom de la table (métriques).
         """
-        Insère les données dans une table SQL Server existante sans inclure la colonne 'id'.
+        start = time.perf_counter()
+        with metrics.timer("parse_wait", table=table_name):
+            chunks, seconds = parsed.result()
+        self.summary.add_stage_time("lecture en attente (insertion en attente)", time.perf_counter() - start)
+        self.summary.add_stage_time("lecture", seconds)
+        metrics.observe("etl_stage_seconds", seconds, stage="parse", table=table_name)
+        return chunks
+
+    def insert_data_into_table(self, table_name, data, on_commit=None):
+        """
+        Insère les données dans une table existante sans inclure la colonne 'id'.
+        Les blocs sont insérés au fur et à mesure et validés toutes les COMMIT_EVERY_ROWS lignes (ou
+        COMMIT_EVERY_BYTES octets) ; une transaction interrompue par une erreur transitoire est rejouée seule.
+        Le fichier n'est considéré comme inséré que lorsque toutes ses transactions sont validées.
         :param table_name: Nom de la table.
-        :param df: DataFrame contenant les données à insérer.
+        :param data: DataFrame ou itérable de DataFrame (blocs) contenant les données à insérer.
+        :param on_commit: Fonction appelée avec le nombre de lignes validées après chaque transaction (point de reprise).
         """
+        if isinstance(data, pd.DataFrame):
+            data = [data]
+
         try:
-            # Connexion à la base de données
-            conn = pyodbc.connect(**self.db_params)
-            cur = conn.cursor()
-
-            # Récupérer les colonnes de la table
-            query = f"""
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = ? AND COLUMN_NAME != 'id'
-                ORDER BY ORDINAL_POSITION;
-            """
-            cur.execute(query, table_name)
-            columns = [row[0] for row in cur.fetchall()]
-            print(f"Colonnes détectées dans la table '{table_name}': {columns}")
-
-            # Vérification du nombre de colonnes
-            if len(columns) != len(df.columns):
-                raise ValueError(f"Le nombre de colonnes du DataFrame ({len(df.columns)}) "
-                                f"ne correspond pas à celui de la table ({len(columns)}).")
-
-            # Construire dynamiquement la requête SQL d'insertion
-            placeholders = ", ".join(["?"] * len(columns))
-            columns_str = ", ".join([f"[{col}]" for col in columns])  # Gérer les noms de colonnes
-            insert_query = f'INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders});'
-
-            print(f"Requête générée : {insert_query}")
-
-            # Insérer les données ligne par ligne
-            for row in df.itertuples(index=False):
-                cur.execute(insert_query, row)
-
-            conn.commit()
-            print(f"Données insérées avec succès dans la table '{table_name}'.")
+            # Écriture bloc après bloc par la destination configurée (DB_BACKEND)
+            start = time.perf_counter()
+            inserted = self.sink.write(table_name, data, on_commit)
+            elapsed = time.perf_counter() - start
+            self.summary.add_rows(table_name, inserted, elapsed)
+            log.info(f"Données insérées avec succès dans la table '{table_name}' : "
+                     f"{inserted} lignes en {elapsed:.2f}s ({inserted / elapsed if elapsed else 0:.0f} lignes/s).")
             return True  
 
+        except ConnectionPoolError:
+            raise
+
         except Exception as e:
-            print(f"Erreur lors de l'insertion des données dans la table {table_name}: {e}")
+            log.error(f"Erreur lors de l'insertion des données dans la table {table_name}: {e}")
             return False  
-
-        finally:
-            if conn:
-                cur.close()
-                conn.close()
                 
     def delete_file(self, file_path):
         """
@@ -131,9 +461,10 @@ class DataInserter:
         """
         try:
             os.remove(file_path)
-            print(f"Fichier {file_path} supprimé avec succès.")
+            self.file_reader.forget(file_path)
+            log.info(f"Fichier {file_path} supprimé avec succès.")
         except Exception as e:
-            print(f"Erreur lors de la suppression du fichier {file_path}: {e}")
+            log.error(f"Erreur lors de la suppression du fichier {file_path}: {e}")
 
     def normalize_table_name(self, name):
         """
@@ -149,5 +480,17 @@ class DataInserter:
 
 # Utilisation
 if __name__ == "__main__":
-    inserter = DataInserter()
-    inserter.scan_and_insert()
+    parser = argparse.ArgumentParser(description="Insère les fichiers des dossiers de ROOT_DIR dans leurs tables.")
+    parser.add_argument("--watch", action="store_true",
+                        help="Après un premier parcours, surveille ROOT_DIR et insère chaque nouveau fichier dès qu'il est prêt.")
+    args, _ = parser.parse_known_args()
+
+    with profiled():
+        inserter = DataInserter()
+        if args.watch:
+            inserter.watch()
+        else:
+            inserter.scan_and_insert()
+        inserter.pool.report()
+        inserter.pool.close_all()
+        inserter.manifest.close()
@@ -1,11 +1,18 @@
 import imaplib
-import email
-from email.header import decode_header
 import os
 import pandas as pd
-import pyodbc
-from datetime import datetime, timedelta
-import csv
+import itertools
+import queue
+import threading
+import time
+from FileReader import FileReader
+from ConnectionPool import ConnectionPoolError
+from Sinks import Sink
+from TypeInference import TypeInferer
+from IngestManifest import IngestManifest
+from ImapFetcher import ImapFetcher
+from IngestSummary import IngestSummary
+from Instrumentation import log, metrics, profiled
 
 
 class EmailDataInserter:
@@ -22,6 +29,8 @@ class EmailDataInserter:
         self.imap_server = os.getenv("IMAP_SERVER")
         self.email_user = os.getenv("EMAIL_USER")
         self.email_password = os.getenv("EMAIL_PASSWORD")        
+        # Taille (octets) jusqu'à laquelle une pièce jointe est lue en mémoire sans passer par le disque
+        self.spill_bytes = int(os.getenv("ATTACHMENT_SPILL_BYTES", 0))
         self.db_params = {
             "Driver": os.getenv("DB_DRIVER"),
             "Server": os.getenv("DB_SERVER"),
@@ -29,6 +38,19 @@ class EmailDataInserter:
             "UID": os.getenv("DB_USER"),
             "PWD": os.getenv("DB_PASSWORD")
         }
+        self.sink = Sink.shared(self.db_params)
+        self.pool = self.sink.pool
+        self.schema_cache = self.sink.schema_cache
+        self.file_reader = FileReader()
+        self.type_inferer = TypeInferer()
+        self.manifest = IngestManifest()
+        self.imap_fetcher = ImapFetcher(self.manifest, self.email_user)
+        self.summary = IngestSummary()
+        self._table_locks = {}
+        self._table_locks_guard = threading.Lock()
+        # Pièces jointes restant à traiter par message (UID), avant de l'acquitter auprès d'ImapFetcher
+        self._remaining = {}
+        self._remaining_guard = threading.Lock()
 
         # Créer le répertoire si il n'existe pas
         if not os.path.exists(self.save_dir):
@@ -44,117 +66,78 @@ class EmailDataInserter:
             mail.select("inbox")  # Sélection de la boîte de réception
             return mail
         except Exception as e:
-            print(f"Erreur de connexion à l'email : {e}")
+            log.error(f"Erreur de connexion à l'email : {e}")
             return None
 
-    def retrieve_emails(self):
+    def iter_attachments(self):
         """
-        Récupère les emails reçus dans la dernière heure, qu'ils soient lus ou non.
+        Génère une à une les pièces jointes des emails arrivés depuis la dernière exécution, qu'ils soient
+        lus ou non. Seuls les nouveaux messages (UID supérieur au dernier UID traité) sont examinés, et seules
+        leurs parties jointes sont téléchargées. Une pièce jointe de taille inférieure ou égale à `spill_bytes`
+        reste en mémoire (clé `content`) ; les autres sont enregistrées dans `save_dir`.
+        Chaque message est acquitté (dernier UID traité) une fois toutes ses pièces jointes traitées
+        (`attachment_done`).
         """
         mail = self.connect_to_email()
         if not mail:
-            return []
+            return
 
         try:
-            since_time = (datetime.now() - timedelta(hours=1)).strftime("%d-%b-%Y")  
-            print(since_time)
-
-            # Recherche des emails reçus depuis l'heure calculée
-            status, messages = mail.search(None, f"SINCE {since_time}")
-            if status != "OK" or not messages[0]:  # Vérifier que la recherche a retourné des emails
-                print("Aucun email trouvé dans la dernière heure.")
-                return []
-
-            email_ids = messages[0].split()
-            emails_with_attachments = []
-
-            for email_id in email_ids:
-                status, msg_data = mail.fetch(email_id, "(RFC822)")
-                for response_part in msg_data:
-                    if isinstance(response_part, tuple):
-                        msg = email.message_from_bytes(response_part[1])
-
-                        subject, encoding = decode_header(msg["Subject"])[0]
-                        if isinstance(subject, bytes):
-                            subject = subject.decode(encoding if encoding else "utf-8")
-
-                        if msg.is_multipart():
-                            for part in msg.walk():
-                                content_type = part.get_content_type()
-                                content_disposition = str(part.get("Content-Disposition"))
-
-                                if "attachment" in content_disposition:
-                                    filename = part.get_filename()
-
-                                    if filename:
-                                        decoded_filename, encoding = decode_header(filename)[0]
-                                        if isinstance(decoded_filename, bytes):
-                                            decoded_filename = decoded_filename.decode(encoding or 'utf-8')
-
-                                        filepath = os.path.join(self.save_dir, decoded_filename)
-                                        with open(filepath, "wb") as f:
-                                            f.write(part.get_payload(decode=True))
-
-                                        emails_with_attachments.append({
-                                            "subject": subject,
-                                            "file_path": filepath
-                                        })
-            return emails_with_attachments
-        except Exception as e:
-            print(f"Erreur lors de la récupération des emails : {e}")
-            return []
+            for uid, subject, attachments in self.imap_fetcher.iter_new_messages(mail):
+                if not attachments:
+                    self.imap_fetcher.acknowledge(uid)
+                    continue
+                with self._remaining_guard:
+                    self._remaining[uid] = len(attachments)
+                for filename, payload in attachments:
+                    filepath = os.path.join(self.save_dir, filename)
+                    content = payload if len(payload) <= self.spill_bytes else None
+                    if content is None:
+                        with open(filepath, "wb") as f:
+                            f.write(payload)
+
+                    yield {
+                        "uid": uid,
+                        "subject": subject,
+                        "file_path": filepath,
+                        "content": content
+                    }
+        finally:
+            try:
+                mail.logout()
+            except Exception:
+                pass
 
-    def insert_data_into_table(self, table_name, df):
+    def insert_data_into_table(self, table_name, data, on_commit=None):
         """
-        Insère les données dans une table SQL Server existante sans inclure la colonne 'id'.
+        Insère les données dans une table existante sans inclure la colonne 'id'.
+        Les blocs sont insérés au fur et à mesure et validés toutes les COMMIT_EVERY_ROWS lignes (ou
+        COMMIT_EVERY_BYTES octets) ; une transaction interrompue par une erreur transitoire est rejouée seule.
+        Le fichier n'est considéré comme inséré que lorsque toutes ses transactions sont validées.
         :param table_name: Nom de la table.
-        :param df: DataFrame contenant les données à insérer.
+        :param data: DataFrame ou itérable de DataFrame (blocs) contenant les données à insérer.
+        :param on_commit: Fonction appelée avec le nombre de lignes validées après chaque transaction (point de reprise).
         """
+        if isinstance(data, pd.DataFrame):
+            data = [data]
+
         try:
-            # Connexion à la base de données
-            conn = pyodbc.connect(**self.db_params)
-            cur = conn.cursor()
-
-            # Récupérer les colonnes de la table
-            query = f"""
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = ? AND COLUMN_NAME != 'id'
-                ORDER BY ORDINAL_POSITION;
-            """
-            cur.execute(query, table_name)
-            columns = [row[0] for row in cur.fetchall()]
-            print(f"Colonnes détectées dans la table '{table_name}': {columns}")
-
-            # Vérification du nombre de colonnes
-            if len(columns) != len(df.columns):
-                raise ValueError(f"Le nombre de colonnes du DataFrame ({len(df.columns)}) "
-                                f"ne correspond pas à celui de la table ({len(columns)}).")
-
-            # Construire dynamiquement la requête SQL d'insertion
-            placeholders = ", ".join(["?"] * len(columns))
-            columns_str = ", ".join([f"[{col}]" for col in columns])  # Gérer les noms de colonnes
-            insert_query = f'INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders});'
-
-            print(f"Requête générée : {insert_query}")
-
-            # Insérer les données ligne par ligne
-            for row in df.itertuples(index=False):
-                cur.execute(insert_query, row)
-
-            conn.commit()
-            print(f"Données insérées avec succès dans la table '{table_name}'.")
+            # Écriture bloc après bloc par la destination configurée (DB_BACKEND)
+            start = time.perf_counter()
+            inserted = self.sink.write(table_name, data, on_commit)
+            elapsed = time.perf_counter() - start
+            self.summary.add_rows(table_name, inserted, elapsed)
+            log.info(f"Données insérées avec succès dans la table '{table_name}' : "
+                     f"{inserted} lignes en {elapsed:.2f}s ({inserted / elapsed if elapsed else 0:.0f} lignes/s).")
             return True  
 
+        except ConnectionPoolError:
+            raise
+
         except Exception as e:
-            print(f"Erreur lors de l'insertion des données dans la table {table_name}: {e}")
+            log.error(f"Erreur lors de l'insertion des données dans la table {table_name}: {e}")
             return False  
 
-        finally:
-            if conn:
-                cur.close()
-                conn.close()
-
     def check_table(self, table_name, df):
         """
         Vérifie si une table existe, et la crée si elle n'existe pas.
@@ -162,40 +145,26 @@ class EmailDataInserter:
         :param df: DataFrame contenant les données pour définir les colonnes.
         """
         try:
-            with pyodbc.connect(**self.db_params) as conn:
-                cursor = conn.cursor()
-                # Vérification de l'existence de la table
-                query = f"SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = ?;"
-                cursor.execute(query, table_name)
-                table_exists = cursor.fetchone()[0]
-
-                if table_exists:
-                    print(f"La table '{table_name}' existe déjà.")
-                else:
-                    try:
-                        columns = {}
-                        for column in df.columns:
-                            new_name = input(f"Entrez un nom pour la colonne '{column}' : ")
-                            columns[column] = new_name
-
-                        df.rename(columns=columns, inplace=True)
-
-                        # Création de la table avec une colonne 'id' auto-incrémentée
-                        column_definitions = ", ".join([f"[{col}] NVARCHAR(MAX)" for col in df.columns])
-                        create_table_query = f"""
-                            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{table_name}' AND xtype='U')
-                            CREATE TABLE {table_name} (
-                                id INT IDENTITY(1,1) PRIMARY KEY,
-                                {column_definitions}
-                            );
-                        """
-                        cursor.execute(create_table_query)
-                        conn.commit()
-                        print(f"Table '{table_name}' créée avec succès.")
-                    except Exception as e:
-                        print(f"Erreur lors de la création de la table '{table_name}': {e}")
+            # Vérification de l'existence de la table (cache des schémas)
+            if self.schema_cache.exists(table_name):
+                log.info(f"La table '{table_name}' existe déjà.")
+                return
+
+            try:
+                # Proposer un type par colonne, puis faire confirmer ou modifier les noms et les types
+                with metrics.timer("infer", table=table_name):
+                    column_types = self.type_inferer.infer(df)
+                columns, column_types = self.type_inferer.confirm(column_types)
+
+                df.rename(columns=columns, inplace=True)
+
+                # Création de la table avec une colonne 'id' auto-incrémentée
+                self.sink.create_table(table_name, column_types)
+                log.info(f"Table '{table_name}' créée avec succès.")
+            except Exception as e:
+                log.error(f"Erreur lors de la création de la table '{table_name}': {e}")
         except Exception as e:
-            print(f"Erreur lors de la vérification ou de la création de la table '{table_name}': {e}")
+            log.error(f"Erreur lors de la vérification ou de la création de la table '{table_name}': {e}")
 
     def delete_file(self, file_path):
         """
@@ -204,52 +173,339 @@ class EmailDataInserter:
         """
         try:
             os.remove(file_path)
-            print(f"Fichier {file_path} supprimé avec succès.")
+            self.file_reader.forget(file_path)
+            log.info(f"Fichier {file_path} supprimé avec succès.")
+        except Exception as e:
+            log.error(f"Erreur lors de la suppression du fichier {file_path}: {e}")
+
+    def process_email_attachments(self, pipelined=None):
+        """
+        Traitement des emails reçus depuis la dernière exécution, récupère les fichiers joints et insère leurs données dans la table.
+        En mode pipeline, le téléchargement et l'insertion se déroulent en même temps (voir `run_pipeline`).
+        :param pipelined: True pour activer le mode pipeline (EMAIL_PIPELINE, désactivé par défaut).
+        """
+        if pipelined is None:
+            pipelined = os.getenv("EMAIL_PIPELINE", "0") == "1"
+        self.summary = IngestSummary()
+        self.schema_cache.load()
+
+        # Fichiers joints restés sur disque après un échec lors d'une exécution précédente :
+        # leurs emails ne seront plus téléchargés, ils sont donc repris ici
+        leftovers = sorted(
+            path for path in (os.path.join(self.save_dir, f) for f in os.listdir(self.save_dir))
+            if os.path.isfile(path)
+        )
+
+        try:
+            if pipelined:
+                self.run_pipeline(leftovers)
+            else:
+                for file_path in leftovers:
+                    self.timed_process({"file_path": file_path, "content": None})
+
+                # Chaque pièce jointe est traitée dès son téléchargement
+                emails = self.iter_attachments()
+                while True:
+                    email_info = self.timed_next(emails)
+                    if email_info is None:
+                        break
+                    self.timed_process(email_info)
+        finally:
+            self.summary.report()
+            metrics.write_textfile()
+
+    def timed_next(self, emails):
+        """
+        Retourne la pièce jointe suivante du générateur `iter_attachments` (None à la fin ou en cas
+        d'erreur) et comptabilise le temps de téléchargement.
+        :param emails: Générateur retourné par `iter_attachments`.
+        """
+        start = time.perf_counter()
+        try:
+            return next(emails, None)
         except Exception as e:
-            print(f"Erreur lors de la suppression du fichier {file_path}: {e}")
+            log.error(f"Erreur lors de la récupération des emails : {e}")
+            return None
+        finally:
+            seconds = time.perf_counter() - start
+            self.summary.add_stage_time("téléchargement", seconds)
+            metrics.observe("etl_stage_seconds", seconds, stage="imap_fetch")
+
+    def timed_process(self, email_info):
+        """
+        Traite une pièce jointe et comptabilise le temps de lecture et d'insertion.
+        :param email_info: Dictionnaire contenant `file_path` et `content`.
+        """
+        start = time.perf_counter()
+        try:
+            self.process_attachment(email_info["file_path"], email_info.get("content"))
+        finally:
+            self.attachment_done(email_info)
+        self.summary.add_stage_time("lecture et insertion", time.perf_counter() - start)
 
-    def process_email_attachments(self):
+    def attachment_done(self, email_info):
+        """
+        Enregistre la fin du traitement d'une pièce jointe (insérée ou mise en quarantaine). Le message
+        est acquitté auprès d'ImapFetcher lorsque toutes ses pièces jointes sont traitées.
+        :param email_info: Pièce jointe produite par `iter_attachments` (sans `uid` pour un fichier resté sur disque).
+        """
+        uid = email_info.get("uid")
+        if uid is None:
+            return
+        with self._remaining_guard:
+            self._remaining[uid] -= 1
+            done = not self._remaining[uid]
+            if done:
+                del self._remaining[uid]
+        if done:
+            self.imap_fetcher.acknowledge(uid)
+
+    def drop(self, email_info):
         """
-        Traitement des emails reçus dans la dernière heure, récupère les fichiers joints et insère leurs données dans la table.
+        Met en quarantaine une pièce jointe retirée de la file sans être traitée (arrêt du pipeline).
         """
-        emails_with_attachments = self.retrieve_emails()
+        self.quarantine(email_info["file_path"], email_info.get("content"))
+        self.attachment_done(email_info)
 
-        for email_info in emails_with_attachments:
-            file_path = email_info["file_path"]
-            print(f"Traitement du fichier joint : {file_path}")
+    def run_pipeline(self, leftovers, workers=None, queue_size=None):
+        """
+        Traite les pièces jointes en pipeline : un thread télécharge les nouveaux emails et dépose les
+        pièces jointes dans une file bornée, pendant que des workers les lisent et les insèrent.
+        Quand la file est pleine, le téléchargement attend : le nombre de pièces jointes en attente
+        (en mémoire ou sur disque) reste limité. Les temps de chaque étape sont ajoutés au récapitulatif.
+        Après une erreur fatale, les pièces jointes encore dans la file sont mises en quarantaine.
+        :param leftovers: Fichiers joints restés sur disque, traités en premier.
+        :param workers: Nombre de workers d'insertion (EMAIL_WORKERS, 2 par défaut).
+        :param queue_size: Taille maximale de la file (EMAIL_QUEUE_SIZE, 4 par défaut).
+        """
+        workers = int(workers or os.getenv("EMAIL_WORKERS", 2))
+        attachments = queue.Queue(maxsize=int(queue_size or os.getenv("EMAIL_QUEUE_SIZE", 4)))
+        stop = threading.Event()
+        errors = []
+
+        def put(item):
+            # Attente bornée pour pouvoir abandonner si les workers se sont arrêtés
+            while not stop.is_set():
+                try:
+                    attachments.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
 
-            # Lire le fichier (Excel ou CSV)
+        def produce():
             try:
-                if file_path.endswith((".xlsx", ".xls")):
-                    df = pd.read_excel(file_path)
-                elif file_path.endswith(".csv"):
-                    with open(file_path, 'r') as file_csv:
-                        dialect = csv.Sniffer().sniff(file_csv.read(1024))
-                        file_csv.seek(0)
-                        df = pd.read_csv(file_csv, sep=dialect.delimiter)
-                else:
-                    print(f"Format non supporté pour le fichier : {file_path}")
+                for file_path in leftovers:
+                    put({"file_path": file_path, "content": None})
+
+                emails = self.iter_attachments()
+                while not stop.is_set():
+                    email_info = self.timed_next(emails)
+                    if email_info is None:
+                        break
+                    start = time.perf_counter()
+                    put(email_info)
+                    self.summary.add_stage_time("file pleine (téléchargement en attente)", time.perf_counter() - start)
+                emails.close()
+            finally:
+                for _ in range(workers):
+                    put(None)
+
+        def consume():
+            while True:
+                start = time.perf_counter()
+                try:
+                    # Attente bornée : après un arrêt, les marqueurs de fin ne sont plus déposés
+                    email_info = attachments.get(timeout=0.5)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
                     continue
-            except Exception as e:
-                continue
-
-            # Vérifier le nom du fichier pour insérer dans la bonne table
-            filename = os.path.basename(file_path)
-            if filename.startswith("solde"):
-                print(f"Le fichier {filename} commence par 'solde'. Vérification et insertion dans 'solde_per_heure'.")
-                self.check_table('solde_per_heure', df)
-                success = self.insert_data_into_table('solde_per_heure', df)
-                if success:
-                    self.delete_file(file_path)
-            elif filename.startswith("TELEPIN_BALANCE"):
-                print(f"Le fichier {filename} commence par 'TELEPIN_BALANCE'. Vérification et insertion dans 'telepin_balance'.")
-                self.check_table('telepin_balance', df)
-                success = self.insert_data_into_table('telepin_balance', df)
-                if success:
+                finally:
+                    self.summary.add_stage_time("file vide (insertion en attente)", time.perf_counter() - start)
+                if email_info is None:
+                    return
+                if stop.is_set():
+                    self.drop(email_info)
+                    continue
+                try:
+                    self.timed_process(email_info)
+                except Exception as e:
+                    log.error(f"Erreur fatale, arrêt du pipeline : {e}")
+                    errors.append(e)
+                    stop.set()
+                    return
+
+        self.pool.max_size = max(self.pool.max_size, workers)
+        for stage in ("lecture et insertion", "file vide (insertion en attente)"):
+            self.summary.set_stage_workers(stage, workers)
+        threads = [threading.Thread(target=produce, name="imap-fetch")]
+        threads += [threading.Thread(target=consume, name=f"insert-{i}") for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Pièces jointes déposées après le départ des workers
+        while True:
+            try:
+                email_info = attachments.get_nowait()
+            except queue.Empty:
+                break
+            if email_info is not None:
+                self.drop(email_info)
+        if errors:
+            raise errors[0]
+
+    def table_for_file(self, filename):
+        """
+        Détermine la table cible d'un fichier joint d'après son nom, ou None s'il n'est pas reconnu.
+        :param filename: Nom du fichier joint.
+        """
+        if filename.startswith("solde"):
+            log.info(f"Le fichier {filename} commence par 'solde'. Vérification et insertion dans 'solde_per_heure'.")
+            return 'solde_per_heure'
+        if filename.startswith("TELEPIN_BALANCE"):
+            log.info(f"Le fichier {filename} commence par 'TELEPIN_BALANCE'. Vérification et insertion dans 'telepin_balance'.")
+            return 'telepin_balance'
+        log.warning(f"Le fichier {filename} ne correspond à aucun format connu.")
+        return None
+
+    def process_attachment(self, file_path, content=None):
+        """
+        Insère un fichier joint dans sa table, en s'appuyant sur le manifeste pour ignorer un fichier
+        déjà ingéré ou reprendre un fichier partiellement ingéré. Une pièce jointe gardée en mémoire
+        qui n'a pas pu être insérée est mise en quarantaine sur disque pour être reprise plus tard.
+        :param file_path: Chemin du fichier joint (enregistré, ou prévu en cas de mise en quarantaine).
+        :param content: Contenu de la pièce jointe en mémoire (octets), ou None si elle est sur disque.
+        """
+        log.info(f"Traitement du fichier joint : {file_path}")
+
+        # Vérifier le nom du fichier pour insérer dans la bonne table
+        table_name = self.table_for_file(os.path.basename(file_path))
+        if table_name is None:
+            self.quarantine(file_path, content)
+            return
+
+        # Les fichiers d'une même table sont insérés un par un, même en mode pipeline
+        with self._table_locks_guard:
+            table_lock = self._table_locks.setdefault(table_name, threading.Lock())
+        with table_lock:
+            try:
+                success = self.insert_attachment(file_path, table_name, content)
+            except BaseException:
+                self.quarantine(file_path, content)
+                raise
+        if not success:
+            self.quarantine(file_path, content)
+
+    def insert_attachment(self, file_path, table_name, content=None, member=None):
+        """
+        Lit un fichier joint par blocs, depuis le disque ou la mémoire, et l'insère dans sa table.
+        Une pièce jointe compressée (.gz, .bz2) est décompressée en flux pendant sa lecture ; une archive .zip
+        est insérée fichier par fichier (`insert_archive`).
+        :param file_path: Chemin du fichier joint.
+        :param table_name: Nom de la table cible.
+        :param content: Contenu de la pièce jointe en mémoire (octets), ou None si elle est sur disque.
+        :param member: Fichier d'une archive .zip à insérer seul (l'archive n'est alors pas supprimée), ou None.
+        :return: True si le fichier est inséré (ou l'avait déjà été).
+        """
+        if member is None and self.file_reader.is_archive(file_path):
+            return self.insert_archive(file_path, table_name, content)
+        # Lire le fichier (Excel ou CSV) par blocs ; le premier bloc sert à vérifier la table
+        try:
+            if not self.file_reader.is_supported(file_path):
+                log.warning(f"Format non supporté pour le fichier : {file_path}")
+                return False
+            # Chaque fichier d'une archive a sa propre entrée dans le manifeste
+            label = table_name if member is None else f"{table_name}#{member}"
+            with metrics.timer("manifest", table=table_name):
+                entry = self.manifest.begin(file_path, label, content)
+            if entry.status == "done":
+                log.info(f"Fichier {file_path} déjà inséré dans '{label}' (manifeste), ignoré.")
+                if content is None and member is None:
                     self.delete_file(file_path)
-            else:
-                print(f"Le fichier {filename} ne correspond à aucun format connu.")
+                return True
+            if member is None:
+                size = len(content) if content is not None else os.path.getsize(file_path)
+                metrics.inc("etl_bytes_read_total", size, table=table_name)
+            chunks = metrics.timed_iter(
+                self.file_reader.iter_file(file_path, content=content, dialect_key=table_name, member=member),
+                "parse", table=table_name)
+            if entry.rows_committed:
+                log.info(f"Reprise du fichier {file_path} après {entry.rows_committed} lignes déjà insérées.")
+                chunks = self.file_reader.skip_rows(chunks, entry.rows_committed)
+            df = next(chunks)
+        except Exception as e:
+            log.error(f"Erreur lors de la lecture du fichier {file_path}: {e}")
+            self.summary.add_file(table_name, False)
+            return False
+        data = itertools.chain([df], chunks)
+
+        self.check_table(table_name, df)
+        success = self.insert_data_into_table(
+            table_name, data,
+            on_commit=lambda rows: self.manifest.checkpoint(entry, entry.rows_committed + rows))
+        self.summary.add_file(table_name, success)
+        if success:
+            self.manifest.complete(entry)
+            if content is None and member is None:
+                self.delete_file(file_path)
+        return success
+
+    def insert_archive(self, file_path, table_name, content=None):
+        """
+        Insère les fichiers de données d'une archive .zip jointe, un par un, dans la table de la pièce jointe.
+        Chaque fichier est décompressé en flux pendant sa lecture et son extension détermine son format.
+        L'archive n'est considérée comme insérée que lorsque tous ses fichiers le sont ; sinon elle est mise
+        en quarantaine et seuls les fichiers manquants seront repris (manifeste, `table#fichier`).
+        :param file_path: Chemin de l'archive jointe.
+        :param table_name: Nom de la table cible.
+        :param content: Contenu de l'archive en mémoire (octets), ou None si elle est sur disque.
+        :return: True si tous les fichiers de l'archive sont insérés.
+        """
+        try:
+            members = self.file_reader.archive_members(file_path, content)
+        except Exception as e:
+            log.error(f"Erreur lors de la lecture de l'archive {file_path}: {e}")
+            self.summary.add_file(table_name, False)
+            return False
+        if not members:
+            log.warning(f"Aucun fichier pris en charge dans l'archive {file_path}.")
+            self.summary.add_file(table_name, False)
+            return False
+        size = len(content) if content is not None else os.path.getsize(file_path)
+        metrics.inc("etl_bytes_read_total", size, table=table_name)
+
+        inserted = 0
+        for member in members:
+            inserted += bool(self.insert_attachment(file_path, table_name, content, member))
+        if inserted < len(members):
+            log.warning(f"Archive {file_path} : {inserted}/{len(members)} fichiers insérés.")
+            return False
+        if content is None:
+            self.delete_file(file_path)
+        return True
+
+    def quarantine(self, file_path, content):
+        """
+        Écrit sur disque une pièce jointe gardée en mémoire qui n'a pas pu être traitée ; elle sera
+        reprise avec les fichiers restés dans `save_dir` lors de l'exécution suivante.
+        :param file_path: Chemin d'enregistrement.
+        :param content: Contenu de la pièce jointe, ou None si elle est déjà sur disque.
+        """
+        if content is None:
+            return
+        try:
+            with open(file_path, "wb") as f:
+                f.write(content)
+            log.warning(f"Fichier {file_path} mis en quarantaine sur disque.")
+        except Exception as e:
+            log.error(f"Erreur lors de la mise en quarantaine du fichier {file_path}: {e}")
+
 # Utilisation
 if __name__ == "__main__":
-    inserter = EmailDataInserter()
-    inserter.process_email_attachments()
+    with profiled():
+        inserter = EmailDataInserter()
+        inserter.process_email_attachments()
+        inserter.pool.report()
+        inserter.pool.close_all()
+        inserter.manifest.close()
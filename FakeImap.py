@@ -0,0 +1,77 @@
+import re
+import base64
+
+
+class FakeImap:
+    """
+    Serveur IMAP simulé en mémoire : répond aux commandes utilisées par `ImapFetcher`
+    (UID SEARCH, UID FETCH BODYSTRUCTURE / BODY.PEEK[partie]) avec le format de réponse d'imaplib.
+    Utilisé par `Benchmark.py` et par les tests, sans serveur de messagerie.
+    """
+
+    def __init__(self, messages, uid_validity=1):
+        self.messages = {uid: (subject, attachments) for uid, subject, attachments in messages}
+        self.validity = uid_validity
+        self.fetches = 0
+
+    def login(self, user, password):
+        return "OK", [b"LOGIN completed"]
+
+    def select(self, mailbox="INBOX"):
+        return "OK", [str(len(self.messages)).encode()]
+
+    def response(self, code):
+        if code == "UIDVALIDITY":
+            return code, [str(self.validity).encode()]
+        return code, [None]
+
+    def status(self, mailbox, names):
+        return "OK", [f"INBOX (UIDVALIDITY {self.validity})".encode()]
+
+    def logout(self):
+        return "BYE", [b"LOGOUT completed"]
+
+    def uid(self, command, *args):
+        command = command.upper()
+        if command == "SEARCH":
+            criteria = args[-1]
+            uids = sorted(self.messages)
+            if criteria.startswith("UID "):
+                first = int(criteria[4:].split(":")[0])
+                # Comme un vrai serveur, `n:*` retourne au moins le dernier message
+                uids = [uid for uid in uids if uid >= first] or uids[-1:]
+            return "OK", [" ".join(str(uid) for uid in uids).encode()]
+        if command == "FETCH":
+            self.fetches += 1
+            uid_set, items = args
+            uids = [int(uid) for uid in uid_set.split(",")]
+            if "BODYSTRUCTURE" in items:
+                return "OK", self._structures(uids)
+            return "OK", self._bodies(uids[0], re.findall(r"BODY\.PEEK\[([^\]]+)\]", items))
+        return "NO", [b"Unsupported command"]
+
+    def _structures(self, uids):
+        data = []
+        for sequence, uid in enumerate(uids, start=1):
+            subject, attachments = self.messages[uid]
+            parts = ['("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 2 1 NIL NIL NIL NIL)']
+            for filename, payload in attachments:
+                size = len(payload) * 4 // 3
+                parts.append(f'("application" "octet-stream" ("name" "{filename}") NIL NIL "base64" {size} NIL '
+                             f'("attachment" ("filename" "{filename}")) NIL NIL)')
+            structure = f'({"".join(parts)} "mixed" ("boundary" "x") NIL NIL NIL)'
+            header = f"Subject: {subject}\r\n\r\n".encode()
+            data.append((f"{sequence} (UID {uid} BODYSTRUCTURE {structure} "
+                         f"BODY[HEADER.FIELDS (SUBJECT)] {{{len(header)}}}".encode(), header))
+            data.append(b")")
+        return data
+
+    def _bodies(self, uid, sections):
+        subject, attachments = self.messages[uid]
+        data = []
+        for index, section in enumerate(sections):
+            payload = base64.encodebytes(attachments[int(section) - 2][1])
+            prefix = f"1 (UID {uid} " if index == 0 else " "
+            data.append((f"{prefix}BODY[{section}] {{{len(payload)}}}".encode(), payload))
+        data.append(b")")
+        return data
@@ -0,0 +1,674 @@
+import os
+import io
+import re
+import time
+import codecs
+import gzip
+import bz2
+import zipfile
+import pandas as pd
+import csv
+import openpyxl
+from Instrumentation import log, metrics
+from ParseCache import ParseCache
+
+
+CSV_DELIMITERS = ",;\t|"
+CSV_ENCODINGS = ("utf-8-sig", "cp1252", "latin-1")
+# Formats de données, reconnus à l'extension du fichier (ou du fichier compressé, ou du membre d'une archive)
+DATA_FORMATS = (".xlsx", ".xls", ".csv")
+# Compressions lues en flux, sans copie décompressée sur disque : `export.csv.gz` est lu comme un CSV
+COMPRESSIONS = {".gz": gzip, ".bz2": bz2}
+
+def parse_sheet_tables(value):
+    """
+    Lit la configuration SHEET_TABLES : "motif=table;motif2=table2", où chaque motif est une expression
+    régulière sur le nom entier de la feuille et la table peut contenir `{table}` (table du dossier)
+    et `{sheet}` (nom normalisé de la feuille). Une table vide ignore les feuilles correspondantes.
+    :return: Liste de (motif compilé, table).
+    """
+    rules = []
+    for entry in value.split(";"):
+        if not entry.strip():
+            continue
+        pattern, separator, target = entry.rpartition("=")
+        if not separator:
+            raise ValueError(f"SHEET_TABLES : règle sans table ('{entry.strip()}'), format attendu motif=table.")
+        rules.append((re.compile(pattern.strip(), re.IGNORECASE), target.strip()))
+    return rules
+
+
+def first_record_end(data):
+    """
+    Position qui suit le premier enregistrement CSV (ligne d'en-tête) : le premier saut de ligne
+    hors d'une valeur entre guillemets, ou la fin des données.
+    """
+    quotes, position = 0, 0
+    while True:
+        newline = data.find(b"\n", position)
+        if newline < 0:
+            return len(data)
+        quotes += data.count(b'"', position, newline)
+        position = newline + 1
+        if quotes % 2 == 0:
+            return position
+
+
+def last_record_end(data):
+    """
+    Position qui suit le dernier enregistrement CSV complet de données commençant par un enregistrement :
+    le dernier saut de ligne hors d'une valeur entre guillemets (guillemets en nombre pair avant lui), ou 0.
+    """
+    quotes, position = data.count(b'"'), len(data)
+    while True:
+        newline = data.rfind(b"\n", 0, position)
+        if newline < 0:
+            return 0
+        quotes -= data.count(b'"', newline, position)
+        if quotes % 2 == 0:
+            return newline + 1
+        position = newline
+
+
+# Lecteur propre à chaque processus de lecture (`parse_in_worker`), qui conserve ses dialectes CSV
+_worker_reader = None
+
+
+class FileReader:
+    def __init__(self, chunksize=None, cache=None, engine=None, dialects=None):
+        """
+        Initialise le lecteur de fichiers utilisé par les classes d'insertion.
+        :param chunksize: Nombre de lignes par bloc lu (READ_CHUNK_SIZE, 50000 par défaut).
+        :param cache: Cache des fichiers lus (ParseCache) ; par défaut celui de PARSE_CACHE_DIR, s'il est défini.
+        :param engine: Lecteur CSV : auto, pyarrow ou pandas (CSV_ENGINE, auto par défaut).
+        :param dialects: Dialectes CSV déjà détectés, partagés avec un autre lecteur.
+        """
+        self.chunksize = int(chunksize or os.getenv("READ_CHUNK_SIZE", 50000))
+        self.cache = cache if cache is not None else ParseCache.from_env()
+        # Lecteur CSV : pyarrow (multi-thread) s'il est installé, sinon pandas (CSV_ENGINE=auto|pyarrow|pandas)
+        self.arrow_csv = None
+        if (engine or os.getenv("CSV_ENGINE", "auto")).lower() != "pandas":
+            try:
+                import pyarrow.csv
+                self.arrow_csv = pyarrow.csv
+            except ImportError:
+                pass
+        # Taille des tranches analysées par pyarrow : la mémoire d'une lecture est bornée par une tranche (CSV_ARROW_SLICE_MB)
+        self.arrow_slice_bytes = max(int(float(os.getenv("CSV_ARROW_SLICE_MB", 16)) * 1024 * 1024), 1)
+        self.sniff_bytes = int(os.getenv("CSV_SNIFF_BYTES", 65536))
+        # READ_MODE=schema : les colonnes sont lues sans inférence des types (texte pour les CSV, valeurs
+        # des cellules telles quelles pour les classeurs) et converties par la base selon le type de la table
+        self.infer_types = os.getenv("READ_MODE", "infer").lower() != "schema"
+        # SHEET_MODE=all : chaque feuille des classeurs est insérée, dans la table choisie par SHEET_TABLES
+        self.all_sheets = os.getenv("SHEET_MODE", "first").lower() == "all"
+        self.sheet_tables = parse_sheet_tables(os.getenv("SHEET_TABLES", ""))
+        # Dialecte détecté par dossier (ou par table) : {clé: (séparateur, encodage)}
+        self._dialects = dialects if dialects is not None else {}
+
+    def is_supported(self, file_path):
+        """
+        Indique si le format du fichier est pris en charge : fichier de données, éventuellement compressé
+        (.gz, .bz2), ou archive .zip.
+        :param file_path: Chemin ou nom du fichier.
+        """
+        return self.is_archive(file_path) or self.data_name(file_path).endswith(DATA_FORMATS)
+
+    def is_archive(self, file_path):
+        """
+        Indique si le fichier est une archive .zip, dont chaque fichier de données est lu séparément.
+        :param file_path: Chemin ou nom du fichier.
+        """
+        return file_path.endswith(".zip")
+
+    def data_name(self, file_path, member=None):
+        """
+        Nom dont l'extension détermine le format des données : le membre lu d'une archive, ou le nom
+        du fichier sans son extension de compression (`export.csv` pour `export.csv.gz`).
+        :param file_path: Chemin ou nom du fichier.
+        :param member: Membre d'une archive .zip, ou None.
+        """
+        if member is not None:
+            return member
+        for extension in COMPRESSIONS:
+            if file_path.endswith(extension):
+                return file_path[:-len(extension)]
+        return file_path
+
+    def archive_members(self, file_path, content=None):
+        """
+        Retourne les fichiers de données d'une archive .zip, dans l'ordre de l'archive. Les dossiers
+        et les fichiers d'un autre format (y compris les fichiers compressés) sont ignorés.
+        :param file_path: Chemin de l'archive.
+        :param content: Contenu de l'archive déjà en mémoire (octets), ou None pour la lire sur disque.
+        """
+        with zipfile.ZipFile(self.open_binary(file_path, content)) as archive:
+            members = []
+            for info in archive.infolist():
+                if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                    continue
+                if info.filename.endswith(DATA_FORMATS):
+                    members.append(info.filename)
+                else:
+                    log.info(f"Fichier {info.filename} de l'archive {file_path} ignoré (format non supporté).")
+            return members
+
+    def is_multi_sheet(self, file_path, member=None):
+        """
+        Indique si toutes les feuilles du classeur sont à insérer (SHEET_MODE=all), et non la première seule.
+        :param file_path: Chemin ou nom du fichier.
+        :param member: Membre d'une archive .zip, ou None.
+        """
+        return self.all_sheets and self.data_name(file_path, member).endswith((".xlsx", ".xls"))
+
+    def sheet_names(self, file_path, content=None, member=None):
+        """
+        Retourne les noms des feuilles d'un classeur, dans l'ordre du classeur.
+        :param file_path: Chemin du fichier Excel.
+        :param content: Contenu du fichier déjà en mémoire (octets), ou None pour le lire sur disque.
+        :param member: Membre d'une archive .zip, ou None.
+        """
+        source = self.workbook_source(file_path, content, member)
+        if self.data_name(file_path, member).endswith(".xls"):
+            return pd.ExcelFile(source).sheet_names
+        workbook = openpyxl.load_workbook(source, read_only=True)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+
+    def sheet_targets(self, file_path, table_name, normalize, member=None):
+        """
+        Associe chaque feuille d'un classeur à sa table : première règle de SHEET_TABLES dont le motif
+        correspond au nom de la feuille, sinon la table du dossier. Une règle sans table ignore la feuille.
+        :param file_path: Chemin du fichier Excel.
+        :param table_name: Table du dossier du classeur (`{table}` dans les règles).
+        :param normalize: Fonction de normalisation des noms de tables (`{sheet}` dans les règles).
+        :param member: Membre d'une archive .zip, ou None.
+        :return: Liste de (feuille, table).
+        """
+        targets = []
+        for sheet in self.sheet_names(file_path, member=member):
+            template = next((target for pattern, target in self.sheet_tables if pattern.fullmatch(sheet)), "{table}")
+            if template:
+                targets.append((sheet, template.replace("{table}", table_name).replace("{sheet}", normalize(sheet))))
+        return targets
+
+    def detect_dialect(self, file_path, content=None, member=None):
+        """
+        Détecte l'encodage et le séparateur d'un CSV à partir de son début (CSV_SNIFF_BYTES, 64 Ko par défaut) :
+        le premier encodage de CSV_ENCODINGS qui décode l'échantillon est retenu, puis le séparateur est
+        recherché parmi CSV_DELIMITERS sur les lignes complètes de l'échantillon.
+        :param file_path: Chemin du fichier CSV.
+        :param content: Contenu du fichier déjà en mémoire (octets), ou None pour le lire sur disque.
+        :param member: Membre d'une archive .zip, ou None.
+        :return: (séparateur, encodage).
+        """
+        with self.open_stream(file_path, content, member) as f:
+            sample = f.read(self.sniff_bytes)
+
+        for encoding in CSV_ENCODINGS:
+            try:
+                text = codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+                break
+            except UnicodeDecodeError:
+                continue
+        lines = text.splitlines(keepends=True)
+        if len(sample) == self.sniff_bytes and len(lines) > 1:
+            lines = lines[:-1]
+        dialect = csv.Sniffer().sniff("".join(lines[:100]), delimiters=CSV_DELIMITERS)
+        return dialect.delimiter, encoding
+
+    def dialect(self, file_path, content=None, key=None, refresh=False, member=None):
+        """
+        Retourne le dialecte (séparateur, encodage) d'un CSV. Les fichiers d'un même dossier (ou d'une même
+        table) partagent le même dialecte : il n'est détecté que pour le premier fichier, ou à nouveau si
+        `refresh` est vrai (lecture en échec avec le dialecte en cache).
+        :param file_path: Chemin du fichier CSV.
+        :param content: Contenu du fichier déjà en mémoire (octets), ou None pour le lire sur disque.
+        :param key: Clé du dialecte en cache (dossier du fichier par défaut).
+        :param refresh: True pour ignorer le dialecte en cache.
+        :param member: Membre d'une archive .zip, ou None.
+        """
+        key = key or os.path.dirname(os.path.abspath(file_path))
+        dialect = None if refresh else self._dialects.get(key)
+        if dialect is None:
+            with metrics.timer("sniff"):
+                dialect = self.detect_dialect(file_path, content, member)
+            self._dialects[key] = dialect
+        elif dialect[1] != "utf-8-sig" and self._starts_with_bom(file_path, content, member):
+            # Un fichier UTF-8 avec BOM dans un dossier dont le dialecte a été détecté sur un autre encodage
+            dialect = (dialect[0], "utf-8-sig")
+        return dialect
+
+    def _starts_with_bom(self, file_path, content=None, member=None):
+        with self.open_stream(file_path, content, member) as f:
+            return f.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8
+
+    def open_binary(self, file_path, content=None, member=None):
+        """
+        Retourne la source binaire d'un fichier : son chemin, ou un tampon mémoire sur son contenu.
+        Un fichier compressé (.gz, .bz2) ou un membre d'une archive .zip est décompressé en flux,
+        au fil de la lecture, sans copie sur disque.
+        :param file_path: Chemin du fichier.
+        :param content: Contenu du fichier (octets), ou None pour le lire sur disque.
+        :param member: Membre d'une archive .zip, ou None.
+        """
+        source = file_path if content is None else io.BytesIO(content)
+        if member is not None:
+            # Le membre reste lisible après la fermeture de l'archive, qui ne ferme le fichier qu'après lui
+            with zipfile.ZipFile(source) as archive:
+                return archive.open(member)
+        for extension, module in COMPRESSIONS.items():
+            if file_path.endswith(extension):
+                return module.open(source)
+        return source
+
+    def open_stream(self, file_path, content=None, member=None):
+        """
+        Ouvre la source binaire d'un fichier (`open_binary`) comme un flux à fermer après lecture.
+        """
+        source = self.open_binary(file_path, content, member)
+        return open(source, 'rb') if isinstance(source, str) else source
+
+    def is_compressed(self, file_path, member=None):
+        """
+        Indique si les données d'un fichier sont lues en flux décompressé (fichier .gz, .bz2 ou membre d'une archive).
+        """
+        return member is not None or self.data_name(file_path) != file_path
+
+    def data_size(self, file_path, content=None, member=None):
+        """
+        Taille des données décompressées d'un fichier, ou None si elle n'est connue qu'en lisant tout le flux (.gz, .bz2).
+        """
+        if member is not None:
+            with zipfile.ZipFile(self.open_binary(file_path, content)) as archive:
+                return archive.getinfo(member).file_size
+        if self.is_compressed(file_path):
+            return None
+        return len(content) if content is not None else os.path.getsize(file_path)
+
+    def workbook_source(self, file_path, content=None, member=None):
+        """
+        Source d'un classeur. La lecture d'un classeur demande un accès direct à tout le fichier : un classeur
+        compressé ou membre d'une archive est donc décompressé en mémoire (jamais sur disque).
+        """
+        if not self.is_compressed(file_path, member):
+            return self.open_binary(file_path, content)
+        with self.open_stream(file_path, content, member) as f:
+            return io.BytesIO(f.read())
+
+    def iter_csv(self, file_path, content=None, dialect_key=None, member=None):
+        """
+        Lit un CSV par blocs de `chunksize` lignes, avec le dialecte en cache de son dossier (ou de sa table).
+        Si la lecture échoue avant le premier bloc, ou ne trouve qu'une colonne, avec un dialecte en cache,
+        le dialecte est détecté à nouveau sur ce fichier et la lecture recommence.
+        :param file_path: Chemin du fichier CSV.
+        :param content: Contenu du fichier déjà en mémoire (octets), ou None pour le lire sur disque.
+        :param dialect_key: Clé du dialecte en cache (dossier du fichier par défaut).
+        :param member: Membre d'une archive .zip, ou None.
+        """
+        key = dialect_key or os.path.dirname(os.path.abspath(file_path))
+        if key in self._dialects:
+            chunks = self.read_csv(file_path, content, *self.dialect(file_path, content, key=key, member=member),
+                                   member=member)
+            try:
+                first = next(chunks, None)
+            except Exception as e:
+                first = e
+            if isinstance(first, pd.DataFrame) and len(first.columns) > 1:
+                yield first
+                yield from self._forget_dialect_on_error(chunks, key)
+                return
+            chunks.close()
+            if first is None:
+                return
+            log.info(f"Dialecte en cache inadapté au fichier {file_path} ({first if isinstance(first, Exception) else 'une seule colonne'}), nouvelle détection.")
+
+        delimiter, encoding = self.dialect(file_path, content, key=key, refresh=True, member=member)
+        yield from self._forget_dialect_on_error(self.read_csv(file_path, content, delimiter, encoding, member), key)
+
+    def _forget_dialect_on_error(self, chunks, key):
+        """
+        Transmet les blocs d'une lecture ; en cas d'erreur, le dialecte en cache est oublié
+        pour être détecté à nouveau sur le fichier suivant.
+        """
+        try:
+            yield from chunks
+        except Exception:
+            self._dialects.pop(key, None)
+            raise
+
+    def read_csv(self, file_path, content, delimiter, encoding, member=None):
+        """
+        Lit un CSV par blocs de DataFrame de `chunksize` lignes : avec pyarrow (analyse multi-threads de tranches
+        de CSV_ARROW_SLICE_MB) si disponible, sinon avec pandas. Dans les deux cas, la mémoire utilisée ne dépend
+        pas de la taille du fichier, y compris pour un CSV compressé (.gz, .bz2) ou membre d'une archive.
+        :param file_path: Chemin du fichier CSV.
+        :param content: Contenu du fichier déjà en mémoire (octets), ou None pour le lire sur disque.
+        :param delimiter: Séparateur des colonnes.
+        :param encoding: Encodage du fichier.
+        :param member: Membre d'une archive .zip, ou None.
+        """
+        if self.arrow_csv is not None:
+            yield from self._read_csv_arrow(file_path, content, delimiter, encoding, member)
+            return
+        # Sans inférence (READ_MODE=schema), toutes les colonnes restent du texte ; seules les valeurs
+        # vides ou manquantes (NA, NULL...) deviennent nulles
+        dtype = None if self.infer_types else str
+        with self.open_stream(file_path, content, member) as source:
+            for chunk in pd.read_csv(source, sep=delimiter, encoding=encoding, dtype=dtype, chunksize=self.chunksize):
+                yield chunk
+
+    def _read_csv_arrow(self, file_path, content, delimiter, encoding, member=None):
+        """
+        Lecture pyarrow par tranches : le fichier est découpé en tranches d'environ CSV_ARROW_SLICE_MB, coupées
+        après un enregistrement complet ; chaque tranche, précédée de la ligne d'en-tête, est analysée par
+        le lecteur multi-threads de pyarrow, puis découpée en blocs de `chunksize` lignes.
+        Comme avec pandas, les valeurs vides deviennent nulles et les dates restent du texte. Les types sont
+        déduits de la première tranche ; une tranche suivante qui ne s'y conforme pas est lue en texte, comme
+        toutes celles qui la suivent.
+        """
+        import pyarrow
+        arrow_csv = self.arrow_csv
+        read_options = arrow_csv.ReadOptions(use_threads=True, encoding="utf8" if encoding == "utf-8-sig" else encoding)
+        parse_options = arrow_csv.ParseOptions(delimiter=delimiter)
+
+        def parse(data, column_types=None):
+            return arrow_csv.read_csv(
+                pyarrow.BufferReader(data), read_options=read_options, parse_options=parse_options,
+                convert_options=arrow_csv.ConvertOptions(strings_can_be_null=True, column_types=column_types),
+            )
+
+        # Types imposés aux tranches suivantes : ceux de la première tranche (hors colonnes entièrement vides,
+        # dont le type est déduit tranche par tranche), ou du texte pour toutes les colonnes (READ_MODE=schema)
+        column_types = None
+        as_text = not self.infer_types
+        if as_text:
+            column_types = {name: pyarrow.string() for name in self._csv_header(file_path, content, delimiter, encoding, member)}
+        header, pending, read_rows = None, None, 0
+        with self.open_stream(file_path, content, member) as source:
+            for data in self._csv_slices(source):
+                if header is None:
+                    if data.startswith(codecs.BOM_UTF8):
+                        data = data[len(codecs.BOM_UTF8):]
+                    header = data[:first_record_end(data)]
+                    table = parse(data, column_types)
+                    if column_types is None:
+                        temporal = {field.name: pyarrow.string() for field in table.schema if pyarrow.types.is_temporal(field.type)}
+                        if temporal:
+                            table = parse(data, temporal)
+                        column_types = {field.name: field.type for field in table.schema if not pyarrow.types.is_null(field.type)}
+                else:
+                    try:
+                        table = parse(header + data, column_types)
+                    except pyarrow.ArrowInvalid as e:
+                        if as_text:
+                            raise
+                        log.info(f"{file_path} : valeurs non conformes aux types déduits du début du fichier ({e}), "
+                                 f"suite lue en texte à partir de la ligne {read_rows + 1}.")
+                        as_text = True
+                        column_types = {name: pyarrow.string() for name in table.column_names}
+                        table = parse(header + data, column_types)
+                read_rows += table.num_rows
+
+                # Les lignes restantes de la tranche précédente complètent le premier bloc de celle-ci
+                if pending is not None:
+                    if pending.schema.equals(table.schema):
+                        table = pyarrow.concat_tables([pending, table])
+                    elif pending.num_rows:
+                        yield pending.to_pandas()
+                start = 0
+                while table.num_rows - start >= self.chunksize:
+                    yield table.slice(start, self.chunksize).to_pandas()
+                    start += self.chunksize
+                pending = table.slice(start)
+        if header is None:
+            # Fichier vide : pyarrow lève son erreur habituelle
+            parse(b"")
+        if pending.num_rows or read_rows == 0:
+            yield pending.to_pandas()
+
+    def _csv_slices(self, source):
+        """
+        Découpe un flux CSV en tranches d'environ CSV_ARROW_SLICE_MB Mo, chacune formée d'enregistrements
+        complets (un saut de ligne dans une valeur entre guillemets ne coupe pas la tranche).
+        La première tranche commence par la ligne d'en-tête.
+        """
+        buffer = b""
+        while True:
+            data = source.read(self.arrow_slice_bytes)
+            buffer += data
+            end = len(buffer) if not data else last_record_end(buffer)
+            if end:
+                yield buffer[:end]
+                buffer = buffer[end:]
+            if not data:
+                return
+
+    def _csv_header(self, file_path, content, delimiter, encoding, member=None):
+        """
+        Noms des colonnes d'un CSV, tels qu'écrits sur sa première ligne.
+        """
+        with io.TextIOWrapper(self.open_stream(file_path, content, member), encoding=encoding, newline='') as f:
+            return next(csv.reader(f, delimiter=delimiter), [])
+
+    def iter_excel(self, file_path, header=0, content=None, sheet=None, member=None):
+        """
+        Lit une feuille (la première par défaut) d'un classeur .xlsx en lecture seule (openpyxl `read_only`),
+        ligne par ligne, et produit des blocs de `chunksize` lignes sans charger le classeur entier.
+        Les fichiers .xls, non pris en charge par openpyxl, sont lus avec pandas.
+        :param file_path: Chemin du fichier Excel.
+        :param header: 0 si la première ligne contient les noms de colonnes, None sinon.
+        :param content: Contenu du fichier déjà en mémoire (octets), ou None pour le lire sur disque.
+        :param sheet: Nom de la feuille, ou None pour la première.
+        :param member: Membre d'une archive .zip, ou None.
+        """
+        source = self.workbook_source(file_path, content, member)
+        if self.data_name(file_path, member).endswith(".xls"):
+            yield pd.read_excel(source, header=header, sheet_name=sheet or 0,
+                                dtype=None if self.infer_types else object)
+            return
+
+        workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+            rows = worksheet.iter_rows(values_only=True)
+            columns = None
+            if header is not None:
+                columns = self._header_names(next(rows, ()))
+
+            width = len(columns) if columns is not None else None
+            batch = []
+            produced = False
+            for row in rows:
+                row = self._trim(row)
+                if not row:
+                    continue
+                batch.append(row)
+                if len(batch) >= self.chunksize:
+                    width = width or max(len(r) for r in batch)
+                    yield self._to_frame(batch, columns, width)
+                    produced = True
+                    batch = []
+
+            if batch or not produced:
+                width = width or max((len(r) for r in batch), default=0)
+                yield self._to_frame(batch, columns, width)
+        finally:
+            workbook.close()
+
+    def read_header(self, file_path, sheet=None, member=None):
+        """
+        Retourne les noms de colonnes d'un fichier en ne lisant que sa ligne d'en-tête.
+        :param file_path: Chemin du fichier (Excel ou CSV).
+        :param sheet: Feuille d'un classeur, ou None pour la première.
+        :param member: Membre d'une archive .zip, ou None.
+        """
+        name = self.data_name(file_path, member)
+        if name.endswith(".xlsx"):
+            workbook = openpyxl.load_workbook(self.workbook_source(file_path, member=member), read_only=True, data_only=True)
+            try:
+                worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+                rows = worksheet.iter_rows(max_row=1, values_only=True)
+                return self._header_names(next(rows, ()))
+            finally:
+                workbook.close()
+        if name.endswith(".xls"):
+            return list(pd.read_excel(self.workbook_source(file_path, member=member), sheet_name=sheet or 0, nrows=0).columns)
+        if name.endswith(".csv"):
+            delimiter, encoding = self.dialect(file_path, member=member)
+            with self.open_stream(file_path, member=member) as f:
+                return list(pd.read_csv(f, sep=delimiter, encoding=encoding, nrows=0).columns)
+        raise ValueError(f"Format non supporté pour le fichier : {file_path}")
+
+    def read_sample(self, file_path, rows, excel_header=0, sheet=None, member=None):
+        """
+        Retourne les `rows` premières lignes d'un fichier (échantillon pour l'inférence des types).
+        Seul le début du fichier est lu, sauf avec le cache des fichiers lus : le fichier est alors lu en entier
+        et enregistré dans le cache, où l'insertion de ses données le retrouvera.
+        :param file_path: Chemin du fichier (Excel ou CSV).
+        :param rows: Nombre de lignes de l'échantillon.
+        :param excel_header: Ligne d'en-tête des fichiers Excel (None si aucune).
+        :param sheet: Feuille d'un classeur, ou None pour la première.
+        :param member: Membre d'une archive .zip, ou None.
+        """
+        if self.cache:
+            parts, count = [], 0
+            cached = self.cache.contains(file_path, self.cache_variant(sheet, member))
+            chunks = self.iter_file(file_path, excel_header=excel_header, sheet=sheet, member=member)
+            for chunk in chunks:
+                if count < rows:
+                    parts.append(chunk.head(rows - count))
+                    count += len(parts[-1])
+                elif cached:
+                    break
+            chunks.close()
+            if not parts:
+                return pd.DataFrame(columns=self.read_header(file_path, sheet, member))
+            return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+        reader = FileReader(chunksize=rows, cache=False, engine="pandas", dialects=self._dialects)
+        chunks = reader.iter_file(file_path, excel_header=excel_header, sheet=sheet, member=member)
+        try:
+            sample = next(chunks, None)
+        finally:
+            chunks.close()
+        if sample is None:
+            return pd.DataFrame(columns=self.read_header(file_path, sheet, member))
+        return sample
+
+    def _trim(self, row):
+        """
+        Supprime les cellules vides en fin de ligne (comme le fait pandas).
+        """
+        end = len(row)
+        while end and row[end - 1] is None:
+            end -= 1
+        return row[:end]
+
+    def _header_names(self, row):
+        """
+        Construit les noms de colonnes à partir de la ligne d'en-tête, à la manière de pandas.
+        """
+        return [f"Unnamed: {i}" if value is None else value for i, value in enumerate(self._trim(row))]
+
+    def _to_frame(self, batch, columns, width):
+        """
+        Construit un DataFrame de largeur fixe à partir d'un lot de lignes.
+        """
+        rows = [tuple(row[:width]) + (None,) * (width - len(row)) for row in batch]
+        return pd.DataFrame(rows, columns=columns if columns is not None else range(width),
+                            dtype=None if self.infer_types else object)
+
+    def skip_rows(self, chunks, count):
+        """
+        Ignore les `count` premières lignes de données d'une suite de blocs (reprise d'un fichier
+        partiellement ingéré). Un bloc vide est produit si toutes les lignes sont ignorées.
+        :param chunks: Itérable de DataFrame.
+        :param count: Nombre de lignes déjà ingérées.
+        """
+        last = None
+        produced = False
+        for chunk in chunks:
+            if count >= len(chunk):
+                count -= len(chunk)
+                last = chunk
+                continue
+            yield chunk.iloc[count:]
+            count = 0
+            produced = True
+        if not produced and last is not None:
+            yield last.iloc[0:0]
+
+    def forget(self, file_path):
+        """
+        Retire un fichier du cache des fichiers lus (fichier ingéré puis supprimé).
+        :param file_path: Chemin du fichier.
+        """
+        if self.cache:
+            self.cache.discard(file_path)
+
+    def cache_variant(self, sheet=None, member=None):
+        """
+        Variante d'un fichier dans le cache des fichiers lus : lecture avec ou sans inférence des types,
+        membre d'une archive et feuille.
+        """
+        # Les classeurs sont enregistrés avec leur ligne d'en-tête (variantes `-header`)
+        variant = "typed-header" if self.infer_types else "raw-header"
+        if member is not None:
+            variant = f"{variant}/{member}"
+        return variant if sheet is None else f"{variant}:{sheet}"
+
+    def iter_file(self, file_path, excel_header=0, content=None, dialect_key=None, sheet=None, member=None):
+        """
+        Retourne les données d'un fichier (Excel ou CSV) sous forme de blocs de DataFrame.
+        Avec le cache des fichiers lus, un fichier sur disque déjà lu (même taille, même date de modification)
+        est relu depuis le cache. La génération des tables et l'insertion lisent les classeurs avec leur
+        ligne d'en-tête (`excel_header=0`) : seule cette lecture est enregistrée dans le cache.
+        :param file_path: Chemin du fichier (son extension, ou celle du fichier compressé, détermine le format).
+        :param excel_header: Ligne d'en-tête des fichiers Excel (None si aucune).
+        :param content: Contenu du fichier déjà en mémoire (octets), ou None pour le lire sur disque.
+        :param dialect_key: Clé du dialecte CSV en cache (dossier du fichier par défaut, table pour les pièces jointes).
+        :param sheet: Feuille d'un classeur, ou None pour la première.
+        :param member: Membre d'une archive .zip (son extension détermine le format), ou None.
+        """
+        if self.cache and content is None and excel_header == 0:
+            variant = self.cache_variant(sheet, member)
+            chunks = self.cache.load(file_path, variant)
+            if chunks is None:
+                chunks = self.cache.store(
+                    file_path, self.parse_file(file_path, dialect_key=dialect_key, sheet=sheet, member=member), variant)
+            yield from chunks
+            return
+        yield from self.parse_file(file_path, excel_header, content, dialect_key, sheet, member)
+
+    def parse_file(self, file_path, excel_header=0, content=None, dialect_key=None, sheet=None, member=None):
+        """
+        Lit un fichier (Excel ou CSV, éventuellement compressé ou membre d'une archive) par blocs de DataFrame,
+        sans passer par le cache.
+        """
+        name = self.data_name(file_path, member)
+        if name.endswith((".xlsx", ".xls")):
+            yield from self.iter_excel(file_path, header=excel_header, content=content, sheet=sheet, member=member)
+        elif name.endswith(".csv"):
+            yield from self.iter_csv(file_path, content=content, dialect_key=dialect_key, member=member)
+        else:
+            raise ValueError(f"Format non supporté pour le fichier : {file_path}")
+
+
+def parse_in_worker(file_path, excel_header=0, sheet=None, member=None):
+    """
+    Lit un fichier entier dans un processus de lecture (ProcessPoolExecutor) : les blocs de DataFrame
+    sont renvoyés au processus principal, qui les insère.
+    :param file_path: Chemin du fichier.
+    :param excel_header: Ligne d'en-tête des fichiers Excel (None si aucune).
+    :param sheet: Feuille d'un classeur, ou None pour la première.
+    :param member: Membre d'une archive .zip, ou None.
+    :return: (liste des blocs, durée de la lecture en secondes).
+    """
+    global _worker_reader
+    if _worker_reader is None:
+        _worker_reader = FileReader()
+    start = time.perf_counter()
+    chunks = list(_worker_reader.iter_file(file_path, excel_header=excel_header, sheet=sheet, member=member))
+    return chunks, time.perf_counter() - start
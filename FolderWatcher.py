@@ -0,0 +1,223 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from Instrumentation import log
+
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def load_inotify():
+    """
+    Retourne la libc si elle fournit inotify (Linux), sinon None.
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FolderWatcher:
+    def __init__(self, root_dir, poll_interval=None, settle_seconds=None, exclude=("emails_attachments",)):
+        """
+        Surveille l'arborescence de ROOT_DIR et signale les fichiers prêts à être ingérés.
+        Sous Linux, inotify signale la fin d'écriture (close-write) ou l'arrivée par déplacement d'un fichier ;
+        ailleurs, ou avec WATCH_MODE=poll, l'arborescence est parcourue régulièrement et un fichier est prêt
+        lorsque sa taille et sa date de modification n'ont pas changé pendant `settle_seconds`.
+        :param root_dir: Répertoire racine surveillé.
+        :param poll_interval: Intervalle, en secondes, entre deux vérifications (WATCH_POLL_INTERVAL, 2 par défaut).
+        :param settle_seconds: Durée de stabilité exigée en mode scrutation (WATCH_SETTLE_SECONDS, 5 par défaut).
+        :param exclude: Noms de dossiers ignorés.
+        """
+        self.root_dir = root_dir
+        self.poll_interval = float(poll_interval or os.getenv("WATCH_POLL_INTERVAL", 2))
+        self.settle_seconds = float(settle_seconds or os.getenv("WATCH_SETTLE_SECONDS", 5))
+        self.exclude = set(exclude)
+        self._stop = threading.Event()
+        # Fichiers en attente de stabilité : {chemin: ((taille, date de modification), stable depuis)}
+        self._pending = {}
+        # Dernier état signalé de chaque fichier, pour ne pas le signaler deux fois sans modification
+        self._emitted = {}
+        self.libc = None if os.getenv("WATCH_MODE", "auto").lower() == "poll" else load_inotify()
+
+    def stop(self):
+        """
+        Demande l'arrêt de la surveillance (effectif au plus tard après `poll_interval`).
+        """
+        self._stop.set()
+
+    def events(self):
+        """
+        Produit le chemin de chaque fichier prêt, au fil de l'eau, jusqu'à l'appel de `stop`.
+        """
+        if self.libc is not None:
+            try:
+                yield from self._inotify_events()
+                return
+            except OSError as e:
+                log.warning(f"inotify indisponible ({e}), surveillance par scrutation.")
+        log.info(f"Surveillance de {self.root_dir} par scrutation toutes les {self.poll_interval:g}s.")
+        while not self._stop.is_set():
+            self._forget_missing()
+            self._scan(self.root_dir)
+            yield from self._settled()
+            self._stop.wait(self.poll_interval)
+
+    def _walk(self, folder):
+        """
+        Parcourt une arborescence en ignorant les dossiers exclus ; produit (dossier, fichiers).
+        """
+        for dirpath, dirnames, filenames in os.walk(folder):
+            dirnames[:] = [d for d in dirnames if d not in self.exclude]
+            yield dirpath, filenames
+
+    def _scan(self, folder):
+        """
+        Ajoute aux fichiers en attente ceux d'une arborescence qui sont nouveaux ou modifiés.
+        """
+        for dirpath, filenames in self._walk(folder):
+            for filename in filenames:
+                self._track(os.path.join(dirpath, filename))
+
+    def _forget_missing(self):
+        """
+        Oublie les fichiers déjà signalés qui ont disparu (fichiers ingérés puis supprimés).
+        """
+        for path in list(self._emitted):
+            if not os.path.exists(path):
+                del self._emitted[path]
+
+    def _track(self, path):
+        """
+        Met à jour l'état d'un fichier en attente ; le délai de stabilité repart si le fichier a changé.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._pending.pop(path, None)
+            self._emitted.pop(path, None)
+            return
+        state = (stat.st_size, stat.st_mtime)
+        if self._emitted.get(path) == state:
+            return
+        previous = self._pending.get(path)
+        if previous is None or previous[0] != state:
+            self._pending[path] = (state, time.monotonic())
+
+    def _settled(self):
+        """
+        Produit les fichiers en attente restés inchangés pendant `settle_seconds`.
+        """
+        now = time.monotonic()
+        for path, (state, since) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                self._pending.pop(path, None)
+                continue
+            current = (stat.st_size, stat.st_mtime)
+            if current != state:
+                self._pending[path] = (current, now)
+            elif now - since >= self.settle_seconds:
+                self._pending.pop(path, None)
+                yield from self._emit(path, current)
+
+    def _emit(self, path, state=None):
+        """
+        Signale un fichier prêt (une seule fois tant qu'il n'est pas modifié).
+        """
+        if state is None:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return
+            state = (stat.st_size, stat.st_mtime)
+        if self._emitted.get(path) == state:
+            return
+        self._emitted[path] = state
+        yield path
+
+    def _inotify_events(self):
+        """
+        Surveillance par inotify : chaque dossier de l'arborescence est surveillé, y compris les dossiers
+        créés en cours de route. Les fichiers déjà présents au démarrage (arrivés pendant le parcours de
+        rattrapage, avant la pose des surveillances), dans un nouveau dossier, ou après un débordement
+        de la file d'événements, sont repris par contrôle de stabilité.
+        """
+        fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        watches = {}
+
+        def add_tree(folder):
+            for dirpath, _ in self._walk(folder):
+                wd = self.libc.inotify_add_watch(fd, os.fsencode(dirpath), WATCH_MASK)
+                if wd < 0:
+                    code = ctypes.get_errno()
+                    if code == errno.ENOSPC:
+                        raise OSError(code, "limite de surveillances inotify atteinte (fs.inotify.max_user_watches)")
+                    continue
+                watches[wd] = dirpath
+
+        try:
+            add_tree(self.root_dir)
+            # Les fichiers arrivés avant la pose des surveillances ne produiront pas d'événement
+            self._scan(self.root_dir)
+            log.info(f"Surveillance de {self.root_dir} par inotify ({len(watches)} dossiers).")
+            while not self._stop.is_set():
+                ready, _, _ = select.select([fd], [], [], self.poll_interval)
+                if ready:
+                    data = os.read(fd, 64 * 1024)
+                    offset = 0
+                    while offset < len(data):
+                        wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                        name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                        offset += EVENT_HEADER.size + length
+
+                        if mask & IN_Q_OVERFLOW:
+                            log.warning("File d'événements inotify saturée, nouveau parcours de l'arborescence.")
+                            self._scan(self.root_dir)
+                            continue
+                        if mask & (IN_IGNORED | IN_DELETE_SELF):
+                            watches.pop(wd, None)
+                            continue
+                        folder = watches.get(wd)
+                        if folder is None or not name:
+                            continue
+                        path = os.path.join(folder, os.fsdecode(name))
+
+                        if mask & IN_ISDIR:
+                            if mask & (IN_CREATE | IN_MOVED_TO) and os.path.basename(path) not in self.exclude:
+                                add_tree(path)
+                                self._scan(path)
+                        elif mask & (IN_DELETE | IN_MOVED_FROM):
+                            self._pending.pop(path, None)
+                            self._emitted.pop(path, None)
+                        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                            self._pending.pop(path, None)
+                            yield from self._emit(path)
+                yield from self._settled()
+        finally:
+            os.close(fd)
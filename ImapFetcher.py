@@ -0,0 +1,314 @@
+import re
+import threading
+import base64
+import quopri
+import email
+from email.header import decode_header
+from email.utils import decode_rfc2231
+from urllib.parse import unquote
+from datetime import datetime, timedelta
+from Instrumentation import log
+
+
+_OPEN, _CLOSE = object(), object()
+_TOKEN = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"\[]+(?:\[[^\]]*\])?))')
+
+
+def _tokenize(text, tokens):
+    """
+    Découpe une ligne de réponse IMAP en jetons : parenthèses, chaînes entre guillemets et atomes.
+    """
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match or match.end() == position:
+            break
+        position = match.end()
+        opening, closing, quoted, atom = match.groups()
+        if opening:
+            tokens.append(_OPEN)
+        elif closing:
+            tokens.append(_CLOSE)
+        elif quoted is not None:
+            tokens.append(re.sub(rb'\\(.)', rb'\1', quoted).decode("utf-8", "replace"))
+        elif atom.upper() == b"NIL":
+            tokens.append(None)
+        else:
+            tokens.append(atom.decode("utf-8", "replace"))
+
+
+def parse_response(data):
+    """
+    Transforme la réponse brute d'imaplib (octets et tuples contenant des littéraux) en listes imbriquées.
+    Les littéraux `{n}` sont retournés en octets, les atomes et chaînes en texte, NIL en None.
+    :param data: Données retournées par `mail.uid(...)`.
+    """
+    tokens = []
+    for item in data:
+        if isinstance(item, tuple):
+            text, literal = item
+            _tokenize(re.sub(rb"\{\d+\}\s*$", b"", text), tokens)
+            tokens.append(literal)
+        elif isinstance(item, bytes):
+            _tokenize(item, tokens)
+
+    stack = [[]]
+    for token in tokens:
+        if token is _OPEN:
+            stack.append([])
+        elif token is _CLOSE:
+            if len(stack) > 1:
+                closed = stack.pop()
+                stack[-1].append(closed)
+        else:
+            stack[-1].append(token)
+    while len(stack) > 1:
+        closed = stack.pop()
+        stack[-1].append(closed)
+    return stack[0]
+
+
+def parse_fetch(data):
+    """
+    Retourne, pour chaque message d'une réponse FETCH, le dictionnaire {attribut: valeur}.
+    :param data: Données retournées par `mail.uid("FETCH", ...)`.
+    """
+    messages = []
+    for item in parse_response(data):
+        if isinstance(item, list):
+            attributes = {}
+            for index in range(0, len(item) - 1, 2):
+                key = item[index]
+                attributes[key.upper() if isinstance(key, str) else key] = item[index + 1]
+            messages.append(attributes)
+    return messages
+
+
+def _params(values):
+    """
+    Convertit une liste de paramètres IMAP ("NAME" "valeur" ...) en dictionnaire (clés en minuscules).
+    """
+    if not isinstance(values, list):
+        return {}
+    return {str(values[i]).lower(): values[i + 1] for i in range(0, len(values) - 1, 2)}
+
+
+def _filename(params):
+    """
+    Extrait le nom de fichier d'un dictionnaire de paramètres, y compris sous les formes RFC 2231
+    (`filename*`, `filename*0*`...) et RFC 2047 (`=?utf-8?...?=`).
+    """
+    for name in ("filename", "name"):
+        if params.get(name):
+            value = params[name]
+            break
+        parts = sorted((key for key in params if key.startswith(f"{name}*")),
+                       key=lambda key: int(re.sub(r"\D", "", key) or 0))
+        if parts:
+            value = "".join(str(params[key]) for key in parts)
+            if any(key.endswith("*") for key in parts):
+                charset, _, encoded = decode_rfc2231(value)
+                value = unquote(encoded, encoding=charset or "utf-8") if charset else unquote(value)
+            break
+    else:
+        return None
+
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "replace")
+    decoded, encoding = decode_header(value)[0]
+    if isinstance(decoded, bytes):
+        decoded = decoded.decode(encoding or 'utf-8')
+    return decoded
+
+
+def iter_attachment_parts(structure, prefix=""):
+    """
+    Parcourt un BODYSTRUCTURE et produit (numéro de partie, nom de fichier, encodage) pour chaque
+    partie marquée `attachment` et possédant un nom de fichier.
+    :param structure: BODYSTRUCTURE sous forme de listes imbriquées.
+    :param prefix: Numéro de la partie parente.
+    """
+    if not isinstance(structure, list) or not structure:
+        return
+
+    # Partie multipart : sous-parties numérotées 1, 2, ... puis le sous-type
+    if isinstance(structure[0], list):
+        index = 0
+        for item in structure:
+            if not isinstance(item, list):
+                break
+            index += 1
+            yield from iter_attachment_parts(item, f"{prefix}.{index}" if prefix else str(index))
+        return
+
+    part = prefix or "1"
+    maintype = str(structure[0]).lower()
+    subtype = str(structure[1]).lower()
+    encoding = str(structure[5] or "7BIT").upper() if len(structure) > 5 else "7BIT"
+
+    # Position des données d'extension (MD5 puis disposition) selon le type de partie
+    if maintype == "text":
+        extension = 8
+    elif maintype == "message" and subtype == "rfc822":
+        extension = 10
+        if len(structure) > 8:
+            nested = structure[8]
+            multipart = isinstance(nested, list) and nested and isinstance(nested[0], list)
+            yield from iter_attachment_parts(nested, part if multipart else f"{part}.1")
+    else:
+        extension = 7
+
+    disposition = structure[extension + 1] if len(structure) > extension + 1 else None
+    if not isinstance(disposition, list) or str(disposition[0]).lower() != "attachment":
+        return
+
+    filename = _filename(_params(disposition[1] if len(disposition) > 1 else None)) or _filename(_params(structure[2]))
+    if filename:
+        yield part, filename, encoding
+
+
+def decode_payload(payload, encoding):
+    """
+    Décode le contenu d'une partie selon son Content-Transfer-Encoding.
+    :param payload: Contenu brut de la partie (octets).
+    :param encoding: Encodage annoncé par le BODYSTRUCTURE.
+    """
+    if encoding == "BASE64":
+        return base64.b64decode(payload)
+    if encoding == "QUOTED-PRINTABLE":
+        return quopri.decodestring(payload)
+    return payload
+
+
+class ImapFetcher:
+    def __init__(self, state, account, mailbox="inbox"):
+        """
+        Initialise la récupération incrémentale des pièces jointes par UID IMAP.
+        :param state: Objet offrant `get_state`/`set_state` (le manifeste d'ingestion).
+        :param account: Adresse email, utilisée pour nommer l'état persistant.
+        :param mailbox: Boîte aux lettres sélectionnée.
+        """
+        self.state = state
+        self.key = f"imap:{account}:{mailbox}"
+        # Messages rendus par `iter_new_messages` et pas encore acquittés (UID croissants)
+        self._outstanding = []
+        self._acknowledged = set()
+        self._lock = threading.Lock()
+
+    def uid_validity(self, mail):
+        """
+        Retourne l'UIDVALIDITY de la boîte sélectionnée.
+        :param mail: Connexion IMAP avec la boîte sélectionnée.
+        """
+        typ, data = mail.response("UIDVALIDITY")
+        if data and data[0] is not None:
+            return int(data[0])
+        status, data = mail.status("INBOX", "(UIDVALIDITY)")
+        return int(re.search(rb"UIDVALIDITY (\d+)", data[0]).group(1))
+
+    def new_uids(self, mail):
+        """
+        Retourne les UID des messages non encore traités, dans l'ordre croissant.
+        Sans état valide (premier passage ou UIDVALIDITY modifiée), les messages reçus depuis la
+        dernière heure sont recherchés comme auparavant.
+        :param mail: Connexion IMAP avec la boîte sélectionnée.
+        """
+        validity = self.uid_validity(mail)
+        last_uid = int(self.state.get_state(f"{self.key}:last_uid", 0))
+        if str(validity) != self.state.get_state(f"{self.key}:uidvalidity"):
+            self.state.set_state(f"{self.key}:uidvalidity", validity)
+            self.state.set_state(f"{self.key}:last_uid", 0)
+            last_uid = 0
+
+        if last_uid:
+            status, data = mail.uid("SEARCH", None, f"UID {last_uid + 1}:*")
+        else:
+            since_time = (datetime.now() - timedelta(hours=1)).strftime("%d-%b-%Y")
+            status, data = mail.uid("SEARCH", None, f"SINCE {since_time}")
+        if status != "OK" or not data or not data[0]:
+            return []
+        # `n:*` retourne toujours le dernier message, même s'il est déjà traité
+        return sorted(uid for uid in (int(value) for value in data[0].split()) if uid > last_uid)
+
+    def iter_new_messages(self, mail):
+        """
+        Produit (uid, sujet, [(nom de fichier, contenu)]) pour chaque nouveau message, en ne téléchargeant
+        que les parties jointes (`BODY.PEEK[partie]`). Le dernier UID traité n'est enregistré que lorsque
+        l'appelant a acquitté le message (`acknowledge`), une fois ses pièces jointes traitées.
+        :param mail: Connexion IMAP avec la boîte sélectionnée.
+        """
+        uids = self.new_uids(mail)
+        if not uids:
+            log.info("Aucun nouvel email depuis la dernière exécution.")
+            return
+        log.info(f"{len(uids)} nouveaux emails à examiner.")
+
+        status, data = mail.uid("FETCH", ",".join(str(uid) for uid in uids),
+                                "(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (SUBJECT)])")
+        if status != "OK":
+            raise RuntimeError(f"Échec de la lecture des structures de messages : {status}")
+
+        structures = {}
+        for attributes in parse_fetch(data):
+            if "UID" in attributes:
+                structures[int(attributes["UID"])] = attributes
+
+        for uid in uids:
+            attributes = structures.get(uid, {})
+            subject = self._subject(attributes)
+            parts = list(iter_attachment_parts(attributes.get("BODYSTRUCTURE")))
+
+            attachments = []
+            if parts:
+                sections = " ".join(f"BODY.PEEK[{part}]" for part, _, _ in parts)
+                status, data = mail.uid("FETCH", str(uid), f"({sections})")
+                if status != "OK":
+                    raise RuntimeError(f"Échec du téléchargement des pièces jointes du message {uid} : {status}")
+                bodies = {}
+                for fetched in parse_fetch(data):
+                    for key, value in fetched.items():
+                        if isinstance(key, str) and key.startswith("BODY["):
+                            bodies[key[5:-1]] = value
+                for part, filename, encoding in parts:
+                    payload = bodies.get(part)
+                    if isinstance(payload, str):
+                        payload = payload.encode()
+                    if payload is not None:
+                        attachments.append((filename, decode_payload(payload, encoding)))
+
+            with self._lock:
+                self._outstanding.append(uid)
+            yield uid, subject, attachments
+
+    def acknowledge(self, uid):
+        """
+        Indique que l'appelant a fini de traiter un message rendu par `iter_new_messages` (pièces jointes
+        insérées ou mises en quarantaine). Le dernier UID traité n'avance que jusqu'au plus grand UID dont
+        tous les messages précédents sont acquittés : un message rendu mais non acquitté (arrêt pendant
+        son traitement) sera de nouveau examiné à la prochaine exécution.
+        :param uid: UID du message traité.
+        """
+        with self._lock:
+            self._acknowledged.add(uid)
+            last = None
+            while self._outstanding and self._outstanding[0] in self._acknowledged:
+                last = self._outstanding.pop(0)
+                self._acknowledged.discard(last)
+            if last is not None:
+                self.state.set_state(f"{self.key}:last_uid", last)
+
+    def _subject(self, attributes):
+        """
+        Décode le sujet à partir de l'en-tête Subject récupéré avec la structure.
+        """
+        header = next((value for key, value in attributes.items()
+                       if isinstance(key, str) and key.startswith("BODY[HEADER")), b"")
+        if isinstance(header, str):
+            header = header.encode()
+        raw_subject = email.message_from_bytes(header or b"")["Subject"]
+        if not raw_subject:
+            return ""
+        subject, encoding = decode_header(raw_subject)[0]
+        if isinstance(subject, bytes):
+            subject = subject.decode(encoding if encoding else "utf-8")
+        return subject
@@ -0,0 +1,154 @@
+import os
+import hashlib
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+
+ManifestEntry = namedtuple("ManifestEntry", ["content_hash", "table_name", "file_path", "rows_committed", "status"])
+
+
+class IngestManifest:
+    def __init__(self, path=None):
+        """
+        Initialise le manifeste local des fichiers ingérés (base SQLite placée à côté de ROOT_DIR).
+        Chaque fichier y est identifié par l'empreinte SHA-256 de son contenu et sa table cible.
+        :param path: Chemin de la base SQLite (MANIFEST_PATH, `<ROOT_DIR>_manifest.sqlite` par défaut).
+        """
+        root_dir = os.path.normpath(os.getenv("ROOT_DIR", "."))
+        self.path = path or os.getenv("MANIFEST_PATH") or f"{root_dir}_manifest.sqlite"
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingested_files (
+                content_hash TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                rows_committed INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (content_hash, table_name)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get_state(self, key, default=None):
+        """
+        Retourne une valeur d'état persistante (par exemple le dernier UID IMAP traité).
+        :param key: Clé de l'état.
+        :param default: Valeur retournée si la clé n'existe pas.
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM ingest_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value):
+        """
+        Enregistre une valeur d'état persistante.
+        :param key: Clé de l'état.
+        :param value: Valeur à enregistrer (convertie en texte).
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO ingest_state (key, value, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (key, str(value), now))
+            self.conn.commit()
+
+    def file_hash(self, file_path, size, mtime):
+        """
+        Calcule l'empreinte SHA-256 d'un fichier. L'empreinte déjà enregistrée est réutilisée
+        lorsque le chemin, la taille et la date de modification n'ont pas changé.
+        :param file_path: Chemin du fichier.
+        :param size: Taille du fichier en octets.
+        :param mtime: Date de dernière modification du fichier.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT content_hash FROM ingested_files WHERE file_path = ? AND size = ? AND mtime = ?",
+                (file_path, size, mtime)).fetchone()
+        if row:
+            return row[0]
+
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def begin(self, file_path, table_name, content=None):
+        """
+        Enregistre le début de l'ingestion d'un fichier et retourne son entrée du manifeste.
+        Si le même contenu a déjà été (partiellement) ingéré dans cette table, l'entrée existante
+        est retournée : statut 'done' pour un fichier à ignorer, ou nombre de lignes déjà validées.
+        :param file_path: Chemin du fichier.
+        :param table_name: Nom de la table cible.
+        :param content: Contenu du fichier déjà en mémoire (octets), ou None pour le lire sur disque.
+        """
+        if content is None:
+            stat = os.stat(file_path)
+            size, mtime = stat.st_size, stat.st_mtime
+            content_hash = self.file_hash(file_path, size, mtime)
+        else:
+            size, mtime = len(content), 0.0
+            content_hash = hashlib.sha256(content).hexdigest()
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT rows_committed, status FROM ingested_files WHERE content_hash = ? AND table_name = ?",
+                (content_hash, table_name)).fetchone()
+            if row is None:
+                self.conn.execute(
+                    "INSERT INTO ingested_files (content_hash, table_name, file_path, size, mtime, "
+                    "rows_committed, status, updated_at) VALUES (?, ?, ?, ?, ?, 0, 'partial', ?)",
+                    (content_hash, table_name, file_path, size, mtime, now))
+                row = (0, "partial")
+            else:
+                self.conn.execute(
+                    "UPDATE ingested_files SET file_path = ?, size = ?, mtime = ?, updated_at = ? "
+                    "WHERE content_hash = ? AND table_name = ?",
+                    (file_path, size, mtime, now, content_hash, table_name))
+            self.conn.commit()
+        return ManifestEntry(content_hash, table_name, file_path, row[0], row[1])
+
+    def checkpoint(self, entry, rows_committed):
+        """
+        Enregistre le nombre de lignes du fichier validées en base (position de reprise).
+        :param entry: Entrée retournée par `begin`.
+        :param rows_committed: Nombre total de lignes du fichier validées.
+        """
+        self._update(entry, rows_committed, "partial")
+
+    def complete(self, entry):
+        """
+        Marque un fichier comme entièrement ingéré.
+        :param entry: Entrée retournée par `begin`.
+        """
+        self._update(entry, None, "done")
+
+    def _update(self, entry, rows_committed, status):
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self.conn.execute(
+                "UPDATE ingested_files SET rows_committed = COALESCE(?, rows_committed), status = ?, "
+                "updated_at = ? WHERE content_hash = ? AND table_name = ?",
+                (rows_committed, status, now, entry.content_hash, entry.table_name))
+            self.conn.commit()
+
+    def close(self):
+        """
+        Ferme la base du manifeste.
+        """
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,109 @@
+import threading
+import time
+from Instrumentation import log, metrics
+
+
+class IngestSummary:
+    def __init__(self):
+        """
+        Initialise le récapitulatif d'une exécution : fichiers traités, en échec et lignes insérées par table.
+        Les compteurs peuvent être mis à jour depuis plusieurs threads.
+        """
+        self._tables = {}
+        self._stages = {}
+        self._stage_workers = {}
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def _table(self, table_name):
+        return self._tables.setdefault(table_name, {"succeeded": 0, "failed": 0, "rows": 0, "seconds": 0.0})
+
+    def add_file(self, table_name, success):
+        """
+        Comptabilise un fichier traité.
+        :param table_name: Nom de la table cible.
+        :param success: True si le fichier a été inséré entièrement.
+        """
+        with self._lock:
+            self._table(table_name)["succeeded" if success else "failed"] += 1
+        metrics.inc("etl_files_total", table=table_name, status="succeeded" if success else "failed")
+
+    def add_rows(self, table_name, rows, seconds):
+        """
+        Comptabilise des lignes insérées.
+        :param table_name: Nom de la table cible.
+        :param rows: Nombre de lignes insérées.
+        :param seconds: Durée de l'insertion en secondes.
+        """
+        with self._lock:
+            table = self._table(table_name)
+            table["rows"] += rows
+            table["seconds"] += seconds
+        metrics.inc("etl_rows_ingested_total", rows, table=table_name)
+
+    def add_stage_time(self, stage, seconds):
+        """
+        Cumule le temps passé dans une étape du traitement (téléchargement, attente, insertion...).
+        :param stage: Nom de l'étape.
+        :param seconds: Durée en secondes.
+        """
+        with self._lock:
+            count, total = self._stages.get(stage, (0, 0.0))
+            self._stages[stage] = (count + 1, total + seconds)
+
+    def set_stage_workers(self, stage, workers):
+        """
+        Indique le nombre de workers d'une étape, pour calculer son taux d'occupation dans le récapitulatif.
+        :param stage: Nom de l'étape.
+        :param workers: Nombre de workers (threads ou processus) de l'étape.
+        """
+        with self._lock:
+            self._stage_workers[stage] = max(1, int(workers))
+
+    def totals(self):
+        """
+        Retourne les totaux de l'exécution (fichiers réussis, en échec, lignes insérées).
+        """
+        with self._lock:
+            tables = list(self._tables.values())
+        return {
+            "succeeded": sum(table["succeeded"] for table in tables),
+            "failed": sum(table["failed"] for table in tables),
+            "rows": sum(table["rows"] for table in tables),
+        }
+
+    def snapshot(self):
+        """
+        Retourne une copie des compteurs : {"tables": {...}, "stages": {étape: (nombre, secondes)}, "elapsed": secondes}.
+        """
+        with self._lock:
+            tables = {name: dict(table) for name, table in self._tables.items()}
+            stages = dict(self._stages)
+        return {"tables": tables, "stages": stages, "elapsed": time.perf_counter() - self.started}
+
+    def report(self):
+        """
+        Affiche le récapitulatif par table puis les totaux de l'exécution.
+        """
+        with self._lock:
+            tables = sorted(self._tables.items())
+            stages = list(self._stages.items())
+            stage_workers = dict(self._stage_workers)
+        elapsed = time.perf_counter() - self.started
+        log.info("Récapitulatif de l'exécution :")
+        for table_name, table in tables:
+            rate = table["rows"] / table["seconds"] if table["seconds"] else 0
+            log.info(f"  - {table_name} : {table['succeeded']} fichiers insérés, {table['failed']} en échec, "
+                     f"{table['rows']} lignes ({rate:.0f} lignes/s).",
+                     extra={"fields": {"event": "summary_table", "table": table_name, **table}})
+        for stage, (count, seconds) in stages:
+            # Occupation : part du temps de l'exécution pendant laquelle les workers de l'étape étaient occupés
+            workers = stage_workers.get(stage, 1)
+            busy = seconds / (elapsed * workers) if elapsed else 0
+            log.info(f"  * {stage} : {seconds:.2f}s ({count} fois), occupation {busy:.0%} ({workers} workers).",
+                     extra={"fields": {"event": "summary_stage", "stage": stage, "count": count, "seconds": seconds,
+                                       "workers": workers, "busy": round(busy, 4)}})
+        totals = self.totals()
+        log.info(f"Total : {totals['succeeded']} fichiers insérés, {totals['failed']} en échec, "
+                 f"{totals['rows']} lignes en {elapsed:.2f}s.",
+                 extra={"fields": {"event": "summary_total", "seconds": round(elapsed, 3), **totals}})
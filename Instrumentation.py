@@ -0,0 +1,223 @@
+import os
+import io
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import cProfile
+import pstats
+from contextlib import contextmanager
+from datetime import datetime
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+METRICS_HELP = {
+    "etl_rows_ingested_total": ("counter", "Lignes insérées, par table."),
+    "etl_bytes_read_total": ("counter", "Octets de fichiers lus, par table."),
+    "etl_files_total": ("counter", "Fichiers traités, par table et par statut."),
+    "etl_stage_failures_total": ("counter", "Étapes terminées par une erreur, par étape et par table."),
+    "etl_transaction_retries_total": ("counter", "Transactions rejouées après une erreur transitoire, par table."),
+    "etl_parse_cache_total": ("counter", "Lectures de fichiers servies par le cache (hit) ou non (miss)."),
+    "etl_stage_seconds": ("histogram", "Durée des étapes du traitement, par étape et par table."),
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formate chaque message en une ligne JSON : horodatage, niveau, thread, message et champs
+    structurés passés avec `extra={"fields": {...}}`.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def get_logger(name="etl"):
+    """
+    Retourne le logger de l'application, configuré au premier appel :
+    lignes JSON (LOG_FORMAT=json, par défaut) ou texte horodaté (LOG_FORMAT=text),
+    niveau LOG_LEVEL (INFO par défaut), sur la sortie standard.
+    :param name: Nom du logger.
+    """
+    root = logging.getLogger("etl")
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        if os.getenv("LOG_FORMAT", "json").lower() == "text":
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(threadName)s] %(message)s"))
+        else:
+            handler.setFormatter(JsonFormatter())
+        root.addHandler(handler)
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        root.propagate = False
+    return root if name == "etl" else root.getChild(name)
+
+
+log = get_logger()
+
+
+class Metrics:
+    def __init__(self):
+        """
+        Initialise le registre des métriques de l'exécution (compteurs et histogrammes de durée),
+        exportées au format texte de Prometheus. Utilisable depuis plusieurs threads.
+        """
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """
+        Incrémente un compteur.
+        :param name: Nom de la métrique.
+        :param value: Valeur ajoutée.
+        :param labels: Étiquettes de la série (table, statut...).
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """
+        Ajoute une durée à un histogramme.
+        :param name: Nom de la métrique.
+        :param seconds: Durée observée en secondes.
+        :param labels: Étiquettes de la série.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            buckets, total, count = self._histograms.get(key, ([0] * len(LATENCY_BUCKETS), 0.0, 0))
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    buckets[index] += 1
+            self._histograms[key] = (buckets, total + seconds, count + 1)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """
+        Mesure la durée d'une étape (histogramme `etl_stage_seconds`) et compte ses échecs ;
+        la durée est aussi journalisée au niveau DEBUG.
+        :param stage: Nom de l'étape (sniff, parse, schema, insert, commit...).
+        :param labels: Étiquettes supplémentaires (table...).
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc("etl_stage_failures_total", stage=stage, **labels)
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe("etl_stage_seconds", seconds, stage=stage, **labels)
+            log.debug(f"Étape {stage} : {seconds:.4f}s",
+                      extra={"fields": {"event": "stage", "stage": stage, "seconds": round(seconds, 6), **labels}})
+
+    def timed_iter(self, iterable, stage, **labels):
+        """
+        Parcourt un itérable en mesurant le temps de production de chaque élément
+        (par exemple la lecture d'un bloc de fichier), sans compter le temps passé par l'appelant.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.timer(stage, **labels):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def render(self):
+        """
+        Retourne les métriques au format texte d'exposition de Prometheus.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(buckets), total, count) for key, (buckets, total, count) in self._histograms.items()}
+
+        lines = []
+        names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+        for name in names:
+            kind, description = METRICS_HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+            for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {bucket_count}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {total}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path=None):
+        """
+        Écrit les métriques dans un fichier texte lu par le collecteur textfile de node_exporter
+        (METRICS_TEXTFILE, aucun fichier si la variable n'est pas définie). Le fichier est remplacé
+        en une seule opération pour ne jamais être lu à moitié écrit.
+        :param path: Chemin du fichier `.prom`.
+        """
+        path = path or os.getenv("METRICS_TEXTFILE")
+        if not path:
+            return
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            f.write(self.render())
+        os.replace(temporary, path)
+        log.info(f"Métriques écrites dans {path}.")
+
+
+def _labels(labels):
+    """
+    Formate les étiquettes d'une série Prometheus : {nom="valeur",...}.
+    """
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def profiled(argv=None):
+    """
+    Exécute le bloc sous cProfile si l'option `--profile [FICHIER]` est passée sur la ligne de commande :
+    les statistiques sont enregistrées dans le fichier (`<script>.prof` par défaut) et les 30 fonctions
+    les plus coûteuses (temps cumulé) sont journalisées.
+    :param argv: Arguments de la ligne de commande (sys.argv[1:] par défaut).
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", nargs="?", const="", default=None)
+    args, _ = parser.parse_known_args(argv)
+    if args.profile is None:
+        yield
+        return
+
+    path = args.profile or f"{os.path.splitext(os.path.basename(sys.argv[0]) or 'etl')[0]}.prof"
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(30)
+        log.info(f"Profil enregistré dans {path}.", extra={"fields": {"event": "profile", "profile": output.getvalue()}})
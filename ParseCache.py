@@ -0,0 +1,162 @@
+import os
+import shutil
+import hashlib
+import threading
+import pandas as pd
+from Instrumentation import log, metrics
+
+
+class ParseCache:
+    def __init__(self, directory, max_bytes=None, file_format=None):
+        """
+        Initialise le cache des fichiers déjà lus : les blocs de DataFrame d'un fichier sont enregistrés
+        dans un dossier par fichier, identifié par son chemin, sa taille et sa date de modification.
+        Un fichier modifié n'est donc jamais relu depuis une version périmée.
+        Les blocs sont écrits en Parquet (pyarrow) ou, à défaut, en pickle.
+        :param directory: Dossier du cache (PARSE_CACHE_DIR).
+        :param max_bytes: Taille totale maximale du cache (PARSE_CACHE_MAX_MB, 1024 Mo par défaut) ;
+                          les entrées les moins récemment utilisées sont supprimées au-delà.
+        :param file_format: parquet ou pickle (PARSE_CACHE_FORMAT, parquet si pyarrow est installé).
+        """
+        self.directory = directory
+        self.max_bytes = int(max_bytes or float(os.getenv("PARSE_CACHE_MAX_MB", 1024)) * 1024 * 1024)
+        self.file_format = (file_format or os.getenv("PARSE_CACHE_FORMAT", "parquet")).lower()
+        if self.file_format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                log.warning("pyarrow n'est pas installé : le cache des fichiers lus utilise le format pickle.")
+                self.file_format = "pickle"
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Retourne le cache configuré par PARSE_CACHE_DIR, ou None si la variable n'est pas définie.
+        """
+        directory = os.getenv("PARSE_CACHE_DIR")
+        return cls(directory) if directory else None
+
+    def _prefix(self, file_path):
+        return hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:16]
+
+    def _version(self, file_path):
+        stat = os.stat(file_path)
+        return f"{self._prefix(file_path)}-{hashlib.sha1(f'{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()[:16]}"
+
+    def _entry(self, file_path, variant=""):
+        """
+        Nom de l'entrée d'un fichier : empreintes du chemin, de la version (taille et date de modification)
+        et de la variante de lecture (avec ou sans inférence des types, feuille d'un classeur).
+        """
+        return f"{self._version(file_path)}-{hashlib.sha1(variant.encode()).hexdigest()[:8]}"
+
+    def contains(self, file_path, variant=""):
+        """
+        Indique si la version actuelle d'un fichier est en cache.
+        :param file_path: Chemin du fichier.
+        :param variant: Variante de lecture.
+        """
+        try:
+            return os.path.isdir(os.path.join(self.directory, self._entry(file_path, variant)))
+        except OSError:
+            return False
+
+    def load(self, file_path, variant=""):
+        """
+        Retourne les blocs en cache d'un fichier (itérateur), ou None si la version actuelle du fichier
+        n'est pas en cache. L'entrée est marquée comme utilisée récemment.
+        :param file_path: Chemin du fichier.
+        :param variant: Variante de lecture.
+        """
+        try:
+            path = os.path.join(self.directory, self._entry(file_path, variant))
+            os.utime(path)
+        except OSError:
+            metrics.inc("etl_parse_cache_total", result="miss")
+            return None
+        metrics.inc("etl_parse_cache_total", result="hit")
+        log.debug(f"Fichier {file_path} lu depuis le cache.")
+        return self._read(path)
+
+    def _read(self, path):
+        for name in sorted(os.listdir(path)):
+            chunk_path = os.path.join(path, name)
+            yield pd.read_parquet(chunk_path) if name.endswith(".parquet") else pd.read_pickle(chunk_path)
+
+    def store(self, file_path, chunks, variant=""):
+        """
+        Transmet les blocs d'un fichier tout en les enregistrant dans le cache. L'entrée n'est publiée
+        que si le fichier a été lu en entier ; une lecture interrompue ne laisse rien dans le cache.
+        :param file_path: Chemin du fichier.
+        :param chunks: Itérable de DataFrame (lecture du fichier).
+        :param variant: Variante de lecture.
+        """
+        entry = self._entry(file_path, variant)
+        temporary = os.path.join(self.directory, f".{entry}.{os.getpid()}.{threading.get_ident()}.tmp")
+        os.makedirs(temporary, exist_ok=True)
+        published = False
+        try:
+            for index, chunk in enumerate(chunks):
+                self._write(chunk, os.path.join(temporary, f"{index:06d}"))
+                yield chunk
+            self.discard(file_path, keep=self._version(file_path))
+            try:
+                os.rename(temporary, os.path.join(self.directory, entry))
+                published = True
+            except OSError:
+                # Entrée publiée entre-temps par un autre processus
+                pass
+        finally:
+            if not published:
+                shutil.rmtree(temporary, ignore_errors=True)
+        self.evict()
+
+    def _write(self, chunk, path):
+        """
+        Enregistre un bloc en Parquet, ou en pickle si le format n'est pas disponible ou ne convient pas
+        au bloc (noms de colonnes non textuels, colonne de types mélangés).
+        """
+        if self.file_format == "parquet" and all(isinstance(column, str) for column in chunk.columns):
+            try:
+                chunk.to_parquet(f"{path}.parquet", index=False)
+                return
+            except Exception:
+                if os.path.exists(f"{path}.parquet"):
+                    os.remove(f"{path}.parquet")
+        chunk.to_pickle(f"{path}.pkl")
+
+    def discard(self, file_path, keep=None):
+        """
+        Supprime les entrées d'un fichier, par exemple après son ingestion.
+        :param file_path: Chemin du fichier.
+        :param keep: Version conservée (entrées des autres variantes de la version actuelle), ou None pour tout supprimer.
+        """
+        prefix = self._prefix(file_path) + "-"
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and not (keep and name.startswith(keep + "-")):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def evict(self):
+        """
+        Supprime les entrées les moins récemment utilisées tant que le cache dépasse `max_bytes`.
+        """
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.startswith(".") or not os.path.isdir(path):
+                    continue
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(path))
+                    entries.append((os.stat(path).st_mtime, size, path))
+                except OSError:
+                    continue
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                log.debug(f"Entrée {os.path.basename(path)} retirée du cache des fichiers lus.")
@@ -0,0 +1,71 @@
+import threading
+from collections import namedtuple
+from Instrumentation import log
+
+
+TableSchema = namedtuple("TableSchema", ["name", "columns", "types", "insert_query"])
+
+
+class SchemaCache:
+    def __init__(self, sink):
+        """
+        Initialise le cache des métadonnées de tables (colonnes, ordre, types, existence).
+        :param sink: Destination (base de données) qui fournit les colonnes des tables et la requête d'insertion.
+        """
+        self.sink = sink
+        self._schemas = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Charge en une seule requête les colonnes de toutes les tables de la base (début d'exécution).
+        """
+        tables = self.sink.fetch_columns()
+        with self._lock:
+            self._schemas = {name: self._build(name, columns) for name, columns in tables.items()}
+        log.info(f"Schémas chargés pour {len(tables)} tables.")
+
+    def get(self, table_name):
+        """
+        Retourne le schéma d'une table, ou None si elle n'existe pas.
+        Une table absente du cache est recherchée dans la base (elle a pu être créée depuis le chargement).
+        :param table_name: Nom de la table.
+        """
+        with self._lock:
+            if table_name in self._schemas:
+                return self._schemas[table_name]
+
+        columns = self.sink.fetch_columns(table_name).get(table_name)
+        if not columns:
+            # Table absente : non mise en cache, elle peut être créée pendant l'exécution (mode surveillance)
+            return None
+        schema = self._build(table_name, columns)
+        with self._lock:
+            self._schemas[table_name] = schema
+        return schema
+
+    def exists(self, table_name):
+        """
+        Indique si la table existe.
+        :param table_name: Nom de la table.
+        """
+        return self.get(table_name) is not None
+
+    def invalidate(self, table_name=None):
+        """
+        Retire une table du cache (après une instruction DDL), ou tout le cache si aucun nom n'est donné.
+        :param table_name: Nom de la table.
+        """
+        with self._lock:
+            if table_name is None:
+                self._schemas.clear()
+            else:
+                self._schemas.pop(table_name, None)
+
+    def _build(self, table_name, columns):
+        """
+        Construit le schéma d'une table et précalcule sa requête d'insertion.
+        """
+        names = [name for name, _ in columns]
+        insert_query = self.sink.insert_query(table_name, names)
+        return TableSchema(table_name, names, [data_type for _, data_type in columns], insert_query)
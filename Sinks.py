@@ -0,0 +1,651 @@
+import io
+import os
+import re
+import sqlite3
+import threading
+import time
+import pandas as pd
+from BulkInserter import BulkInserter
+from ConnectionPool import ConnectionPool
+from SchemaCache import SchemaCache
+from Instrumentation import log, metrics
+
+
+# Codes SQLSTATE et messages des erreurs transitoires : interblocage, délai dépassé, connexion coupée
+TRANSIENT_SQLSTATES = {"40001", "40P01", "HYT00", "HYT01", "08S01", "08001", "08003", "08004", "08006", "08007", "57P01"}
+TRANSIENT_MESSAGES = ("deadlock", "lock request time out", "timeout expired", "timed out", "database is locked",
+                      "communication link failure", "connection is closed", "server closed the connection",
+                      "connection reset")
+
+
+class Sink:
+    """
+    Destination des données : ouvre les connexions, lit les colonnes des tables, crée les tables
+    et écrit les blocs de données. Chaque base cible (SQL Server, PostgreSQL, SQLite) fournit
+    sa sous-classe ; la base est choisie par la variable DB_BACKEND.
+    """
+    placeholder = "?"
+    _sinks = {}
+    _sinks_lock = threading.Lock()
+
+    def __init__(self, connect):
+        """
+        Initialise la destination avec son pool de connexions, son cache des schémas et l'insertion par lots.
+        :param connect: Fonction sans argument qui ouvre une nouvelle connexion.
+        """
+        self.pool = ConnectionPool(connect)
+        self.schema_cache = SchemaCache(self)
+        self.bulk_inserter = BulkInserter()
+        # Taille maximale d'une transaction : COMMIT_EVERY_ROWS lignes et/ou COMMIT_EVERY_BYTES octets (0 = sans limite)
+        self.commit_rows = int(os.getenv("COMMIT_EVERY_ROWS", 50000))
+        self.commit_bytes = int(os.getenv("COMMIT_EVERY_BYTES", 0))
+        # Nouvelles tentatives d'une transaction après une erreur transitoire, avec attente exponentielle
+        self.retries = int(os.getenv("RETRY_ATTEMPTS", 3))
+        self.backoff = float(os.getenv("RETRY_BACKOFF", 1))
+        self.max_backoff = float(os.getenv("RETRY_MAX_BACKOFF", 30))
+        # Tables rechargées en mode upsert : {table: [colonnes clés]} (UPSERT_KEYS)
+        self.upsert_keys = parse_upsert_keys(os.getenv("UPSERT_KEYS", ""))
+        self._upsert_ready = set()
+        self._upsert_locks = {}
+        self._upsert_locks_guard = threading.Lock()
+
+    @classmethod
+    def shared(cls, db_params, backend=None):
+        """
+        Retourne la destination partagée pour ces paramètres de connexion, en la créant au premier appel.
+        Toutes les classes configurées avec les mêmes paramètres réutilisent ainsi les mêmes connexions
+        et le même cache des schémas.
+        :param db_params: Dictionnaire contenant les paramètres de connexion à la base de données.
+        :param backend: sqlserver, postgres ou sqlite (DB_BACKEND, sqlserver par défaut).
+        """
+        backend = (backend or os.getenv("DB_BACKEND", "sqlserver")).lower()
+        if backend not in SINKS:
+            raise ValueError(f"Base de données non supportée : {backend} (sqlserver, postgres ou sqlite).")
+        key = (backend,) + tuple(sorted((name, str(value)) for name, value in db_params.items()))
+        with cls._sinks_lock:
+            if key not in cls._sinks:
+                cls._sinks[key] = SINKS[backend](db_params)
+            return cls._sinks[key]
+
+    def quote(self, name):
+        """
+        Encadre un nom de table ou de colonne pour la base cible.
+        """
+        return f'"{name}"'
+
+    def map_type(self, sql_type):
+        """
+        Traduit un type proposé par l'inférence (types SQL Server) dans le dialecte de la base cible.
+        """
+        return sql_type
+
+    def columns_query(self, table_name=None):
+        """
+        Retourne la requête (et ses paramètres) listant les colonnes des tables, hors colonne 'id'.
+        :param table_name: Nom d'une table, ou None pour toutes les tables.
+        """
+        query = "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS WHERE COLUMN_NAME != 'id'"
+        params = ()
+        if table_name is not None:
+            query += f" AND TABLE_NAME = {self.placeholder}"
+            params = (table_name,)
+        return query + " ORDER BY TABLE_NAME, ORDINAL_POSITION", params
+
+    def fetch_columns(self, table_name=None):
+        """
+        Lit les colonnes des tables de la base.
+        :param table_name: Nom d'une table, ou None pour toutes les tables.
+        :return: Dictionnaire {table: [(colonne, type)]}.
+        """
+        query, params = self.columns_query(table_name)
+        tables = {}
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(query, params)
+            for name, column_name, data_type in cur.fetchall():
+                tables.setdefault(name, []).append((column_name, data_type))
+            cur.close()
+        return tables
+
+    def insert_query(self, table_name, columns):
+        """
+        Construit la requête INSERT paramétrée d'une table.
+        :param table_name: Nom de la table.
+        :param columns: Colonnes insérées, dans l'ordre des données.
+        """
+        placeholders = ", ".join([self.placeholder] * len(columns))
+        columns_str = ", ".join(self.quote(col) for col in columns)
+        return f"INSERT INTO {self.quote(table_name)} ({columns_str}) VALUES ({placeholders});"
+
+    def column_definitions(self, column_types):
+        """
+        Construit la liste des définitions de colonnes d'un CREATE TABLE.
+        :param column_types: Dictionnaire {colonne: type SQL}.
+        """
+        return ", ".join(f"{self.quote(column)} {self.map_type(sql_type)}" for column, sql_type in column_types.items())
+
+    def create_table_query(self, table_name, column_definitions):
+        """
+        Requête de création d'une table (si elle n'existe pas) avec une colonne 'id' auto-incrémentée.
+        """
+        raise NotImplementedError
+
+    def create_table(self, table_name, column_types):
+        """
+        Crée une table si elle n'existe pas, puis retire son ancien schéma du cache.
+        :param table_name: Nom de la table.
+        :param column_types: Dictionnaire {colonne: type SQL}.
+        """
+        query = self.create_table_query(table_name, self.column_definitions(column_types))
+        with metrics.timer("create_table", table=table_name), self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(query)
+            conn.commit()
+            cur.close()
+        self.schema_cache.invalidate(table_name)
+        # La table de transit d'une table recréée est recréée avec ses nouvelles colonnes au prochain upsert
+        self._upsert_ready.discard(table_name)
+
+    def is_transient(self, error):
+        """
+        Indique si une erreur est transitoire (interblocage, délai dépassé, connexion coupée) :
+        la transaction en cours peut alors être rejouée.
+        :param error: Exception levée par le pilote.
+        """
+        state = getattr(error, "pgcode", None) or (error.args[0] if error.args and isinstance(error.args[0], str) else None)
+        if state in TRANSIENT_SQLSTATES:
+            return True
+        message = str(error).lower()
+        return any(text in message for text in TRANSIENT_MESSAGES)
+
+    def commit_limit(self, df):
+        """
+        Nombre de lignes par transaction pour un bloc : COMMIT_EVERY_ROWS, réduit si besoin pour que
+        la taille en mémoire des lignes ne dépasse pas COMMIT_EVERY_BYTES.
+        :param df: Bloc de données.
+        """
+        limit = self.commit_rows or len(df) or 1
+        if self.commit_bytes and len(df):
+            row_bytes = df.memory_usage(index=False, deep=True).sum() / len(df)
+            limit = min(limit, max(1, int(self.commit_bytes // max(row_bytes, 1))))
+        return limit
+
+    def retry_delay(self, attempt):
+        """
+        Attente avant une nouvelle tentative : RETRY_BACKOFF doublé à chaque tentative, plafonné à RETRY_MAX_BACKOFF.
+        :param attempt: Numéro de la tentative (à partir de 1).
+        """
+        return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+
+    def write(self, table_name, data, on_commit=None):
+        """
+        Écrit des blocs de données dans une table existante, sans la colonne 'id'.
+        Pour une table configurée dans UPSERT_KEYS, les données passent par une table de transit (`upsert`).
+        Les lignes sont validées par transactions bornées (`commit_limit`). Une transaction interrompue par
+        une erreur transitoire est annulée puis rejouée seule, après une attente exponentielle, sans toucher
+        aux transactions déjà validées ; toute autre erreur, ou l'épuisement des tentatives, est propagée.
+        :param table_name: Nom de la table.
+        :param data: Itérable de DataFrame (blocs).
+        :param on_commit: Fonction appelée avec le nombre total de lignes validées après chaque transaction.
+        :return: Nombre de lignes écrites.
+        """
+        if table_name in self.upsert_keys:
+            return self.upsert(table_name, data, on_commit)
+
+        with metrics.timer("schema", table=table_name):
+            schema = self.schema_cache.get(table_name)
+        if schema is None:
+            raise ValueError(f"La table '{table_name}' n'existe pas.")
+        log.info(f"Colonnes détectées dans la table '{table_name}': {schema.columns}")
+
+        committed = 0
+        pending, pending_rows = [], 0
+        conn = self.pool.acquire()
+
+        def run(parts, commit=False):
+            # Insère des blocs dans la transaction en cours, puis la valide si demandé. Après une erreur
+            # transitoire, la transaction est annulée (connexion remplacée si elle est coupée) et toutes
+            # les lignes non validées (`pending`) sont rejouées.
+            nonlocal conn
+            attempt = 0
+            while True:
+                try:
+                    cur = conn.cursor()
+                    for part in parts:
+                        with metrics.timer("insert", table=table_name):
+                            self.insert_chunk(cur, schema, part)
+                    if commit:
+                        with metrics.timer("commit", table=table_name):
+                            conn.commit()
+                    cur.close()
+                    return
+                except Exception as e:
+                    if attempt >= self.retries or not self.is_transient(e):
+                        raise
+                    attempt += 1
+                    delay = self.retry_delay(attempt)
+                    rows = sum(len(part) for part in pending)
+                    log.warning(f"Erreur transitoire sur la table '{table_name}' : {e}. Transaction de {rows} lignes "
+                                f"rejouée dans {delay:.1f}s (tentative {attempt}/{self.retries}).",
+                                extra={"fields": {"event": "retry", "table": table_name, "attempt": attempt, "rows": rows}})
+                    metrics.inc("etl_transaction_retries_total", table=table_name)
+                    time.sleep(delay)
+                    conn = self.pool.reset(conn)
+                    if conn is None:
+                        conn = self.pool.acquire()
+                    parts = pending
+
+        try:
+            for index, df in enumerate(data):
+                # Vérification du nombre de colonnes (une fois par fichier)
+                if index == 0 and len(schema.columns) != len(df.columns):
+                    raise ValueError(f"Le nombre de colonnes du DataFrame ({len(df.columns)}) "
+                                     f"ne correspond pas à celui de la table ({len(schema.columns)}).")
+                limit = self.commit_limit(df)
+                start = 0
+                while start < len(df):
+                    part = df.iloc[start:start + max(limit - pending_rows, 1)]
+                    start += len(part)
+                    pending.append(part)
+                    pending_rows += len(part)
+                    run([part])
+                    if pending_rows >= limit:
+                        run([], commit=True)
+                        committed += pending_rows
+                        pending, pending_rows = [], 0
+                        if on_commit:
+                            on_commit(committed)
+
+            if pending:
+                run([], commit=True)
+                committed += pending_rows
+                if on_commit:
+                    on_commit(committed)
+        finally:
+            if conn is not None:
+                self.pool.release(conn)
+        return committed
+
+    def upsert(self, table_name, data, on_commit=None):
+        """
+        Recharge un fichier de façon idempotente : les blocs sont chargés en masse dans la table de transit
+        `<table>_staging` (vidée au préalable, transactions bornées comme pour `write`), puis appliqués à la
+        table cible en une seule transaction ensembliste (`merge_queries`) : les lignes dont les colonnes
+        clés existent déjà sont mises à jour, les autres sont insérées. Recharger le même fichier ne crée
+        donc aucun doublon. `on_commit` n'est appelé qu'une fois la fusion validée.
+        :param table_name: Nom de la table cible.
+        :param data: Itérable de DataFrame (blocs).
+        :param on_commit: Fonction appelée avec le nombre de lignes du fichier après la fusion.
+        :return: Nombre de lignes du fichier fusionnées dans la table.
+        """
+        keys = self.upsert_keys[table_name]
+        staging = f"{table_name}_staging"
+        with metrics.timer("schema", table=table_name):
+            schema = self.schema_cache.get(table_name)
+        if schema is None:
+            raise ValueError(f"La table '{table_name}' n'existe pas.")
+        missing = [key for key in keys if key not in schema.columns]
+        if missing:
+            raise ValueError(f"Colonnes clés absentes de la table '{table_name}' (UPSERT_KEYS) : {missing}")
+
+        # Une seule fusion à la fois par table : la table de transit est propre à la table cible
+        with self._upsert_locks_guard:
+            lock = self._upsert_locks.setdefault(table_name, threading.Lock())
+        with lock:
+            if table_name not in self._upsert_ready:
+                self.execute(staging, self.create_staging_queries(schema, staging))
+                self.schema_cache.invalidate(staging)
+                try:
+                    self.execute(table_name, [self.key_index_query(table_name, keys)])
+                except Exception as e:
+                    log.warning(f"Index sur les colonnes clés de la table '{table_name}' non créé : {e}")
+                self._upsert_ready.add(table_name)
+
+            self.execute(staging, [self.clear_query(staging)])
+            staged = self.write(staging, data)
+            with metrics.timer("merge", table=table_name):
+                self.execute(table_name, self.merge_queries(table_name, staging, schema.columns, keys)
+                             + [self.clear_query(staging)])
+            log.info(f"{staged} lignes fusionnées dans la table '{table_name}' (clés : {', '.join(keys)}).",
+                     extra={"fields": {"event": "upsert", "table": table_name, "rows": staged}})
+        if on_commit:
+            on_commit(staged)
+        return staged
+
+    def execute(self, table_name, queries):
+        """
+        Exécute des requêtes dans une seule transaction, rejouée après une erreur transitoire
+        (RETRY_ATTEMPTS tentatives, attente exponentielle).
+        :param table_name: Table concernée (journalisation et métriques).
+        :param queries: Liste des requêtes SQL.
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.pool.connection() as conn:
+                    cur = conn.cursor()
+                    for query in queries:
+                        cur.execute(query)
+                    conn.commit()
+                    cur.close()
+                return
+            except Exception as e:
+                if attempt >= self.retries or not self.is_transient(e):
+                    raise
+                attempt += 1
+                delay = self.retry_delay(attempt)
+                log.warning(f"Erreur transitoire sur la table '{table_name}' : {e}. Transaction rejouée dans "
+                            f"{delay:.1f}s (tentative {attempt}/{self.retries}).",
+                            extra={"fields": {"event": "retry", "table": table_name, "attempt": attempt}})
+                metrics.inc("etl_transaction_retries_total", table=table_name)
+                time.sleep(delay)
+
+    def create_staging_queries(self, schema, staging):
+        """
+        Requêtes (re)créant la table de transit au premier chargement : mêmes colonnes et types que la table
+        cible, plus une colonne 'id' auto-incrémentée qui numérote les lignes dans l'ordre du fichier
+        (`deduplicated_source`). Comme pour les tables cibles, 'id' n'est pas alimentée par les insertions.
+        :param schema: Schéma de la table cible (SchemaCache).
+        :param staging: Nom de la table de transit.
+        """
+        columns_str = ", ".join(self.quote(col) for col in schema.columns)
+        return [f"DROP TABLE IF EXISTS {self.quote(staging)};",
+                f"CREATE TABLE {self.quote(staging)} AS SELECT {columns_str} FROM {self.quote(schema.name)} WHERE 1 = 0;",
+                f"ALTER TABLE {self.quote(staging)} ADD COLUMN id BIGINT GENERATED ALWAYS AS IDENTITY;"]
+
+    def clear_query(self, table_name):
+        """
+        Requête vidant une table.
+        """
+        return f"DELETE FROM {self.quote(table_name)};"
+
+    def key_index_query(self, table_name, keys):
+        """
+        Requête de création (si absent) de l'index sur les colonnes clés, utilisé par la fusion.
+        """
+        keys_str = ", ".join(self.quote(key) for key in keys)
+        return f"CREATE INDEX IF NOT EXISTS {self.quote(f'ix_{table_name}_upsert')} ON {self.quote(table_name)} ({keys_str});"
+
+    def deduplicated_source(self, staging, columns, keys):
+        """
+        Sous-requête lisant la table de transit avec une seule ligne par valeur des colonnes clés
+        (un fichier peut contenir plusieurs fois la même clé) : la dernière du fichier, d'après 'id'.
+        """
+        columns_str = ", ".join(self.quote(col) for col in columns)
+        keys_str = ", ".join(self.quote(key) for key in keys)
+        return (f"(SELECT {columns_str} FROM (SELECT {columns_str}, ROW_NUMBER() OVER "
+                f"(PARTITION BY {keys_str} ORDER BY id DESC) AS etl_rank FROM {self.quote(staging)}) AS ranked "
+                f"WHERE etl_rank = 1)")
+
+    def key_match(self, target, keys):
+        """
+        Condition de correspondance des colonnes clés entre la table cible et la source `s`. Une clé NULL
+        correspond à une clé NULL, pour qu'une ligne dont une clé est vide soit mise à jour, et non
+        insérée de nouveau, à chaque rechargement.
+        :param target: Nom (ou alias) de la table cible.
+        :param keys: Colonnes clés.
+        """
+        return " AND ".join(
+            f"({target}.{self.quote(key)} = s.{self.quote(key)} OR ({target}.{self.quote(key)} IS NULL AND s.{self.quote(key)} IS NULL))"
+            for key in keys
+        )
+
+    def merge_queries(self, table_name, staging, columns, keys):
+        """
+        Requêtes appliquant la table de transit à la table cible : UPDATE ... FROM des lignes existantes,
+        puis INSERT ... WHERE NOT EXISTS des nouvelles clés.
+        """
+        target = self.quote(table_name)
+        source = self.deduplicated_source(staging, columns, keys)
+        match = self.key_match(target, keys)
+        values = [col for col in columns if col not in keys]
+        queries = []
+        if values:
+            assignments = ", ".join(f"{self.quote(col)} = s.{self.quote(col)}" for col in values)
+            queries.append(f"UPDATE {target} SET {assignments} FROM {source} AS s WHERE {match};")
+        columns_str = ", ".join(self.quote(col) for col in columns)
+        selected = ", ".join(f"s.{self.quote(col)}" for col in columns)
+        queries.append(f"INSERT INTO {target} ({columns_str}) SELECT {selected} FROM {source} AS s "
+                       f"WHERE NOT EXISTS (SELECT 1 FROM {target} WHERE {match});")
+        return queries
+
+    def savepoint_queries(self, table_name):
+        """
+        Requêtes (pose, retour, libération) du point de sauvegarde posé avant chaque lot d'INSERT, pour annuler
+        les lignes d'un lot en échec avant de le rejouer ligne par ligne.
+        :param table_name: Nom de la table alimentée.
+        """
+        return "SAVEPOINT etl_batch;", "ROLLBACK TO SAVEPOINT etl_batch;", "RELEASE SAVEPOINT etl_batch;"
+
+    def insert_chunk(self, cur, schema, df):
+        """
+        Insère un bloc avec des INSERT paramétrés envoyés par lots.
+        :return: Nombre de lignes insérées.
+        """
+        return self.bulk_inserter.insert(cur, schema.insert_query, df, self.is_transient,
+                                         self.savepoint_queries(schema.name))
+
+
+class SqlServerSink(Sink):
+    def __init__(self, db_params):
+        """
+        Destination SQL Server (pyodbc, `fast_executemany`).
+        :param db_params: Paramètres de connexion pyodbc (Driver, Server, Database, UID, PWD).
+        """
+        import pyodbc
+        super().__init__(lambda: pyodbc.connect(**db_params))
+
+    def quote(self, name):
+        return f"[{name}]"
+
+    def create_table_query(self, table_name, column_definitions):
+        return f"""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{table_name}' AND xtype='U')
+            CREATE TABLE {self.quote(table_name)} (
+                id INT IDENTITY(1,1) PRIMARY KEY,
+                {column_definitions}
+            );
+        """
+
+    def savepoint_queries(self, table_name):
+        # SAVE TRANSACTION exige une transaction ouverte : en mode de validation manuelle (transactions
+        # implicites), une lecture de la table l'ouvre si aucune instruction ne l'a encore fait.
+        # Un point de sauvegarde SQL Server ne se libère pas.
+        return (f"SET NOCOUNT ON; IF @@TRANCOUNT = 0 BEGIN DECLARE @etl_open INT; "
+                f"SELECT @etl_open = 1 FROM {self.quote(table_name)} WHERE 1 = 0; END; SAVE TRANSACTION etl_batch;",
+                "ROLLBACK TRANSACTION etl_batch;", None)
+
+    def create_staging_queries(self, schema, staging):
+        columns_str = ", ".join(self.quote(col) for col in schema.columns)
+        return [f"IF OBJECT_ID(N'{staging}', N'U') IS NOT NULL DROP TABLE {self.quote(staging)};",
+                f"SELECT TOP 0 IDENTITY(BIGINT, 1, 1) AS id, {columns_str} INTO {self.quote(staging)} "
+                f"FROM {self.quote(schema.name)};"]
+
+    def clear_query(self, table_name):
+        return f"TRUNCATE TABLE {self.quote(table_name)};"
+
+    def key_index_query(self, table_name, keys):
+        keys_str = ", ".join(self.quote(key) for key in keys)
+        return (f"IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_{table_name}_upsert') "
+                f"CREATE INDEX {self.quote(f'ix_{table_name}_upsert')} ON {self.quote(table_name)} ({keys_str});")
+
+    def merge_queries(self, table_name, staging, columns, keys):
+        """
+        Une seule instruction MERGE : mise à jour des clés existantes, insertion des nouvelles.
+        """
+        match = self.key_match("t", keys)
+        values = [col for col in columns if col not in keys]
+        columns_str = ", ".join(self.quote(col) for col in columns)
+        selected = ", ".join(f"s.{self.quote(col)}" for col in columns)
+        query = f"MERGE {self.quote(table_name)} AS t USING {self.deduplicated_source(staging, columns, keys)} AS s ON {match}"
+        if values:
+            assignments = ", ".join(f"t.{self.quote(col)} = s.{self.quote(col)}" for col in values)
+            query += f" WHEN MATCHED THEN UPDATE SET {assignments}"
+        return [query + f" WHEN NOT MATCHED BY TARGET THEN INSERT ({columns_str}) VALUES ({selected});"]
+
+
+POSTGRES_TYPES = [
+    (r"NVARCHAR\(MAX\)", "TEXT"),
+    (r"NVARCHAR\((\d+)\)", r"VARCHAR(\1)"),
+    (r"DATETIME2", "TIMESTAMP"),
+    (r"BIT", "BOOLEAN"),
+    (r"FLOAT", "DOUBLE PRECISION"),
+]
+
+
+class PostgresSink(Sink):
+    placeholder = "%s"
+
+    def __init__(self, db_params):
+        """
+        Destination PostgreSQL (psycopg2) : les blocs sont chargés par `COPY ... FROM STDIN`
+        à partir d'un tampon CSV en mémoire. Le port est lu dans DB_PORT (5432 par défaut).
+        :param db_params: Paramètres de connexion (Server, Database, UID, PWD).
+        """
+        import psycopg2
+        super().__init__(lambda: psycopg2.connect(
+            host=db_params.get("Server"),
+            port=int(os.getenv("DB_PORT", 5432)),
+            dbname=db_params.get("Database"),
+            user=db_params.get("UID"),
+            password=db_params.get("PWD"),
+        ))
+
+    def map_type(self, sql_type):
+        for pattern, replacement in POSTGRES_TYPES:
+            if re.fullmatch(pattern, sql_type.strip(), re.IGNORECASE):
+                return re.sub(pattern, replacement, sql_type.strip(), flags=re.IGNORECASE)
+        return sql_type
+
+    def columns_query(self, table_name=None):
+        query, params = super().columns_query(table_name)
+        return query.replace("WHERE", "WHERE TABLE_SCHEMA = current_schema() AND", 1), params
+
+    def create_table_query(self, table_name, column_definitions):
+        return f"""
+            CREATE TABLE IF NOT EXISTS {self.quote(table_name)} (
+                id SERIAL PRIMARY KEY,
+                {column_definitions}
+            );
+        """
+
+    def clear_query(self, table_name):
+        return f"TRUNCATE TABLE {self.quote(table_name)};"
+
+    def insert_chunk(self, cur, schema, df):
+        """
+        Charge un bloc en une seule commande `COPY ... FROM STDIN WITH (FORMAT csv)` ;
+        les valeurs manquantes sont écrites `\\N` et deviennent NULL, une chaîne vide reste une chaîne vide
+        comme avec les INSERT.
+        Avec INSERT_MODE=row, les lignes sont insérées une par une comme pour les autres bases.
+        """
+        if not self.bulk_inserter.bulk:
+            return super().insert_chunk(cur, schema, df)
+
+        buffer = io.StringIO()
+        self.to_copy_frame(df).to_csv(buffer, index=False, header=False, na_rep="\\N")
+        buffer.seek(0)
+        columns_str = ", ".join(self.quote(col) for col in schema.columns)
+        cur.copy_expert(f"COPY {self.quote(schema.name)} ({columns_str}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                        buffer)
+        return len(df)
+
+    def to_copy_frame(self, df):
+        """
+        Réécrit en entiers les colonnes décimales dont toutes les valeurs sont entières
+        (colonnes entières converties en float par pandas à cause des valeurs manquantes),
+        pour que `COPY` les accepte dans une colonne INT ou BIGINT.
+        """
+        integral = [
+            column for column, dtype in zip(df.columns, df.dtypes)
+            if pd.api.types.is_float_dtype(dtype) and (df[column].dropna() % 1 == 0).all()
+        ]
+        if not integral:
+            return df
+        df = df.copy()
+        for column in integral:
+            df[column] = df[column].astype("Int64")
+        return df
+
+
+SQLITE_TYPES = [
+    (r"NVARCHAR\((\d+|MAX)\)", "TEXT"),
+    (r"DATETIME2|DATE", "TEXT"),
+    (r"BIT", "INTEGER"),
+    (r"DECIMAL\(\d+,\s*\d+\)", "NUMERIC"),
+    (r"FLOAT", "REAL"),
+]
+
+
+class SqliteSink(Sink):
+    def __init__(self, db_params):
+        """
+        Destination SQLite locale, pour les essais sans serveur de base de données.
+        :param db_params: Ignorés ; le fichier de la base est lu dans SQLITE_PATH (etl.sqlite par défaut).
+        """
+        self.path = os.getenv("SQLITE_PATH", "etl.sqlite")
+        super().__init__(lambda: sqlite3.connect(self.path, timeout=60, check_same_thread=False))
+
+    def savepoint_queries(self, table_name):
+        # Libérer un point de sauvegarde posé hors transaction validerait la transaction qu'il a ouverte :
+        # les points de sauvegarde restent posés jusqu'à la validation.
+        return "SAVEPOINT etl_batch;", "ROLLBACK TO SAVEPOINT etl_batch;", None
+
+    def create_staging_queries(self, schema, staging):
+        # CREATE TABLE ... AS ne permet pas d'ajouter une colonne auto-incrémentée : la table de transit est
+        # créée avec les types déclarés de la table cible (PRAGMA table_info, sans perte)
+        definitions = self.column_definitions(dict(zip(schema.columns, schema.types)))
+        return [f"DROP TABLE IF EXISTS {self.quote(staging)};", self.create_table_query(staging, definitions)]
+
+    def map_type(self, sql_type):
+        for pattern, replacement in SQLITE_TYPES:
+            if re.fullmatch(pattern, sql_type.strip(), re.IGNORECASE):
+                return replacement
+        return sql_type
+
+    def fetch_columns(self, table_name=None):
+        tables = {}
+        with self.pool.connection() as conn:
+            if table_name is None:
+                names = [row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+            else:
+                names = [table_name]
+            for name in names:
+                columns = [(row[1], row[2]) for row in conn.execute(f"PRAGMA table_info({self.quote(name)})")
+                           if row[1] != "id"]
+                if columns:
+                    tables[name] = columns
+        return tables
+
+    def create_table_query(self, table_name, column_definitions):
+        return f"""
+            CREATE TABLE IF NOT EXISTS {self.quote(table_name)} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                {column_definitions}
+            );
+        """
+
+
+def parse_upsert_keys(value):
+    """
+    Lit la configuration UPSERT_KEYS : "table1=col1,col2;table2=col".
+    :return: Dictionnaire {table: [colonnes clés]}.
+    """
+    keys = {}
+    for entry in value.split(";"):
+        if not entry.strip():
+            continue
+        table_name, _, columns = entry.partition("=")
+        columns = [column.strip() for column in columns.split(",") if column.strip()]
+        if not columns:
+            raise ValueError(f"UPSERT_KEYS : aucune colonne clé pour la table '{table_name.strip()}'.")
+        keys[table_name.strip()] = columns
+    return keys
+
+
+SINKS = {
+    "sqlserver": SqlServerSink,
+    "postgres": PostgresSink,
+    "sqlite": SqliteSink,
+}
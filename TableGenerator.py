@@ -1,8 +1,9 @@
 import os
-import pandas as pd
-import pyodbc
 import re
-import csv
+from FileReader import FileReader
+from Sinks import Sink
+from TypeInference import TypeInferer
+from Instrumentation import log, metrics, profiled
 
 
 
@@ -19,6 +20,11 @@ class TableGenerator:
             "UID": os.getenv("DB_USER"),
             "PWD": os.getenv("DB_PASSWORD"),
         }
+        self.sink = Sink.shared(self.db_params)
+        self.pool = self.sink.pool
+        self.schema_cache = self.sink.schema_cache
+        self.file_reader = FileReader()
+        self.type_inferer = TypeInferer()
 
     def normalize_table_name(self, name):
         """
@@ -36,13 +42,16 @@ class TableGenerator:
         """
         Parcourt récursivement les dossiers et traite ceux ne contenant pas `emails_attachments`.
         """
-        for dirpath, dirnames, filenames in os.walk(self.root_dir):
-            dirnames[:] = [d for d in dirnames if d != "emails_attachments"]
+        try:
+            for dirpath, dirnames, filenames in os.walk(self.root_dir):
+                dirnames[:] = [d for d in dirnames if d != "emails_attachments"]
 
-            for dirname in dirnames:
-                folder_path = os.path.join(dirpath, dirname)
-                normalized_name = self.normalize_table_name(dirname)
-                self.process_folder(folder_path, normalized_name)
+                for dirname in dirnames:
+                    folder_path = os.path.join(dirpath, dirname)
+                    normalized_name = self.normalize_table_name(dirname)
+                    self.process_folder(folder_path, normalized_name)
+        finally:
+            metrics.write_textfile()
 
     def process_folder(self, folder_path, table_name):
         """
@@ -50,73 +59,95 @@ class TableGenerator:
         :param folder_path: Chemin du dossier.
         :param table_name: Nom de la table à créer.
         """
-        files = [f for f in os.listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f))]
+        files = sorted(f for f in os.listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f)))
         if not files:
-            print(f"Aucun fichier trouvé dans {folder_path}")
+            log.warning(f"Aucun fichier trouvé dans {folder_path}")
             return
 
-        # On lit le premier fichier dans le dossier
+        # On lit le premier fichier du dossier, dans l'ordre où DataInserter les charge
         first_file = os.path.join(folder_path, files[0])
-        print(f"Traitement du fichier : {first_file}")
+        log.info(f"Traitement du fichier : {first_file}")
+
+        # Lecture d'un échantillon du fichier (Excel ou CSV) : seul le début du fichier est lu
+        if not self.file_reader.is_supported(first_file):
+            log.warning(f"Format non supporté pour le fichier : {first_file}")
+            return
+        # Archive .zip : la table est générée à partir de son premier fichier de données
+        try:
+            member = None
+            if self.file_reader.is_archive(first_file):
+                members = self.file_reader.archive_members(first_file)
+                if not members:
+                    log.warning(f"Aucun fichier pris en charge dans l'archive {first_file}")
+                    return
+                member = members[0]
+        except Exception as e:
+            log.error(f"Erreur lors de la lecture de l'archive {first_file}: {e}")
+            return
+        if not self.file_reader.is_multi_sheet(first_file, member):
+            self.generate_table(first_file, table_name, member=member)
+            return
+
+        # Classeur lu feuille par feuille : une table par cible de SHEET_TABLES, générée depuis sa première feuille
+        try:
+            targets = self.file_reader.sheet_targets(first_file, table_name, self.normalize_table_name, member)
+        except Exception as e:
+            log.error(f"Erreur lors de la lecture des feuilles du fichier {first_file}: {e}")
+            return
+        generated = set()
+        for sheet, target in targets:
+            if target not in generated:
+                generated.add(target)
+                self.generate_table(first_file, target, sheet, member)
 
-        # Lecture du fichier (Excel ou CSV)
+    def generate_table(self, file_path, table_name, sheet=None, member=None):
+        """
+        Génère une table à partir d'un échantillon d'un fichier (ou d'une feuille d'un classeur).
+        :param file_path: Chemin du fichier.
+        :param table_name: Nom de la table à créer.
+        :param sheet: Feuille du classeur lue, ou None pour la première feuille.
+        :param member: Fichier lu dans une archive .zip, ou None.
+        """
         try:
-            if first_file.endswith(".xlsx") or first_file.endswith(".xls"):
-                df = pd.read_excel(first_file)
-            elif first_file.endswith(".csv"):
-                with open(first_file, "r") as file:
-                    dialect = csv.Sniffer().sniff(file.read(1024))
-                    file.seek(0)
-                    df = pd.read_csv(file, sep=dialect.delimiter)
-            else:
-                print(f"Format non supporté pour le fichier : {first_file}")
-                return
+            with metrics.timer("sample", table=table_name):
+                df = self.file_reader.read_sample(file_path, self.type_inferer.sample_size, sheet=sheet, member=member)
         except Exception as e:
-            print(f"Erreur lors de la lecture du fichier {first_file}: {e}")
+            parts = "".join(f" ({part})" for part in (member, sheet) if part is not None)
+            log.error(f"Erreur lors de la lecture du fichier {file_path}{parts}: {e}")
             return
 
-        # Demander les noms de colonnes
-        columns = {}
-        for column in df.columns:
-            new_name = input(f"Entrez un nom pour la colonne '{column}' : ")
-            columns[column] = new_name
+        # Proposer un type par colonne, puis faire confirmer ou modifier les noms et les types
+        with metrics.timer("infer", table=table_name):
+            column_types = self.type_inferer.infer(df)
+        columns, column_types = self.type_inferer.confirm(column_types)
 
         df.rename(columns=columns, inplace=True)
 
         # Création de la table et insertion des données
-        self.create_table(table_name, df)
+        self.create_table(table_name, df, column_types)
 
-    def create_table(self, table_name, df):
+    def create_table(self, table_name, df, column_types=None):
         """
-        Crée une table dans SQL Server et insère les données.
+        Crée une table dans la base de données configurée (DB_BACKEND).
         :param table_name: Nom de la table.
         :param df: DataFrame contenant les données à insérer.
+        :param column_types: Dictionnaire {colonne: type SQL} ; NVARCHAR(MAX) pour toutes les colonnes si absent.
         """
-        try:
-            conn = pyodbc.connect(**self.db_params)
-            cur = conn.cursor()
+        if column_types is None:
+            column_types = {col: "NVARCHAR(MAX)" for col in df.columns}
 
+        try:
             # Création de la table avec une colonne 'id' auto-incrémentée
-            column_definitions = ", ".join([f"[{col}] NVARCHAR(MAX)" for col in df.columns])
-            create_table_query = f"""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{table_name}' AND xtype='U')
-                CREATE TABLE {table_name} (
-                    id INT IDENTITY(1,1) PRIMARY KEY,
-                    {column_definitions}
-                );
-            """
-            cur.execute(create_table_query)
-            conn.commit()
-            print(f"Table '{table_name}' créée avec succès.")
+            self.sink.create_table(table_name, column_types)
+            log.info(f"Table '{table_name}' créée avec succès.")
         except Exception as e:
-            print(f"Erreur lors de la créatio  {table_name}: {e}")
-        finally:
-            if conn:
-                cur.close()
-                conn.close()
+            log.error(f"Erreur lors de la créatio  {table_name}: {e}")
 
 
 # Utilisation
 if __name__ == "__main__":
-    generator = TableGenerator()
-    generator.scan_and_process()
+    with profiled():
+        generator = TableGenerator()
+        generator.scan_and_process()
+        generator.pool.report()
+        generator.pool.close_all()
@@ -0,0 +1,132 @@
+import os
+import pandas as pd
+
+
+INT_RANGE = (-2**31, 2**31 - 1)
+BIGINT_RANGE = (-2**63, 2**63 - 1)
+NVARCHAR_SIZES = (50, 100, 255, 500, 1000, 4000)
+
+
+class TypeInferer:
+    def __init__(self, sample_size=None):
+        """
+        Initialise le moteur d'inférence des types de colonnes SQL Server.
+        :param sample_size: Nombre de lignes échantillonnées par fichier (TYPE_SAMPLE_ROWS, 10000 par défaut).
+        """
+        self.sample_size = int(sample_size or os.getenv("TYPE_SAMPLE_ROWS", 10000))
+        # AUTO_CONFIRM_SCHEMA=1 accepte le schéma proposé sans poser de question
+        self.auto_confirm = os.getenv("AUTO_CONFIRM_SCHEMA", "0") == "1"
+
+    def infer(self, df):
+        """
+        Propose un type SQL Server pour chaque colonne d'un échantillon de données.
+        :param df: DataFrame échantillon.
+        :return: Dictionnaire {colonne: type SQL}.
+        """
+        sample = df.head(self.sample_size)
+        return {column: self.infer_column(sample[column]) for column in sample.columns}
+
+    def infer_column(self, series):
+        """
+        Propose un type pour une colonne à l'aide de contrôles vectorisés pandas :
+        INT/BIGINT, DECIMAL(p,s), FLOAT, BIT, DATE, DATETIME2 ou NVARCHAR(n).
+        :param series: Valeurs de la colonne.
+        """
+        values = series.dropna()
+        kind = pd.api.types.infer_dtype(values, skipna=True)
+
+        if values.empty:
+            return "NVARCHAR(255)"
+        if kind == "boolean":
+            return "BIT"
+        if kind in ("datetime64", "datetime"):
+            timestamps = pd.to_datetime(values)
+            return "DATE" if (timestamps == timestamps.dt.normalize()).all() else "DATETIME2"
+        if kind == "date":
+            return "DATE"
+        if kind == "integer":
+            return self._integer_type(values.min(), values.max())
+        if kind in ("floating", "mixed-integer-float", "decimal"):
+            numbers = pd.to_numeric(values)
+            if (numbers % 1 == 0).all():
+                return self._integer_type(numbers.min(), numbers.max())
+            return self._decimal_type(values.astype(str))
+
+        return self._text_type(values.astype(str).str.strip())
+
+    def _text_type(self, text):
+        """
+        Type d'une colonne texte : nombres et dates au format ISO sont reconnus, sinon NVARCHAR(n).
+        Les codes commençant par zéro restent du texte pour conserver ce zéro.
+        """
+        text = text[text != ""]
+        if text.empty:
+            return "NVARCHAR(255)"
+
+        if text.str.fullmatch(r"[+-]?\d+").all() and not text.str.match(r"[+-]?0\d").any():
+            numbers = pd.to_numeric(text)
+            return self._integer_type(numbers.min(), numbers.max())
+        if text.str.fullmatch(r"[+-]?\d+\.\d+").all() and not text.str.match(r"[+-]?0\d").any():
+            return self._decimal_type(text)
+
+        date = text.str.fullmatch(r"\d{4}-\d{2}-\d{2}")
+        datetime = text.str.fullmatch(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?")
+        if (date | datetime).all() and pd.to_datetime(text, errors="coerce", format="mixed").notna().all():
+            return "DATE" if date.all() else "DATETIME2"
+
+        longest = int(text.str.len().max())
+        for size in NVARCHAR_SIZES:
+            if longest * 2 <= size:
+                return f"NVARCHAR({size})"
+        return "NVARCHAR(MAX)"
+
+    def _integer_type(self, minimum, maximum):
+        """
+        Plus petit type entier contenant les valeurs observées.
+        """
+        if INT_RANGE[0] <= minimum and maximum <= INT_RANGE[1]:
+            return "INT"
+        if BIGINT_RANGE[0] <= minimum and maximum <= BIGINT_RANGE[1]:
+            return "BIGINT"
+        return "DECIMAL(38,0)"
+
+    def _decimal_type(self, text):
+        """
+        DECIMAL(p,s) déduit du nombre de chiffres observés (FLOAT pour la notation scientifique).
+        """
+        if text.str.contains("[eE]").any():
+            return "FLOAT"
+        parts = text.str.lstrip("+-").str.split(".", n=1, expand=True)
+        integer_digits = int(parts[0].str.len().max())
+        scale = int(parts[1].fillna("").str.len().max()) if parts.shape[1] > 1 else 0
+        scale = min(scale, 10)
+        precision = min(integer_digits + 2 + scale, 38)
+        return f"DECIMAL({precision},{scale})"
+
+    def confirm(self, column_types):
+        """
+        Affiche le schéma proposé et permet de le confirmer ou de le modifier colonne par colonne.
+        Pour chaque colonne, saisir `nom`, `nom:TYPE` ou `:TYPE` ; Entrée seule conserve la proposition.
+        :param column_types: Dictionnaire {colonne: type SQL proposé}.
+        :return: Tuple (dictionnaire de renommage {colonne: nouveau nom}, dictionnaire {nouveau nom: type}).
+        """
+        print("Schéma proposé :")
+        for column, sql_type in column_types.items():
+            print(f"  - {column} : {sql_type}")
+
+        renames, types = {}, {}
+        for column, sql_type in column_types.items():
+            while True:
+                answer = "" if self.auto_confirm else input(
+                    f"Colonne '{column}' [{sql_type}] : nom et/ou type (nom:TYPE, Entrée pour conserver) : ")
+                name, _, new_type = answer.strip().partition(":")
+                name = name.strip() or str(column)
+                if name not in types:
+                    break
+                # Deux colonnes du même nom écraseraient le type de la première dans la table créée
+                if self.auto_confirm:
+                    raise ValueError(f"Le nom de colonne '{name}' est utilisé par plusieurs colonnes.")
+                print(f"Le nom '{name}' est déjà utilisé par une autre colonne, saisir un autre nom.")
+            renames[column] = name
+            types[name] = new_type.strip().upper() or sql_type
+        return renames, types
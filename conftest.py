@@ -0,0 +1,3 @@
+# Scripts de vérification des connexions (SQL Server, messagerie), à lancer à la main avec un serveur :
+# ils ne font pas partie des tests
+collect_ignore = ["test_conn_db.py", "test_conn_email.py"]
@@ -0,0 +1,81 @@
+import os
+import pytest
+from DataInsert import DataInserter
+from Sinks import Sink
+
+
+@pytest.fixture
+def inserter(tmp_path, monkeypatch):
+    """
+    DataInserter sur un ROOT_DIR temporaire, écrivant dans SQLite par transactions de 2 lignes,
+    avec des blocs lus de 3 lignes et un manifeste dans le même dossier.
+    """
+    for name in ("READ_MODE", "SHEET_MODE", "SHEET_TABLES", "PARSE_CACHE_DIR", "UPSERT_KEYS", "PARSE_WORKERS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("ROOT_DIR", str(tmp_path / "racine"))
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "etl.sqlite"))
+    monkeypatch.setenv("MANIFEST_PATH", str(tmp_path / "manifest.sqlite"))
+    monkeypatch.setenv("COMMIT_EVERY_ROWS", "2")
+    monkeypatch.setenv("READ_CHUNK_SIZE", "3")
+    monkeypatch.setenv("RETRY_BACKOFF", "0")
+    # Destination propre à chaque test (`Sink.shared` la réutiliserait d'un test à l'autre)
+    monkeypatch.setattr(Sink, "_sinks", {})
+    inserter = DataInserter()
+    inserter.sink.create_table("ventes", {"ref": "INT", "libelle": "NVARCHAR(50)"})
+    yield inserter
+    inserter.manifest.close()
+    inserter.sink.pool.close_all()
+
+
+def write_file(tmp_path, rows, name="ventes.csv"):
+    folder = tmp_path / "racine" / "ventes"
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / name
+    path.write_text("ref;libelle\n" + "".join(f"{ref};ligne {ref}\n" for ref in rows), encoding="utf-8")
+    return str(path)
+
+
+def table_rows(inserter):
+    with inserter.pool.connection() as conn:
+        return [ref for ref, in conn.execute('SELECT "ref" FROM "ventes" ORDER BY id')]
+
+
+def manifest_entries(inserter):
+    return inserter.manifest.conn.execute("SELECT rows_committed, status FROM ingested_files").fetchall()
+
+
+def test_reprise_apres_un_echec_en_cours_de_fichier(inserter, tmp_path, monkeypatch):
+    """
+    Un fichier interrompu après deux transactions validées est repris à la ligne suivante, sans doublon ;
+    le même contenu déposé de nouveau est reconnu par son empreinte et seulement supprimé.
+    """
+    path = write_file(tmp_path, range(1, 8))
+    insert_chunk = inserter.sink.insert_chunk
+
+    def failing_insert(cur, schema, df):
+        if 5 in df["ref"].values:
+            raise ValueError("panne simulée")
+        return insert_chunk(cur, schema, df)
+
+    monkeypatch.setattr(inserter.sink, "insert_chunk", failing_insert)
+    assert inserter.process_file(path, "ventes") is False
+    assert table_rows(inserter) == [1, 2, 3, 4]
+    assert manifest_entries(inserter) == [(4, "partial")]
+
+    monkeypatch.setattr(inserter.sink, "insert_chunk", insert_chunk)
+    skipped = []
+    skip_rows = inserter.file_reader.skip_rows
+    monkeypatch.setattr(inserter.file_reader, "skip_rows",
+                        lambda chunks, count: skipped.append(count) or skip_rows(chunks, count))
+    assert inserter.process_file(path, "ventes") is True
+    assert skipped == [4]
+    assert table_rows(inserter) == [1, 2, 3, 4, 5, 6, 7]
+    assert manifest_entries(inserter) == [(7, "done")]
+
+    path = write_file(tmp_path, range(1, 8), name="ventes_copie.csv")
+    assert inserter.process_file(path, "ventes") is True
+    assert table_rows(inserter) == [1, 2, 3, 4, 5, 6, 7]
+    assert skipped == [4]
+    assert manifest_entries(inserter) == [(7, "done")]
+    assert not os.path.exists(path)
@@ -0,0 +1,273 @@
+import bz2
+import gzip
+import io
+import zipfile
+import openpyxl
+import pandas as pd
+import pytest
+import FileReader as file_reader_module
+from FileReader import FileReader, first_record_end, last_record_end, parse_in_worker
+
+
+def make_reader(monkeypatch, engine="pyarrow", chunksize=4, **env):
+    """
+    Lecteur sans cache, avec des blocs de `chunksize` lignes et les variables d'environnement données.
+    """
+    for name in ("READ_MODE", "SHEET_MODE", "SHEET_TABLES", "PARSE_CACHE_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return FileReader(chunksize=chunksize, cache=False, engine=engine)
+
+
+def write(path, text, encoding="utf-8"):
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+def write_workbook(path, sheets):
+    """
+    Écrit un classeur .xlsx : {nom de feuille: liste de lignes}, dans l'ordre du dictionnaire.
+    """
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for name, rows in sheets.items():
+        worksheet = workbook.create_sheet(name)
+        for row in rows:
+            worksheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def test_limites_des_enregistrements():
+    """
+    Un saut de ligne dans une valeur entre guillemets ne termine pas un enregistrement.
+    """
+    data = b'a,b\n1,"x\ny"\n2,"z""\n'
+    assert first_record_end(data) == 4
+    assert first_record_end(b'"a\nb",c\n1,2') == 8
+    assert first_record_end(b"a,b") == 3
+    assert last_record_end(data) == 12
+    assert last_record_end(b'a,b\n1,"x\ny') == 4
+    assert last_record_end(b"a,b") == 0
+
+
+def test_csv_pyarrow_par_tranches(tmp_path, monkeypatch):
+    """
+    Le fichier est analysé par tranches de quelques octets (coupées hors des valeurs entre guillemets),
+    puis regroupé en blocs de `chunksize` lignes, avec les mêmes valeurs qu'une lecture pandas.
+    """
+    lines = ["ref;libelle;montant"] + [f'{i};"ligne {i}\nsuite; {i}";{i}.5' for i in range(10)]
+    path = write(tmp_path / "ventes.csv", "\n".join(lines) + "\n")
+    reader = make_reader(monkeypatch)
+    reader.arrow_slice_bytes = 16
+
+    chunks = list(reader.read_csv(path, None, ";", "utf-8"))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    arrow = pd.concat(chunks, ignore_index=True)
+    expected = pd.concat(make_reader(monkeypatch, "pandas").read_csv(path, None, ";", "utf-8"), ignore_index=True)
+    pd.testing.assert_frame_equal(arrow, expected)
+    assert arrow["libelle"][3] == "ligne 3\nsuite; 3"
+
+
+def test_csv_pyarrow_bascule_en_texte_apres_un_changement_de_type(tmp_path, monkeypatch):
+    """
+    Les types sont déduits de la première tranche ; une valeur non conforme plus loin dans le fichier
+    fait lire en texte sa tranche et les suivantes, sans perdre ni dupliquer de ligne.
+    """
+    lines = ["ref,libelle"] + [f"{i},a{i}" for i in range(20)] + ["x20,b"] + [f"{i},c" for i in range(21, 30)]
+    path = write(tmp_path / "ventes.csv", "\n".join(lines) + "\n")
+    reader = make_reader(monkeypatch, chunksize=5)
+    reader.arrow_slice_bytes = 40
+
+    chunks = list(reader.read_csv(path, None, ",", "utf-8"))
+    assert sum(len(chunk) for chunk in chunks) == 30
+    assert chunks[0]["ref"].dtype == "int64"
+    assert chunks[-1]["ref"].dtype == object
+    refs = [str(value) for chunk in chunks for value in chunk["ref"]]
+    assert refs == [str(i) for i in range(20)] + ["x20"] + [str(i) for i in range(21, 30)]
+
+
+@pytest.mark.parametrize("engine", ["pyarrow", "pandas"])
+def test_csv_en_tete_seul(tmp_path, engine, monkeypatch):
+    """
+    Un CSV sans ligne de données produit un seul bloc vide, avec les colonnes de l'en-tête.
+    """
+    path = write(tmp_path / "vide.csv", "ref;libelle\n")
+    [chunk] = make_reader(monkeypatch, engine).read_csv(path, None, ";", "utf-8")
+    assert list(chunk.columns) == ["ref", "libelle"]
+    assert chunk.empty
+
+
+def test_csv_pyarrow_avec_bom(tmp_path, monkeypatch):
+    path = write(tmp_path / "ventes.csv", "ref;libellé\n1;é\n2;è\n3;à\n", encoding="utf-8-sig")
+    reader = make_reader(monkeypatch)
+    reader.arrow_slice_bytes = 8
+    df = pd.concat(reader.read_csv(path, None, ";", "utf-8-sig"), ignore_index=True)
+    assert list(df.columns) == ["ref", "libellé"]
+    assert df.values.tolist() == [[1, "é"], [2, "è"], [3, "à"]]
+
+
+@pytest.mark.parametrize("engine", ["pyarrow", "pandas"])
+def test_dialecte_en_cache_par_dossier(tmp_path, engine, monkeypatch):
+    """
+    Le dialecte est détecté sur le premier fichier du dossier puis réutilisé ; il est détecté à nouveau
+    pour un fichier qui ne se lit pas avec lui (une seule colonne), sans erreur pour ce fichier.
+    """
+    reader = make_reader(monkeypatch, engine)
+    detected = []
+    detect = reader.detect_dialect
+    monkeypatch.setattr(reader, "detect_dialect", lambda *args: detected.append(args[0]) or detect(*args))
+    first = write(tmp_path / "a.csv", "ref;libelle\n1;é\n", encoding="cp1252")
+    second = write(tmp_path / "b.csv", "ref;libelle\n2;è\n", encoding="cp1252")
+    third = write(tmp_path / "c.csv", "ref|libelle\n3|x\n")
+
+    assert pd.concat(reader.iter_csv(first)).values.tolist() == [[1, "é"]]
+    assert pd.concat(reader.iter_csv(second)).values.tolist() == [[2, "è"]]
+    assert detected == [first]
+    assert pd.concat(reader.iter_csv(third)).values.tolist() == [[3, "x"]]
+    assert detected == [first, third]
+    assert reader._dialects[str(tmp_path)] == ("|", "utf-8-sig")
+
+
+def test_csv_pandas_par_blocs(tmp_path, monkeypatch):
+    """
+    Sans pyarrow, le CSV est lu par blocs de `chunksize` lignes dont les types sont déduits bloc par bloc :
+    une valeur texte dans un bloc tardif lit ce bloc en texte, sans erreur ni effet sur les blocs précédents.
+    """
+    lines = ["ref;montant"] + [f"{i};{i}.5" for i in range(9)] + ["x9;9.5"]
+    path = write(tmp_path / "ventes.csv", "\n".join(lines) + "\n")
+    chunks = list(make_reader(monkeypatch, "pandas").iter_csv(path))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert [str(chunk["ref"].dtype) for chunk in chunks] == ["int64", "int64", "object"]
+    assert [str(value) for chunk in chunks for value in chunk["ref"]] == [str(i) for i in range(9)] + ["x9"]
+    assert pd.concat(chunks)["montant"].tolist() == [i + 0.5 for i in range(10)]
+
+
+def test_excel_par_blocs(tmp_path, monkeypatch):
+    """
+    La première feuille est lue ligne par ligne en blocs de `chunksize` lignes : les lignes vides sont ignorées,
+    les lignes courtes complétées, et une feuille sans données produit un bloc vide avec ses colonnes.
+    """
+    path = write_workbook(tmp_path / "ventes.xlsx", {
+        "ventes": [["ref", "libelle", None], [1, "a"], [None, None], [2, "b", None], [3, "c"], [4, None], [5, "e"]],
+        "autre": [["x"], [0]],
+    })
+    vide = write_workbook(tmp_path / "vide.xlsx", {"ventes": [["ref", "libelle"]]})
+    reader = make_reader(monkeypatch, chunksize=2)
+
+    chunks = list(reader.iter_file(path))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    df = pd.concat(chunks, ignore_index=True)
+    assert list(df.columns) == ["ref", "libelle"]
+    assert df["ref"].tolist() == [1, 2, 3, 4, 5]
+    assert df["libelle"].tolist()[3] is None
+    assert [len(chunk) for chunk in reader.iter_file(path, sheet="autre")] == [1]
+
+    [chunk] = reader.iter_file(vide)
+    assert list(chunk.columns) == ["ref", "libelle"]
+    assert chunk.empty
+
+
+@pytest.mark.parametrize("engine", ["pyarrow", "pandas"])
+def test_csv_sans_inference_des_types(tmp_path, engine, monkeypatch):
+    """
+    Avec READ_MODE=schema, toutes les colonnes sont lues en texte (zéros en tête conservés), sans valeur
+    convertie ; seules les valeurs vides deviennent nulles.
+    """
+    path = write(tmp_path / "ventes.csv", "code;montant;jour\n007;1.50;2024-01-31\n010;;2024-02-01\n")
+    reader = make_reader(monkeypatch, engine, READ_MODE="schema")
+    reader.arrow_slice_bytes = 16
+    df = pd.concat(reader.iter_csv(path), ignore_index=True)
+    assert all(dtype == object for dtype in df.dtypes)
+    assert df["code"].tolist() == ["007", "010"]
+    assert df["montant"][0] == "1.50"
+    assert pd.isna(df["montant"][1])
+    assert df["jour"].tolist() == ["2024-01-31", "2024-02-01"]
+
+
+def test_excel_sans_inference_des_types(tmp_path, monkeypatch):
+    path = write_workbook(tmp_path / "ventes.xlsx", {"ventes": [["ref", "montant"], [1, 1.5], [2, None]]})
+    [df] = make_reader(monkeypatch, READ_MODE="schema").iter_file(path)
+    assert all(dtype == object for dtype in df.dtypes)
+    assert df.values.tolist() == [[1, 1.5], [2, None]]
+
+
+def test_lecture_dans_un_processus_de_lecture(tmp_path, monkeypatch):
+    """
+    `parse_in_worker` lit le fichier entier (ou une feuille) et retourne ses blocs avec la durée de la lecture ;
+    le lecteur du processus est créé une fois puis réutilisé.
+    """
+    make_reader(monkeypatch, READ_CHUNK_SIZE="2")
+    monkeypatch.setattr(file_reader_module, "_worker_reader", None)
+    path = write(tmp_path / "ventes.csv", "ref;libelle\n1;a\n2;b\n3;c\n")
+    chunks, seconds = parse_in_worker(path)
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert pd.concat(chunks)["libelle"].tolist() == ["a", "b", "c"]
+    assert seconds >= 0
+    reader = file_reader_module._worker_reader
+
+    workbook = write_workbook(tmp_path / "ventes.xlsx", {"a": [["ref"], [1]], "b": [["ref"], [2], [3]]})
+    chunks, _ = parse_in_worker(workbook, sheet="b")
+    assert pd.concat(chunks)["ref"].tolist() == [2, 3]
+    assert file_reader_module._worker_reader is reader
+
+
+def test_feuilles_et_tables_cibles(tmp_path, monkeypatch):
+    """
+    Avec SHEET_MODE=all, chaque feuille va dans la table de la première règle de SHEET_TABLES qui correspond
+    à son nom entier (sans tenir compte de la casse), sinon dans la table du dossier ; une règle sans table
+    ignore la feuille.
+    """
+    path = write_workbook(tmp_path / "ventes.xlsx", {name: [["ref"], [1]] for name in
+                                                     ("Janvier", "Référentiel", "Notes", "Notes 2", "Référentiel Pays")})
+    reader = make_reader(monkeypatch, SHEET_MODE="all", SHEET_TABLES="réf.*={table}_{sheet};notes=")
+    assert reader.is_multi_sheet(path)
+    assert not reader.is_multi_sheet(str(tmp_path / "ventes.csv"))
+    assert reader.sheet_targets(path, "ventes", lambda name: name.lower().replace(" ", "_")) == [
+        ("Janvier", "ventes"),
+        ("Référentiel", "ventes_référentiel"),
+        ("Notes 2", "ventes"),
+        ("Référentiel Pays", "ventes_référentiel_pays"),
+    ]
+    assert not make_reader(monkeypatch).is_multi_sheet(path)
+    with pytest.raises(ValueError, match="SHEET_TABLES"):
+        make_reader(monkeypatch, SHEET_TABLES="notes")
+
+
+@pytest.mark.parametrize("engine", ["pyarrow", "pandas"])
+def test_fichiers_compresses_et_archives(tmp_path, engine, monkeypatch):
+    """
+    Les CSV .gz et .bz2 sont lus en flux décompressé ; une archive .zip est lue membre par membre (les dossiers,
+    fichiers d'un autre format et fichiers compressés sont ignorés), y compris un classeur.
+    """
+    text = "ref;libelle\n" + "".join(f"{i};ligne {i}\n" for i in range(5))
+    gz_path, bz2_path = tmp_path / "ventes.csv.gz", tmp_path / "ventes.csv.bz2"
+    gz_path.write_bytes(gzip.compress(text.encode("utf-8")))
+    bz2_path.write_bytes(bz2.compress(text.encode("cp1252")))
+    workbook = io.BytesIO()
+    write_workbook(workbook, {"ventes": [["ref", "libelle"], [9, "classeur"]]})
+    zip_path = tmp_path / "export.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.writestr("mois/", "")
+        archive.writestr("mois/ventes.csv", text)
+        archive.writestr("lisez-moi.txt", "ignoré")
+        archive.writestr("ventes.csv.gz", gzip.compress(text.encode()))
+        archive.writestr("ventes.xlsx", workbook.getvalue())
+    reader = make_reader(monkeypatch, engine)
+    reader.arrow_slice_bytes = 16
+
+    for path in (gz_path, bz2_path):
+        assert reader.is_supported(str(path))
+        assert reader.data_size(str(path)) is None
+        df = pd.concat(reader.iter_file(str(path)), ignore_index=True)
+        assert df.values.tolist() == [[i, f"ligne {i}"] for i in range(5)]
+
+    zip_path = str(zip_path)
+    assert reader.is_supported(zip_path) and reader.is_archive(zip_path)
+    assert reader.archive_members(zip_path) == ["mois/ventes.csv", "ventes.xlsx"]
+    assert reader.data_size(zip_path, member="mois/ventes.csv") == len(text)
+    df = pd.concat(reader.iter_file(zip_path, member="mois/ventes.csv"), ignore_index=True)
+    assert df.values.tolist() == [[i, f"ligne {i}"] for i in range(5)]
+    [df] = reader.iter_file(zip_path, member="ventes.xlsx")
+    assert df.values.tolist() == [[9, "classeur"]]
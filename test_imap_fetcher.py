@@ -0,0 +1,107 @@
+import base64
+from FakeImap import FakeImap
+from ImapFetcher import ImapFetcher, parse_fetch, iter_attachment_parts, decode_payload
+
+
+TEXT_PART = '("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 12 1 NIL NIL NIL NIL)'
+CSV_PART = ('("application" "octet-stream" ("name" "ventes.csv") NIL NIL "base64" 20 NIL '
+            '("attachment" ("filename" "ventes.csv")) NIL NIL)')
+
+
+class State(dict):
+    """
+    État persistant en mémoire, à la place du manifeste d'ingestion.
+    """
+
+    def get_state(self, key, default=None):
+        return self.get(key, default)
+
+    def set_state(self, key, value):
+        self[key] = str(value)
+
+
+def structure(*parts):
+    """
+    BODYSTRUCTURE d'un message multipart/mixed, tel que retourné par `parse_fetch`.
+    """
+    data = [f'1 (UID 7 BODYSTRUCTURE ({"".join(parts)} "mixed" ("boundary" "x") NIL NIL NIL))'.encode()]
+    return parse_fetch(data)[0]["BODYSTRUCTURE"]
+
+
+def test_parse_fetch_litteraux_et_chaines():
+    """
+    Les littéraux `{n}` sont retournés en octets, NIL en None, les chaînes sans leurs échappements.
+    """
+    header = b"Subject: Rapport\r\n\r\n"
+    data = [(f'1 (UID 101 BODYSTRUCTURE ({TEXT_PART}{CSV_PART} "mixed" ("boundary" "x") NIL NIL NIL) '
+             f'BODY[HEADER.FIELDS (SUBJECT)] {{{len(header)}}}'.encode(), header), b")",
+            b'2 (UID 102 BODYSTRUCTURE ("text" "plain" ("name" "a \\"b\\".txt") NIL NIL "7bit" 1 1 NIL NIL NIL NIL))']
+    first, second = parse_fetch(data)
+    assert first["UID"] == "101"
+    assert first["BODY[HEADER.FIELDS (SUBJECT)]"] == header
+    text, csv_part = first["BODYSTRUCTURE"][:2]
+    assert text[:3] == ["text", "plain", ["charset", "utf-8"]]
+    assert text[3] is None
+    assert csv_part[8] == ["attachment", ["filename", "ventes.csv"]]
+    assert first["BODYSTRUCTURE"][2] == "mixed"
+    assert second["UID"] == "102"
+    assert second["BODYSTRUCTURE"][2] == ["name", 'a "b".txt']
+
+
+def test_iter_attachment_parts():
+    """
+    Seules les parties `attachment` nommées sont retenues, avec leur numéro de partie et leur encodage.
+    """
+    inline = ('("application" "pdf" ("name" "logo.pdf") NIL NIL "base64" 10 NIL '
+              '("inline" ("filename" "logo.pdf")) NIL NIL)')
+    unnamed = '("application" "octet-stream" NIL NIL NIL "base64" 10 NIL ("attachment" NIL) NIL NIL)'
+    assert list(iter_attachment_parts(structure(TEXT_PART, CSV_PART, inline, unnamed))) == [("2", "ventes.csv", "BASE64")]
+
+
+def test_iter_attachment_parts_noms_encodes_et_messages_imbriques():
+    """
+    Noms de fichiers RFC 2231 (`filename*`) et RFC 2047 (`=?utf-8?...?=`), pièce jointe d'un message transféré.
+    """
+    rfc2231 = ('("application" "octet-stream" NIL NIL NIL "base64" 10 NIL '
+               '("attachment" ("filename*" "utf-8\'\'r%C3%A9sum%C3%A9.csv")) NIL NIL)')
+    rfc2047 = ('("application" "octet-stream" ("name" "=?utf-8?B?w6l0w6kuY3N2?=") NIL NIL "quoted-printable" 10 NIL '
+               '("attachment" NIL) NIL NIL)')
+    forwarded = (f'("message" "rfc822" NIL NIL NIL "7bit" 100 NIL ({TEXT_PART}{CSV_PART} "mixed" NIL NIL NIL NIL) '
+                 f'5 NIL NIL NIL NIL)')
+    assert list(iter_attachment_parts(structure(TEXT_PART, rfc2231, rfc2047, forwarded))) == [
+        ("2", "résumé.csv", "BASE64"),
+        ("3", "été.csv", "QUOTED-PRINTABLE"),
+        ("4.2", "ventes.csv", "BASE64"),
+    ]
+
+
+def test_decode_payload():
+    assert decode_payload(base64.b64encode(b"a;b\n1;2\n"), "BASE64") == b"a;b\n1;2\n"
+    assert decode_payload(b"caf=C3=A9", "QUOTED-PRINTABLE") == "café".encode()
+    assert decode_payload(b"brut", "7BIT") == b"brut"
+
+
+def test_dernier_uid_avance_apres_acquittement():
+    """
+    Le dernier UID traité n'avance que sur des messages acquittés et consécutifs : un message rendu
+    mais non acquitté sera de nouveau examiné à l'exécution suivante.
+    """
+    mailbox = FakeImap([(uid, f"Rapport {uid}", [(f"ventes_{uid}.csv", b"ref\n1\n")]) for uid in (101, 102, 103)])
+    state = State()
+    fetcher = ImapFetcher(state, "etl@example.com")
+    key = f"{fetcher.key}:last_uid"
+
+    messages = list(fetcher.iter_new_messages(mailbox))
+    assert [(uid, subject, attachments) for uid, subject, attachments in messages] == [
+        (uid, f"Rapport {uid}", [(f"ventes_{uid}.csv", b"ref\n1\n")]) for uid in (101, 102, 103)]
+    assert state.get(key) == "0"
+
+    fetcher.acknowledge(102)
+    assert state.get(key) == "0"
+    fetcher.acknowledge(101)
+    assert state.get(key) == "102"
+    assert fetcher.new_uids(mailbox) == [103]
+
+    fetcher.acknowledge(103)
+    assert state.get(key) == "103"
+    assert fetcher.new_uids(mailbox) == []
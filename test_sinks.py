@@ -0,0 +1,262 @@
+import csv
+import io
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+from BulkInserter import BulkInserter
+from SchemaCache import TableSchema
+from Sinks import PostgresSink, SqliteSink, SqlServerSink
+
+
+class FlakyConnection:
+    """
+    Connexion SQLite dont les premières validations échouent : chaque validation consomme une erreur de `failures`.
+    """
+
+    def __init__(self, conn, failures):
+        self.conn = conn
+        self.failures = failures
+
+    def commit(self):
+        if self.failures:
+            raise sqlite3.OperationalError(self.failures.pop(0))
+        self.conn.commit()
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+@pytest.fixture
+def sink(tmp_path, monkeypatch):
+    """
+    Destination SQLite dans un dossier temporaire, avec des transactions de 2 lignes et sans attente entre les tentatives.
+    """
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "etl.sqlite"))
+    monkeypatch.setenv("COMMIT_EVERY_ROWS", "2")
+    monkeypatch.setenv("RETRY_ATTEMPTS", "2")
+    monkeypatch.setenv("RETRY_BACKOFF", "0")
+    monkeypatch.delenv("UPSERT_KEYS", raising=False)
+    sink = SqliteSink({})
+    sink.create_table("ventes", {"ref": "INT", "libelle": "NVARCHAR(50)"})
+    yield sink
+    sink.pool.close_all()
+
+
+def make_flaky(sink, monkeypatch, failures):
+    """
+    Remplace les connexions du pool par des connexions dont les validations échouent (`FlakyConnection`).
+    """
+    connect = sink.pool.connect
+    sink.pool.close_all()
+    monkeypatch.setattr(sink.pool, "connect", lambda: FlakyConnection(connect(), failures))
+
+
+def rows(sink, table_name="ventes", columns=("ref", "libelle")):
+    with sink.pool.connection() as conn:
+        columns_str = ", ".join(f'"{column}"' for column in columns)
+        return conn.execute(f'SELECT {columns_str} FROM "{table_name}" ORDER BY id').fetchall()
+
+
+def test_write_valide_par_transactions_bornees(sink):
+    """
+    Les blocs sont écrits sans la colonne 'id' et validés toutes les COMMIT_EVERY_ROWS lignes.
+    """
+    commits = []
+    data = [pd.DataFrame({"ref": [1, 2, 3], "libelle": ["a", "b", None]}),
+            pd.DataFrame({"ref": [4, 5, 6], "libelle": ["d", "e", "f"]})]
+    assert sink.write("ventes", data, on_commit=commits.append) == 6
+    assert commits == [2, 4, 6]
+    assert rows(sink) == [(1, "a"), (2, "b"), (3, None), (4, "d"), (5, "e"), (6, "f")]
+
+
+def test_write_refuse_une_table_absente_ou_des_colonnes_en_trop(sink):
+    with pytest.raises(ValueError, match="n'existe pas"):
+        sink.write("inconnue", [pd.DataFrame({"ref": [1]})])
+    with pytest.raises(ValueError, match="nombre de colonnes"):
+        sink.write("ventes", [pd.DataFrame({"ref": [1], "libelle": ["a"], "extra": [0]})])
+    assert rows(sink) == []
+
+
+def test_write_rejoue_une_transaction_apres_une_erreur_transitoire(sink, monkeypatch):
+    """
+    Une validation en échec (base verrouillée) annule la transaction, qui est rejouée seule :
+    les lignes ne sont insérées qu'une fois et les transactions déjà validées sont conservées.
+    """
+    failures = ["database is locked"]
+    make_flaky(sink, monkeypatch, failures)
+    commits = []
+    data = [pd.DataFrame({"ref": [1, 2, 3], "libelle": ["a", "b", "c"]})]
+    assert sink.write("ventes", data, on_commit=commits.append) == 3
+    assert not failures
+    assert commits == [2, 3]
+    assert rows(sink) == [(1, "a"), (2, "b"), (3, "c")]
+
+
+def test_write_propage_l_erreur_apres_les_tentatives(sink, monkeypatch):
+    """
+    Au-delà de RETRY_ATTEMPTS tentatives, l'erreur est propagée et la transaction en cours est annulée.
+    """
+    assert sink.write("ventes", [pd.DataFrame({"ref": [1, 2], "libelle": ["a", "b"]})]) == 2
+    failures = ["database is locked"] * 4
+    make_flaky(sink, monkeypatch, failures)
+    with pytest.raises(sqlite3.OperationalError, match="locked"):
+        sink.write("ventes", [pd.DataFrame({"ref": [3], "libelle": ["c"]})])
+    assert len(failures) == 1
+    assert rows(sink) == [(1, "a"), (2, "b")]
+
+
+def test_write_ne_rejoue_pas_une_erreur_definitive(sink, monkeypatch):
+    failures = ["disk I/O error", "disk I/O error"]
+    make_flaky(sink, monkeypatch, failures)
+    with pytest.raises(sqlite3.OperationalError, match="disk I/O error"):
+        sink.write("ventes", [pd.DataFrame({"ref": [1], "libelle": ["a"]})])
+    assert len(failures) == 1
+    assert rows(sink) == []
+
+
+def test_upsert_met_a_jour_sans_doublon_et_garde_la_derniere_ligne(sink):
+    """
+    Une clé présente plusieurs fois dans le fichier prend la valeur de sa dernière ligne, y compris
+    d'un bloc à l'autre ; recharger un fichier met à jour les lignes existantes sans doublon.
+    """
+    sink.upsert_keys["ventes"] = ["ref"]
+    data = [pd.DataFrame({"ref": [1, 2, 1], "libelle": ["a", "b", "c"]}),
+            pd.DataFrame({"ref": [2, 3], "libelle": ["d", "e"]})]
+    commits = []
+    assert sink.write("ventes", data, on_commit=commits.append) == 5
+    assert commits == [5]
+    assert sorted(rows(sink)) == [(1, "c"), (2, "d"), (3, "e")]
+
+    assert sink.write("ventes", [pd.DataFrame({"ref": [3, 4], "libelle": ["x", "y"]})]) == 2
+    assert sorted(rows(sink)) == [(1, "c"), (2, "d"), (3, "x"), (4, "y")]
+    assert rows(sink, "ventes_staging") == []
+
+
+def test_upsert_cle_nulle_rechargee_sans_doublon(sink):
+    """
+    Une ligne dont une colonne clé est vide est mise à jour au rechargement, et non insérée de nouveau.
+    """
+    sink.upsert_keys["ventes"] = ["ref"]
+    data = pd.DataFrame({"ref": [1, None], "libelle": ["a", "sans clé"]})
+    sink.write("ventes", [data])
+    sink.write("ventes", [data.assign(libelle=["b", "toujours sans clé"])])
+    assert sorted(rows(sink), key=str) == [(1, "b"), (None, "toujours sans clé")]
+
+
+def test_upsert_remplace_une_ancienne_table_de_transit(sink):
+    """
+    Une table de transit créée sans colonne 'id' (versions précédentes) est recréée au premier chargement.
+    """
+    with sink.pool.connection() as conn:
+        conn.execute('CREATE TABLE "ventes_staging" AS SELECT "ref", "libelle" FROM "ventes" WHERE 1 = 0')
+        conn.commit()
+    sink.upsert_keys["ventes"] = ["ref"]
+    sink.write("ventes", [pd.DataFrame({"ref": [1, 1], "libelle": ["a", "b"]})])
+    assert rows(sink) == [(1, "b")]
+
+
+def test_upsert_apres_recreation_de_la_table(sink):
+    """
+    Une table recréée pendant l'exécution (TableGenerator, pièces jointes) a une table de transit
+    recréée avec ses nouvelles colonnes.
+    """
+    sink.upsert_keys["ventes"] = ["ref"]
+    sink.write("ventes", [pd.DataFrame({"ref": [1], "libelle": ["a"]})])
+    with sink.pool.connection() as conn:
+        conn.execute('DROP TABLE "ventes"')
+        conn.commit()
+    sink.create_table("ventes", {"ref": "INT", "libelle": "NVARCHAR(50)", "montant": "INT"})
+    sink.write("ventes", [pd.DataFrame({"ref": [2, 2], "libelle": ["b", "c"], "montant": [5, 6]})])
+    assert rows(sink, columns=("ref", "libelle", "montant")) == [(2, "c", 6)]
+
+
+def test_upsert_refuse_une_cle_absente(sink):
+    sink.upsert_keys["ventes"] = ["code"]
+    with pytest.raises(ValueError, match="UPSERT_KEYS"):
+        sink.write("ventes", [pd.DataFrame({"ref": [1], "libelle": ["a"]})])
+
+
+def test_merge_queries():
+    """
+    UPDATE ... FROM puis INSERT ... WHERE NOT EXISTS (PostgreSQL, SQLite), une seule instruction MERGE
+    sous SQL Server ; la source est dédupliquée sur les clés en gardant le plus grand 'id'.
+    """
+    sink = object.__new__(SqliteSink)
+    match = '("ventes"."ref" = s."ref" OR ("ventes"."ref" IS NULL AND s."ref" IS NULL))'
+    update, insert = sink.merge_queries("ventes", "ventes_staging", ["ref", "libelle"], ["ref"])
+    assert update.startswith('UPDATE "ventes" SET "libelle" = s."libelle" FROM (SELECT')
+    assert 'PARTITION BY "ref" ORDER BY id DESC' in update
+    assert update.endswith(f"WHERE {match};")
+    assert insert.startswith('INSERT INTO "ventes" ("ref", "libelle") SELECT s."ref", s."libelle" FROM')
+    assert insert.endswith(f'WHERE NOT EXISTS (SELECT 1 FROM "ventes" WHERE {match});')
+    # Sans autre colonne que les clés, seules les nouvelles clés sont insérées
+    assert [query.split()[0] for query in sink.merge_queries("ventes", "ventes_staging", ["ref"], ["ref"])] == ["INSERT"]
+
+    sink = object.__new__(SqlServerSink)
+    [merge] = sink.merge_queries("ventes", "ventes_staging", ["ref", "libelle"], ["ref"])
+    assert merge.startswith("MERGE [ventes] AS t USING (SELECT [ref], [libelle] FROM")
+    assert "PARTITION BY [ref] ORDER BY id DESC" in merge
+    assert ("ON (t.[ref] = s.[ref] OR (t.[ref] IS NULL AND s.[ref] IS NULL)) "
+            "WHEN MATCHED THEN UPDATE SET t.[libelle] = s.[libelle]") in merge
+    assert merge.endswith("WHEN NOT MATCHED BY TARGET THEN INSERT ([ref], [libelle]) VALUES (s.[ref], s.[libelle]);")
+
+
+class CopyCursor:
+    """
+    Curseur qui conserve la commande et les données reçues par `copy_expert`.
+    """
+    def copy_expert(self, query, buffer):
+        self.query, self.data = query, buffer.read()
+
+
+def copy_rows(data):
+    """
+    Relit les données d'un `COPY ... WITH (FORMAT csv, NULL '\\N')` comme le ferait PostgreSQL.
+    """
+    return [[None if value == "\\N" else value for value in row] for row in csv.reader(io.StringIO(data))]
+
+
+def test_postgres_copy(monkeypatch):
+    """
+    Le bloc est envoyé en CSV : valeurs manquantes à NULL, chaînes vides conservées, guillemets, séparateurs
+    et sauts de ligne protégés, dates au format ISO et entiers devenus décimaux (NaN) réécrits en entiers.
+    """
+    monkeypatch.delenv("INSERT_MODE", raising=False)
+    sink = object.__new__(PostgresSink)
+    sink.bulk_inserter = BulkInserter()
+    schema = TableSchema("ventes", ["ref", "libelle", "jour", "heure", "montant"], None, None)
+    df = pd.DataFrame({
+        "ref": [1.0, np.nan, 3.0],
+        "libelle": ['dit "oui", puis; non\nfin', "", None],
+        "jour": [pd.Timestamp("2024-01-31"), pd.NaT, pd.Timestamp("2024-02-01")],
+        "heure": [pd.Timestamp("2024-01-31 10:30:05"), pd.Timestamp("2024-02-01"), pd.NaT],
+        "montant": [1.5, 2.0, np.nan],
+    })
+    cur = CopyCursor()
+    assert sink.insert_chunk(cur, schema, df) == 3
+    assert cur.query == ('COPY "ventes" ("ref", "libelle", "jour", "heure", "montant") '
+                         "FROM STDIN WITH (FORMAT csv, NULL '\\N')")
+    assert copy_rows(cur.data) == [
+        ["1", 'dit "oui", puis; non\nfin', "2024-01-31", "2024-01-31 10:30:05", "1.5"],
+        [None, "", None, "2024-02-01 00:00:00", "2.0"],
+        ["3", None, "2024-02-01", None, None],
+    ]
+    # Le bloc d'origine n'est pas modifié
+    assert df["ref"].dtype == "float64"
+
+
+def test_postgres_insertion_ligne_par_ligne(monkeypatch):
+    monkeypatch.setenv("INSERT_MODE", "row")
+    sink = object.__new__(PostgresSink)
+    sink.bulk_inserter = BulkInserter()
+    queries = []
+
+    class Cursor:
+        def execute(self, query, row):
+            queries.append((query, row))
+
+    schema = TableSchema("ventes", ["ref"], None, 'INSERT INTO "ventes" ("ref") VALUES (%s)')
+    assert sink.insert_chunk(Cursor(), schema, pd.DataFrame({"ref": [1, None]})) == 2
+    assert queries == [('INSERT INTO "ventes" ("ref") VALUES (%s)', (1.0,)),
+                       ('INSERT INTO "ventes" ("ref") VALUES (%s)', (None,))]
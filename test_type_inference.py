@@ -0,0 +1,80 @@
+import datetime
+import decimal
+import pandas as pd
+import pytest
+from TypeInference import TypeInferer
+
+
+@pytest.fixture
+def inferer(monkeypatch):
+    monkeypatch.delenv("AUTO_CONFIRM_SCHEMA", raising=False)
+    return TypeInferer(sample_size=100)
+
+
+@pytest.mark.parametrize("values, expected", [
+    ([1, 2, None], "INT"),
+    ([1, 2**40], "BIGINT"),
+    ([1, 2**70], "DECIMAL(38,0)"),
+    ([1.0, 2.0, None], "INT"),
+    ([1.5, 22.25], "DECIMAL(6,2)"),
+    ([decimal.Decimal("1.5")], "DECIMAL(4,1)"),
+    ([1e-20, 0.5], "FLOAT"),
+    ([True, False, None], "BIT"),
+    ([pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-02")], "DATE"),
+    ([pd.Timestamp("2024-01-01 10:30")], "DATETIME2"),
+    ([datetime.date(2024, 1, 1)], "DATE"),
+    ([None, None], "NVARCHAR(255)"),
+])
+def test_infer_column_valeurs_typees(inferer, values, expected):
+    assert inferer.infer_column(pd.Series(values)) == expected
+
+
+@pytest.mark.parametrize("values, expected", [
+    (["12", " 34 ", "-5"], "INT"),
+    (["0612345678", "0698765432"], "NVARCHAR(50)"),
+    (["3.14", "10.5"], "DECIMAL(6,2)"),
+    (["2024-01-01", "2024-12-31"], "DATE"),
+    (["2024-01-01 10:00", "2024-01-01T10:00:05.5"], "DATETIME2"),
+    (["2024-13-45"], "NVARCHAR(50)"),
+    (["", "  "], "NVARCHAR(255)"),
+    (["x" * 100], "NVARCHAR(255)"),
+    (["x" * 3000], "NVARCHAR(MAX)"),
+])
+def test_infer_column_texte(inferer, values, expected):
+    """
+    Nombres et dates écrits en texte sont reconnus ; les codes commençant par zéro restent du texte.
+    """
+    assert inferer.infer_column(pd.Series(values, dtype=object)) == expected
+
+
+def test_infer_echantillonne_les_premieres_lignes():
+    df = pd.DataFrame({"ref": ["1"] * 5 + ["abc"], "montant": [1.5] * 6})
+    assert TypeInferer(sample_size=5).infer(df) == {"ref": "INT", "montant": "DECIMAL(4,1)"}
+    assert TypeInferer(sample_size=6).infer(df) == {"ref": "NVARCHAR(50)", "montant": "DECIMAL(4,1)"}
+
+
+def test_confirm_renomme_et_change_les_types(inferer, monkeypatch):
+    answers = iter(["reference", ":BIGINT", "libelle_long:nvarchar(500)"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    renames, types = inferer.confirm({"ref": "INT", "montant": "INT", "libelle": "NVARCHAR(50)"})
+    assert renames == {"ref": "reference", "montant": "montant", "libelle": "libelle_long"}
+    assert types == {"reference": "INT", "montant": "BIGINT", "libelle_long": "NVARCHAR(500)"}
+
+
+def test_confirm_automatique(monkeypatch):
+    monkeypatch.setenv("AUTO_CONFIRM_SCHEMA", "1")
+    monkeypatch.setattr("builtins.input", lambda prompt: pytest.fail("aucune question attendue"))
+    assert TypeInferer().confirm({"ref": "INT"}) == ({"ref": "ref"}, {"ref": "INT"})
+
+
+def test_confirm_refuse_un_nom_deja_utilise(inferer, monkeypatch):
+    """
+    Un nom déjà donné à une autre colonne est refusé et la question est posée de nouveau.
+    """
+    answers = iter(["", "ref:BIGINT", "montant_ttc"])
+    prompts = []
+    monkeypatch.setattr("builtins.input", lambda prompt: prompts.append(prompt) or next(answers))
+    renames, types = inferer.confirm({"ref": "INT", "montant": "INT"})
+    assert renames == {"ref": "ref", "montant": "montant_ttc"}
+    assert types == {"ref": "INT", "montant_ttc": "INT"}
+    assert len(prompts) == 3